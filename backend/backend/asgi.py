@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
 
 application = get_asgi_application()
+
+from embedding.worker import start_worker_pool  # noqa: E402
+
+# Resume queued uploads left behind by the previous server process
+start_worker_pool()
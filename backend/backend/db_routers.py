@@ -0,0 +1,66 @@
+"""
+Read-replica routing.
+
+Writes always go to "default". Reads go to the "replica" alias (configured
+with POSTGRES_REPLICA_HOST) only inside read_from_replica(), which the
+ranking, search and job list views enter through ReplicaReadMixin. Those can
+tolerate a little replication lag; everything else, notably the upload
+pipeline, keeps reading its own writes from the primary.
+"""
+import contextvars
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA_DB_ALIAS = "replica"
+
+_use_replica = contextvars.ContextVar("use_replica", default=False)
+
+
+@contextmanager
+def read_from_replica(enabled=True):
+    """
+    Send reads made inside the block to the replica, if one is configured.
+    read_from_replica(False) pins them back to the primary, e.g. right after
+    writing rows the block needs to see.
+    """
+    token = _use_replica.set(enabled)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and REPLICA_DB_ALIAS in settings.DATABASES:
+            return REPLICA_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaReadMixin:
+    """
+    Serve a view's reads from the replica (see read_from_replica). Works for
+    sync and async views; streamed response bodies read from the primary.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if getattr(self, "view_is_async", False):
+            return self._adispatch(request, *args, **kwargs)
+        with read_from_replica():
+            return super().dispatch(request, *args, **kwargs)
+
+    async def _adispatch(self, request, *args, **kwargs):
+        with read_from_replica():
+            return await super().dispatch(request, *args, **kwargs)
@@ -0,0 +1,177 @@
+"""
+In-process metrics in the Prometheus text format.
+
+Counters and histograms live in this process only (every worker process
+exposes its own /metrics); label sets are kept small and fixed. With
+METRICS_ENABLED off every call below returns immediately.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+ENABLED = settings.METRICS_ENABLED
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry = []
+
+# Stage durations of the current request, read by ServerTimingMiddleware
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_samples(items))
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        if not ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _render_samples(self, items):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        if not ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (the last one is +Inf), sum
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+
+    def _render_samples(self, items):
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "ats_stage_seconds", "Time spent in each stage of the upload and ranking pipelines.", ["stage"]
+)
+REQUEST_SECONDS = Histogram(
+    "ats_http_request_seconds", "HTTP request latency by route.", ["method", "route", "status"]
+)
+CACHE_LOOKUPS = Counter(
+    "ats_cache_lookups_total", "Embedding, extraction and ranking cache lookups by result.", ["cache", "result"]
+)
+API_CALLS = Counter(
+    "ats_api_calls_total", "Requests sent to OpenAI and Pinecone by outcome.", ["api", "outcome"]
+)
+API_TOKENS = Counter("ats_api_tokens_total", "OpenAI tokens used.", ["api", "kind"])
+PARSED_BYTES = Counter("ats_parsed_bytes_total", "Bytes of uploaded documents parsed.", ["format"])
+PARSED_DOCUMENTS = Counter("ats_parsed_documents_total", "Uploaded documents parsed.", ["format"])
+
+
+def record_timing(stage, seconds):
+    """
+    Observe a stage duration and add it to the current request's
+    Server-Timing entries, if a request is being timed.
+    """
+    if not ENABLED:
+        return
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed(stage):
+    """
+    Time the block as `stage` (see record_timing).
+    """
+    if not ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_timing(stage, time.perf_counter() - started)
+
+
+def start_request_timings():
+    """
+    Start collecting stage timings for the current request. Returns the dict
+    they accumulate in ({stage: seconds}) and a token for reset_request_timings.
+    """
+    timings = {}
+    return timings, _request_timings.set(timings)
+
+
+def reset_request_timings(token):
+    _request_timings.reset(token)
+
+
+def render():
+    """
+    Every metric in the Prometheus text exposition format.
+    """
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,82 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from . import metrics
+
+
+def _time_query(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.record_timing("db", time.perf_counter() - started)
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """
+    Time every query on a new database connection as the "db" stage.
+    """
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+class ServerTimingMiddleware:
+    """
+    Records request latency by route and, with SERVER_TIMING_HEADER on, adds
+    a Server-Timing header with the time spent in each stage of the request
+    (parse, embed, upsert, extract, db, ...) plus the total. Removed from the
+    middleware chain when METRICS_ENABLED is off.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not metrics.ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.add_header = settings.SERVER_TIMING_HEADER
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        connection_created.connect(install_query_timer, dispatch_uid="server-timing-query-timer")
+        for connection in connections.all(initialized_only=True):
+            install_query_timer(None, connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timings, token = metrics.start_request_timings()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.reset_request_timings(token)
+        return self.finish(request, response, timings, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        timings, token = metrics.start_request_timings()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.reset_request_timings(token)
+        return self.finish(request, response, timings, time.perf_counter() - started)
+
+    def finish(self, request, response, timings, elapsed):
+        match = request.resolver_match
+        metrics.REQUEST_SECONDS.observe(
+            elapsed,
+            method=request.method,
+            route=match.route if match else "unmatched",
+            status=response.status_code,
+        )
+        if self.add_header:
+            entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items()]
+            entries.append(f"total;dur={elapsed * 1000:.1f}")
+            response["Server-Timing"] = ", ".join(entries)
+        return response
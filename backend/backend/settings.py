@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -46,6 +49,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "backend.middleware.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -73,6 +77,41 @@ SIMPLE_JWT = {
 
 AUTH_USER_MODEL = 'user.CustomUser'
 
+# Threads per process running queued resume/JD uploads (embedding.worker).
+# Set to 0 to leave the queue to `manage.py run_ingestion_worker` only.
+INGESTION_WORKERS = int(os.getenv('INGESTION_WORKERS', '4'))
+
+# Where embeddings are upserted/queried: "pinecone" or "local" (embedding.utils.vector_store)
+VECTOR_STORE_BACKEND = os.getenv('VECTOR_STORE_BACKEND', 'pinecone')
+LOCAL_VECTOR_STORE_DIR = os.getenv('LOCAL_VECTOR_STORE_DIR', str(BASE_DIR / 'vector_store'))
+
+# Candidate matrix used to score jobs (similarity.utils): "memory" keeps a
+# float32 copy per process; "shared" memory-maps a float32 + int8 snapshot
+# from CANDIDATE_MATRIX_DIR that all worker processes share
+CANDIDATE_MATRIX_MODE = os.getenv('CANDIDATE_MATRIX_MODE', 'memory')
+CANDIDATE_MATRIX_DIR = os.getenv('CANDIDATE_MATRIX_DIR', str(BASE_DIR / 'candidate_matrix'))
+
+# Per-stage latency histograms and API/cache counters at /metrics
+# (backend.metrics). Scrapes must send METRICS_TOKEN as a bearer token;
+# without one, /metrics only answers local requests with DEBUG on.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+# Add a Server-Timing header with the per-stage timings to every response.
+# It exposes internals, so it is off unless DEBUG or turned on explicitly.
+SERVER_TIMING_HEADER = os.getenv('SERVER_TIMING_HEADER', str(DEBUG)).lower() in ('1', 'true', 'yes')
+
+# Ranking pages are cached per job and query (similarity.cache), and their
+# invalidations must reach every worker, so the cache has to be shared: the
+# default file-based cache is shared by the processes of one host; across
+# hosts use e.g. django.core.cache.backends.redis.RedisCache. Ranking pages
+# are not cached with the per-process LocMemCache.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', str(BASE_DIR / 'django_cache')),
+    },
+}
+
 #  my-settings ends here
 
 
@@ -100,13 +139,66 @@ WSGI_APPLICATION = "backend.wsgi.application"
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
-
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+#
+# SQLite unless DATABASE_ENGINE=postgresql (configured by the POSTGRES_*
+# variables). On PostgreSQL, connections are kept open for DB_CONN_MAX_AGE
+# seconds or, with DB_POOL_MAX_SIZE > 0, taken from a psycopg connection pool
+# (needs psycopg[pool]) keeping DB_POOL_MIN_SIZE (default up to 2) open.
+# POSTGRES_REPLICA_HOST adds a "replica" alias that ranking, search and job
+# list reads are routed to (backend.db_routers).
+
+DATABASE_ENGINE = os.getenv("DATABASE_ENGINE", "sqlite")
+
+if DATABASE_ENGINE == "postgresql":
+    DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "0"))
+    DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", str(min(2, DB_POOL_MAX_SIZE))))
+    if DB_POOL_MAX_SIZE and DB_POOL_MIN_SIZE > DB_POOL_MAX_SIZE:
+        raise ImproperlyConfigured(
+            f"DB_POOL_MIN_SIZE ({DB_POOL_MIN_SIZE}) must not exceed DB_POOL_MAX_SIZE ({DB_POOL_MAX_SIZE})."
+        )
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.getenv("POSTGRES_DB", "ats"),
+            "USER": os.getenv("POSTGRES_USER", "ats"),
+            "PASSWORD": os.getenv("POSTGRES_PASSWORD", ""),
+            "HOST": os.getenv("POSTGRES_HOST", "localhost"),
+            "PORT": os.getenv("POSTGRES_PORT", "5432"),
+            # Persistent connections can't be combined with the pool
+            "CONN_MAX_AGE": 0 if DB_POOL_MAX_SIZE else int(os.getenv("DB_CONN_MAX_AGE", "60")),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {
+                "pool": {
+                    "min_size": DB_POOL_MIN_SIZE,
+                    "max_size": DB_POOL_MAX_SIZE,
+                    "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+                },
+            } if DB_POOL_MAX_SIZE else {},
+        }
     }
-}
+    if os.getenv("POSTGRES_REPLICA_HOST"):
+        DATABASES["replica"] = {
+            **DATABASES["default"],
+            "HOST": os.getenv("POSTGRES_REPLICA_HOST"),
+            "PORT": os.getenv("POSTGRES_REPLICA_PORT", DATABASES["default"]["PORT"]),
+            "TEST": {"MIRROR": "default"},
+        }
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / "db.sqlite3",
+            # WAL lets reads run alongside a write; IMMEDIATE transactions
+            # queue for the write lock up front instead of failing mid-way
+            "OPTIONS": {
+                "init_command": "PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;",
+                "transaction_mode": "IMMEDIATE",
+                "timeout": 20,
+            },
+        }
+    }
+
+DATABASE_ROUTERS = ["backend.db_routers.ReplicaRouter"]
 
 
 # Password validation
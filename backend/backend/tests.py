@@ -0,0 +1,39 @@
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"])
+class MetricsViewTests(SimpleTestCase):
+    def scrape(self, **extra):
+        return self.client.get(reverse("metrics"), **extra)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_token_is_required_when_set(self):
+        self.assertEqual(self.scrape().status_code, 403)
+        self.assertEqual(self.scrape(HTTP_AUTHORIZATION="Bearer wrong").status_code, 403)
+        response = self.scrape(HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"ats_cache_lookups_total", response.content)
+
+    @override_settings(METRICS_TOKEN="", DEBUG=False)
+    def test_denied_without_a_token(self):
+        self.assertEqual(self.scrape().status_code, 403)
+
+    @override_settings(METRICS_TOKEN="", DEBUG=True)
+    def test_local_requests_allowed_without_a_token_in_debug(self):
+        self.assertEqual(self.scrape(REMOTE_ADDR="127.0.0.1").status_code, 200)
+        self.assertEqual(self.scrape(REMOTE_ADDR="203.0.113.7").status_code, 403)
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"], METRICS_TOKEN="secret")
+class ServerTimingTests(SimpleTestCase):
+    def get(self):
+        return self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret")
+
+    @override_settings(SERVER_TIMING_HEADER=False)
+    def test_header_is_off_by_default_outside_debug(self):
+        self.assertNotIn("Server-Timing", self.get())
+
+    @override_settings(SERVER_TIMING_HEADER=True)
+    def test_header_lists_the_total(self):
+        self.assertIn("total;dur=", self.get()["Server-Timing"])
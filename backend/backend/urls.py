@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from .views import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/user/', include('user.urls')),            # Registration, login, profile
@@ -8,4 +10,5 @@ urlpatterns = [
     path('api/candidate/', include('candidate.urls')),  # Resume upload, candidate profile
     path('api/similarity/', include('similarity.urls')),# Ranking, matching
     path("api/embedding/", include("embedding.urls")),
+    path("metrics", metrics_view, name="metrics"),
 ]
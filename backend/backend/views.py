@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, HttpResponseNotFound
+from django.utils.crypto import constant_time_compare
+
+from . import metrics
+
+
+LOOPBACK_ADDRESSES = ("127.0.0.1", "::1")
+
+
+def _may_scrape(request):
+    if settings.METRICS_TOKEN:
+        return constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {settings.METRICS_TOKEN}")
+    # No token configured: only for local development
+    return settings.DEBUG and request.META.get("REMOTE_ADDR") in LOOPBACK_ADDRESSES
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. Requires "Authorization: Bearer <METRICS_TOKEN>";
+    without a METRICS_TOKEN it only answers local requests when DEBUG is on.
+    """
+    if not metrics.ENABLED:
+        return HttpResponseNotFound()
+    if not _may_scrape(request):
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
 
 application = get_wsgi_application()
+
+from embedding.worker import start_worker_pool  # noqa: E402
+
+# Resume queued uploads left behind by the previous server process
+start_worker_pool()
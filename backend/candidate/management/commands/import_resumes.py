@@ -0,0 +1,280 @@
+import hashlib
+import io
+import os
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from candidate.models import CandidateProfile
+from candidate.signals import sync_structured_fields
+from embedding.utils.file_parser import SUPPORTED_EXTENSIONS, parse_files
+from embedding.models import ShadowEmbedding
+from embedding.reembed import active_embedding, dual_write
+from embedding.utils.openai_client import extract_structured_data, generate_embeddings, run_as_bulk
+from embedding.utils.vector_store import get_vector_store
+from job.models import Job
+from similarity.search import index_profile
+from similarity.utils import refresh_job_scores
+
+# Imported candidates get a username derived from the resume's content, so
+# re-importing the same file updates its profile instead of duplicating it
+USERNAME_PREFIX = "resume-"
+
+
+def iter_documents(source):
+    """
+    Yield (name, bytes) for every supported file in a directory tree or a
+    zip archive, one file in memory at a time, in a stable order.
+    """
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for info in sorted(archive.infolist(), key=lambda info: info.filename):
+                if not info.is_dir() and _is_supported(info.filename):
+                    yield info.filename, archive.read(info)
+        return
+
+    for root, dirs, files in os.walk(source):
+        dirs.sort()
+        for filename in sorted(files):
+            if _is_supported(filename):
+                path = os.path.join(root, filename)
+                with open(path, "rb") as f:
+                    yield os.path.relpath(path, source), f.read()
+
+
+def _is_supported(name):
+    basename = os.path.basename(name)
+    return not basename.startswith(".") and os.path.splitext(basename)[1].lower() in SUPPORTED_EXTENSIONS
+
+
+def iter_batches(documents, batch_size, done):
+    batch = []
+    for name, data in documents:
+        if name in done:
+            continue
+        batch.append((name, data))
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def parse_batch(batch):
+    """
+    Parse a batch across the parser process pool. Returns one text or
+    exception per document.
+    """
+    buffers = []
+    for name, data in batch:
+        buffer = io.BytesIO(data)
+        buffer.name = name  # format hint for files that can't be sniffed
+        buffers.append(buffer)
+    return parse_files(buffers, return_exceptions=True)
+
+
+class Checkpoint:
+    """
+    Append-only list of the source entries already imported, one name per
+    line, written after each batch is committed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return set()
+        with open(self.path, encoding="utf-8") as f:
+            return {line.rstrip("\n") for line in f if line.strip()}
+
+    def add(self, names):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(f"{name}\n" for name in names)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class Command(BaseCommand):
+    help = "Import a directory or zip archive of resumes as candidate profiles."
+
+    def add_arguments(self, parser):
+        parser.add_argument("source", help="Directory or .zip file of PDF/DOCX/TXT resumes.")
+        parser.add_argument("--batch-size", type=int, default=64, help="Resumes parsed, embedded and saved together.")
+        parser.add_argument(
+            "--extract-workers", type=int, default=8, help="Concurrent structured-extraction API calls."
+        )
+        parser.add_argument("--no-extract", action="store_true", help="Skip structured extraction (embed only).")
+        parser.add_argument("--no-scores", action="store_true", help="Don't refresh job match scores afterwards.")
+        parser.add_argument(
+            "--checkpoint",
+            help="Progress file used to resume an interrupted import (default: <source>.import-progress).",
+        )
+        parser.add_argument("--restart", action="store_true", help="Ignore any existing checkpoint.")
+
+    def handle(self, *args, **options):
+        # Queue behind interactive uploads and leave them part of the budget
+        run_as_bulk()
+        source = os.path.abspath(options["source"])
+        if not os.path.exists(source):
+            raise CommandError(f"{source} does not exist.")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive.")
+
+        checkpoint = Checkpoint(options["checkpoint"] or source.rstrip(os.sep) + ".import-progress")
+        if options["restart"] and os.path.exists(checkpoint.path):
+            os.remove(checkpoint.path)
+        done = checkpoint.load()
+        if done:
+            self.stdout.write(f"Resuming: {len(done)} file(s) already imported.")
+
+        self.extract = not options["no_extract"]
+        self.imported = self.failed = 0
+        started = time.monotonic()
+        batches = iter_batches(iter_documents(source), options["batch_size"], done)
+
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="import-parse") as parser, \
+                ThreadPoolExecutor(max_workers=options["extract_workers"], thread_name_prefix="import-extract") as extractor:
+            self.extractor = extractor
+            # Parse the next batch while the current one is embedded and saved
+            batch = next(batches, None)
+            parsing = parser.submit(parse_batch, batch) if batch else None
+            while batch:
+                texts = parsing.result()
+                next_batch = next(batches, None)
+                parsing = parser.submit(parse_batch, next_batch) if next_batch else None
+
+                self.import_batch(batch, texts)
+                checkpoint.add(name for name, _ in batch)
+
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f"{self.imported} imported, {self.failed} failed "
+                    f"({self.imported / elapsed:.1f} docs/sec)"
+                )
+                batch = next_batch
+
+        if not options["no_scores"]:
+            # A resumed import may have nothing left to import but still owe
+            # the scores an interrupted run never wrote
+            jobs = jobs_to_rescore(all_jobs=bool(self.imported))
+            if jobs.exists():
+                self.stdout.write("Refreshing job match scores...")
+                for job in jobs.only("id", "embedding", "embedding_dtype").iterator():
+                    refresh_job_scores(job)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {self.imported} resume(s), {self.failed} failed, "
+            f"in {elapsed:.1f}s ({self.imported / elapsed if elapsed else 0:.1f} docs/sec)."
+        ))
+
+    def import_batch(self, batch, texts):
+        documents = {}
+        for (name, data), text in zip(batch, texts):
+            if isinstance(text, Exception) or not text:
+                self.failed += 1
+                self.stderr.write(f"{name}: {text or 'no text extracted'}")
+                continue
+            username = USERNAME_PREFIX + hashlib.sha256(data).hexdigest()[:24]
+            documents.setdefault(username, text)  # identical files import once
+        if not documents:
+            return
+
+        usernames = list(documents)
+        raw_texts = list(documents.values())
+        structured = (
+            self.extractor.map(_extract_or_none, raw_texts)
+            if self.extract else [None] * len(raw_texts)
+        )
+        model, index_name = active_embedding()
+        embeddings = generate_embeddings(raw_texts, model=model)
+        structured = list(structured)
+
+        profiles = save_profiles(usernames, structured, embeddings, model, raw_texts)
+        get_vector_store(index_name).upsert_many([
+            (f"candidate-{profile.user_id}-resume", embedding, {"type": "resume", "candidate_id": profile.user_id})
+            for profile, embedding in zip(profiles, embeddings)
+        ])
+        # bulk_create/bulk_update skip post_save, so update the derived tables here
+        for profile in profiles:
+            sync_structured_fields(profile)
+            index_profile(profile)
+        dual_write(ShadowEmbedding.KIND_CANDIDATE, profiles)
+        self.imported += len(profiles)
+
+
+def jobs_to_rescore(all_jobs):
+    """
+    Embedded jobs whose match scores need refreshing after an import: all of
+    them, or with all_jobs False only those missing a score for some
+    embedded candidate.
+    """
+    jobs = Job.objects.filter(embedding__isnull=False)
+    if all_jobs:
+        return jobs
+    candidates = CandidateProfile.objects.filter(embedding__isnull=False).count()
+    return jobs.annotate(scored=Count("match_scores")).filter(scored__lt=candidates)
+
+
+def _extract_or_none(text):
+    try:
+        return extract_structured_data(text, role="resume")
+    except Exception:
+        # The profile is still useful for ranking without structured data
+        return None
+
+
+def save_profiles(usernames, structured, embeddings, model, texts):
+    """
+    Create (or update) one candidate user and profile per username with
+    bulk queries. Returns the profiles in the order of `usernames`.
+    """
+    User = get_user_model()
+    with transaction.atomic():
+        existing = set(User.objects.filter(username__in=usernames).values_list("username", flat=True))
+        User.objects.bulk_create([
+            User(username=username, role="candidate", password=make_password(None))
+            for username in usernames if username not in existing
+        ])
+        user_ids = dict(User.objects.filter(username__in=usernames).values_list("username", "id"))
+
+        profiles = CandidateProfile.objects.in_bulk(
+            [user_ids[username] for username in usernames], field_name="user_id"
+        )
+        now = timezone.now()
+        created, updated, ordered = [], [], []
+        for username, resume_data, embedding, text in zip(usernames, structured, embeddings, texts):
+            user_id = user_ids[username]
+            profile = profiles.get(user_id)
+            if profile is None:
+                profile = CandidateProfile(user_id=user_id)
+                created.append(profile)
+            else:
+                updated.append(profile)
+            profile.resume_data = resume_data
+            profile.set_embedding(embedding, model, text=text)
+            profile.updated_at = now
+            ordered.append(profile)
+
+        CandidateProfile.objects.bulk_create(created)
+        CandidateProfile.objects.bulk_update(
+            updated,
+            ["resume_data", "embedding", "embedding_dtype", "embedding_model", "embedding_text", "updated_at"],
+        )
+    if created and created[0].pk is None:
+        # Backends without RETURNING don't set primary keys on bulk_create
+        ids = dict(
+            CandidateProfile.objects.filter(user_id__in=[profile.user_id for profile in created])
+            .values_list("user_id", "id")
+        )
+        for profile in created:
+            profile.pk = ids[profile.user_id]
+    return ordered
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("candidate", "0002_candidateprofile_embedding"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="candidateprofile",
+            name="location",
+            field=models.CharField(
+                blank=True, db_index=True, default="", max_length=255
+            ),
+        ),
+        migrations.AddField(
+            model_name="candidateprofile",
+            name="years_experience",
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.CreateModel(
+            name="CandidateSkill",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100)),
+                (
+                    "candidate",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="skills",
+                        to="candidate.candidateprofile",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["name", "candidate"], name="candidate_skill_name_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("candidate", "name"), name="unique_candidate_skill"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:51
+
+from django.db import migrations
+
+from candidate.structured import load_structured, resume_location, resume_skills, resume_years
+
+
+def parse_resume_data(apps, schema_editor):
+    """
+    Older rows hold the extraction model's raw string: store it as JSON and
+    fill in the denormalised skill, location and experience fields.
+    """
+    CandidateProfile = apps.get_model("candidate", "CandidateProfile")
+    CandidateSkill = apps.get_model("candidate", "CandidateSkill")
+    for profile in CandidateProfile.objects.exclude(resume_data=None).iterator():
+        profile.resume_data = load_structured(profile.resume_data)
+        profile.location = resume_location(profile.resume_data)
+        profile.years_experience = resume_years(profile.resume_data)
+        profile.save(update_fields=["resume_data", "location", "years_experience"])
+        CandidateSkill.objects.bulk_create(
+            [CandidateSkill(candidate=profile, name=name) for name in resume_skills(profile.resume_data)],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("candidate", "0003_structured_fields"),
+    ]
+
+    operations = [
+        migrations.RunPython(parse_resume_data, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:05
+
+import numpy as np
+from django.db import migrations, models
+
+# The model every existing JSON embedding was produced with
+LEGACY_EMBEDDING_MODEL = "text-embedding-ada-002"
+
+
+def pack_json_embeddings(apps, schema_editor):
+    CandidateProfile = apps.get_model("candidate", "CandidateProfile")
+    rows = CandidateProfile.objects.exclude(embedding_json=None).only("id", "embedding_json")
+    for row in rows.iterator():
+        row.embedding = np.asarray(row.embedding_json, dtype="<f4").tobytes()
+        row.embedding_dtype = "f32"
+        row.embedding_model = LEGACY_EMBEDDING_MODEL
+        row.save(update_fields=["embedding", "embedding_dtype", "embedding_model"])
+
+
+def unpack_json_embeddings(apps, schema_editor):
+    CandidateProfile = apps.get_model("candidate", "CandidateProfile")
+    rows = CandidateProfile.objects.exclude(embedding=None).only("id", "embedding", "embedding_dtype")
+    for row in rows.iterator():
+        dtype = {"f32": "<f4", "f16": "<f2"}.get(row.embedding_dtype)
+        if dtype is None:
+            scale = np.frombuffer(bytes(row.embedding)[:4], dtype="<f4")[0]
+            vector = np.frombuffer(bytes(row.embedding)[4:], dtype="i1") * scale
+        else:
+            vector = np.frombuffer(bytes(row.embedding), dtype=dtype)
+        row.embedding_json = vector.astype(float).tolist()
+        row.save(update_fields=["embedding_json"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("candidate", "0004_parse_resume_json"),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name="candidateprofile",
+            old_name="embedding",
+            new_name="embedding_json",
+        ),
+        migrations.AddField(
+            model_name="candidateprofile",
+            name="embedding",
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="candidateprofile",
+            name="embedding_dtype",
+            field=models.CharField(
+                choices=[
+                    ("f32", "float32"),
+                    ("f16", "float16"),
+                    ("i8", "int8 (per-vector scale)"),
+                ],
+                default="f32",
+                max_length=3,
+            ),
+        ),
+        migrations.AddField(
+            model_name="candidateprofile",
+            name="embedding_model",
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.RunPython(pack_json_embeddings, unpack_json_embeddings),
+        migrations.RemoveField(
+            model_name="candidateprofile",
+            name="embedding_json",
+        ),
+    ]
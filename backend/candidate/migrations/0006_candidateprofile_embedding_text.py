@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("candidate", "0005_packed_embedding"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="candidateprofile",
+            name="embedding_text",
+            field=models.TextField(blank=True),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:40
+
+from django.db import migrations
+
+INDEX_NAME = "candidate_resume_data_gin"
+
+
+def create_gin_index(apps, schema_editor):
+    # JSONField is jsonb on PostgreSQL; index it for containment (@>) lookups
+    # such as resume_data__contains. Other databases have no GIN indexes.
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON candidate_candidateprofile "
+        "USING gin (resume_data jsonb_path_ops)"
+    )
+
+
+def drop_gin_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("candidate", "0006_candidateprofile_embedding_text"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_gin_index, drop_gin_index),
+    ]
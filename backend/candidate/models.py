@@ -1,7 +1,9 @@
 from django.db import models
 from django.conf import settings
 
-class CandidateProfile(models.Model):
+from embedding.models import EmbeddedModel
+
+class CandidateProfile(EmbeddedModel):
     user = models.OneToOneField(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -9,8 +11,31 @@ class CandidateProfile(models.Model):
     )
     # We can store resume as structured JSON or plain text
     resume_data = models.JSONField(null=True, blank=True)
+    # Denormalised from resume_data on save, for indexed filtering
+    location = models.CharField(max_length=255, blank=True, default='', db_index=True)
+    years_experience = models.FloatField(null=True, blank=True, db_index=True)
     # Additional fields if needed
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Profile of {self.user.username}"
+
+
+class CandidateSkill(models.Model):
+    """
+    One row per skill listed in a profile's resume_data, normalised with
+    candidate.structured.normalize_name. Rebuilt whenever the profile is saved.
+    """
+    candidate = models.ForeignKey(CandidateProfile, on_delete=models.CASCADE, related_name='skills')
+    name = models.CharField(max_length=100)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['candidate', 'name'], name='unique_candidate_skill'),
+        ]
+        indexes = [
+            models.Index(fields=['name', 'candidate'], name='candidate_skill_name_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} (candidate {self.candidate_id})"
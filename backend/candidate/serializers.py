@@ -2,7 +2,9 @@ from rest_framework import serializers
 from .models import CandidateProfile
 
 class CandidateProfileSerializer(serializers.ModelSerializer):
+    skills = serializers.SlugRelatedField(many=True, read_only=True, slug_field='name')
+
     class Meta:
         model = CandidateProfile
-        fields = ['id', 'resume_data', 'updated_at']
-        read_only_fields = ['id', 'updated_at']
+        fields = ['id', 'resume_data', 'location', 'years_experience', 'skills', 'updated_at']
+        read_only_fields = ['id', 'location', 'years_experience', 'updated_at']
@@ -0,0 +1,32 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import CandidateProfile, CandidateSkill
+from .structured import resume_location, resume_skills, resume_years
+
+
+def sync_structured_fields(profile):
+    """
+    Copy skills, location and years of experience out of resume_data into
+    their indexed columns and rows.
+    """
+    location = resume_location(profile.resume_data)
+    years = resume_years(profile.resume_data)
+    with transaction.atomic():
+        # update() rather than save(), so this doesn't re-trigger post_save
+        CandidateProfile.objects.filter(pk=profile.pk).update(location=location, years_experience=years)
+        CandidateSkill.objects.filter(candidate=profile).delete()
+        CandidateSkill.objects.bulk_create(
+            [CandidateSkill(candidate=profile, name=name) for name in resume_skills(profile.resume_data)]
+        )
+    profile.location, profile.years_experience = location, years
+
+
+@receiver(post_save, sender=CandidateProfile)
+def sync_candidate_profile(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and "resume_data" not in update_fields:
+        return
+    sync_structured_fields(instance)
@@ -0,0 +1,93 @@
+import json
+import re
+
+MAX_SKILL_LENGTH = 100
+# Skill lists sometimes arrive as one delimited string; a parenthesised
+# alias ("Kubernetes (K8s)") becomes a skill of its own
+LIST_SPLIT_RE = re.compile(r"[,;|\n•()]")
+YEARS_RE = re.compile(r"\d+(?:\.\d+)?")
+
+
+def normalize_name(value):
+    """
+    Canonical form used for skill and location lookups: lower case with
+    collapsed whitespace, e.g. " Machine  Learning" -> "machine learning".
+    """
+    return " ".join(str(value).lower().split())
+
+
+def load_structured(data):
+    """
+    Structured resume/JD data as a dict. Rows saved before extraction
+    returned parsed JSON hold the model's raw string; anything that is not
+    a JSON object is kept as text.
+    """
+    if isinstance(data, dict):
+        return data
+    if data is None:
+        return {}
+    if isinstance(data, str):
+        try:
+            parsed = json.loads(data)
+        except ValueError:
+            return {"text": data}
+        return parsed if isinstance(parsed, dict) else {"text": data}
+    return {"text": data}
+
+
+def _lookup(data, key):
+    for name, value in data.items():
+        if str(name).lower() == key:
+            return value
+    return None
+
+
+def resume_skills(data):
+    """
+    The distinct normalised skills in a structured resume. Accepts a list,
+    a dict of lists (grouped skills) or a delimited string.
+    """
+    skills = []
+
+    def collect(value):
+        if isinstance(value, dict):
+            for item in value.values():
+                collect(item)
+        elif isinstance(value, list):
+            for item in value:
+                collect(item.get("name") if isinstance(item, dict) else item)
+        elif isinstance(value, str):
+            skills.extend(LIST_SPLIT_RE.split(value))
+
+    collect(_lookup(load_structured(data), "skills"))
+    names = (normalize_name(skill)[:MAX_SKILL_LENGTH] for skill in skills)
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def resume_location(data):
+    """
+    The normalised location of a structured resume ("" when absent). A dict
+    such as {"city": ..., "country": ...} is joined in order.
+    """
+    location = _lookup(load_structured(data), "location")
+    if isinstance(location, dict):
+        location = ", ".join(str(part) for part in location.values() if part)
+    elif isinstance(location, list):
+        location = ", ".join(str(part) for part in location if part)
+    return normalize_name(location)[:255] if location else ""
+
+
+def resume_years(data):
+    """
+    Total years of experience as a float, or None. Strings such as
+    "5+ years" are read by their first number.
+    """
+    years = _lookup(load_structured(data), "years_of_experience")
+    if isinstance(years, bool):
+        return None
+    if isinstance(years, (int, float)):
+        return float(years)
+    if isinstance(years, str):
+        match = YEARS_RE.search(years)
+        return float(match.group()) if match else None
+    return None
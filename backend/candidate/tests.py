@@ -1,3 +1,80 @@
+import io
+import os
+import tempfile
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
 
-# Create your tests here.
+from embedding.utils import file_parser
+from job.models import Job
+from similarity.models import MatchScore
+from similarity.utils import refresh_job_scores, reset_candidate_matrix
+from .management.commands import import_resumes
+from .models import CandidateProfile
+
+DIM = 8
+
+
+def fake_embeddings(texts, model=None):
+    return [np.random.default_rng(len(text)).standard_normal(DIM).tolist() for text in texts]
+
+
+@mock.patch.object(file_parser, "PARSER_MAX_WORKERS", 0)
+@mock.patch.object(import_resumes, "get_vector_store")
+@mock.patch.object(import_resumes, "generate_embeddings", side_effect=fake_embeddings)
+class ImportResumesTests(TestCase):
+    def setUp(self):
+        # Keep the bulk lane and budget share from leaking into other tests
+        bulk = mock.patch.object(import_resumes, "run_as_bulk")
+        bulk.start()
+        self.addCleanup(bulk.stop)
+        reset_candidate_matrix()
+        self.addCleanup(reset_candidate_matrix)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.source = os.path.join(tmp.name, "resumes")
+        os.makedirs(self.source)
+        for i, text in enumerate(["Go developer", "Python engineer with Django", "Kubernetes operator"]):
+            with open(os.path.join(self.source, f"resume-{i}.txt"), "w") as f:
+                f.write(text)
+
+        recruiter = get_user_model().objects.create(username="recruiter", role="job")
+        self.job = Job.objects.create(poster=recruiter, title="Engineer", description="")
+        self.job.set_embedding(np.ones(DIM), "test-model")
+        self.job.save()
+        refresh_job_scores(self.job)
+
+    def run_import(self):
+        call_command("import_resumes", self.source, "--no-extract", stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_import(self, embed, store):
+        self.run_import()
+        self.assertEqual(CandidateProfile.objects.filter(embedding__isnull=False).count(), 3)
+        self.assertEqual(MatchScore.objects.filter(job=self.job).count(), 3)
+        self.assertEqual(len(store.return_value.upsert_many.call_args.args[0]), 3)
+
+        # Everything is checkpointed: a second run imports nothing
+        embed.reset_mock()
+        self.run_import()
+        embed.assert_not_called()
+        self.assertEqual(CandidateProfile.objects.count(), 3)
+
+    def test_resumed_import_refreshes_scores_an_interrupted_run_missed(self, embed, store):
+        with mock.patch.object(import_resumes, "refresh_job_scores", side_effect=RuntimeError("killed")):
+            with self.assertRaises(RuntimeError):
+                self.run_import()
+        self.assertEqual(CandidateProfile.objects.count(), 3)
+        self.assertFalse(MatchScore.objects.filter(job=self.job).exists())
+
+        embed.reset_mock()
+        self.run_import()
+        embed.assert_not_called()
+        self.assertEqual(MatchScore.objects.filter(job=self.job).count(), 3)
+
+        # Scores are complete now, so a further run leaves them alone
+        with mock.patch.object(import_resumes, "refresh_job_scores") as refresh:
+            self.run_import()
+        refresh.assert_not_called()
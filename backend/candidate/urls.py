@@ -1,7 +1,8 @@
 from django.urls import path
-from .views import ResumeUploadView, CandidateProfileView
+from .views import ResumeUploadView, AsyncResumeUploadView, CandidateProfileView
 
 urlpatterns = [
     path('resume/upload/', ResumeUploadView.as_view(), name='resume-upload'),
+    path('resume/upload/async/', AsyncResumeUploadView.as_view(), name='resume-upload-async'),
     path('profile/', CandidateProfileView.as_view(), name='candidate-profile'),
 ]
@@ -0,0 +1,210 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from django.db.models import F
+from django.utils import timezone
+
+from backend.metrics import CACHE_LOOKUPS
+
+from .models import CachedEmbedding, CachedExtraction
+from .utils.file_parser import clean_text
+from .vectors import pack_embedding, unpack_embedding
+
+# Entries kept in each process's in-memory LRU
+EMBEDDING_CACHE_MEMORY_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MEMORY_ENTRIES", "1024"))
+# Rows kept in the CachedEmbedding table before the least recently used are evicted
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "100000"))
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Rows kept in the CachedExtraction table before the least recently used are evicted
+EXTRACTION_CACHE_MAX_ENTRIES = int(os.getenv("EXTRACTION_CACHE_MAX_ENTRIES", "50000"))
+EXTRACTION_CACHE_ENABLED = os.getenv("EXTRACTION_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Check the table size after this many inserts rather than on every write
+EVICTION_CHECK_INTERVAL = 100
+
+
+def cache_key(text, model):
+    """
+    Content address of a text: sha256 of the model name and the cleaned text.
+    """
+    digest = hashlib.sha256()
+    digest.update(model.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(clean_text(text).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def text_digest(text):
+    """
+    sha256 of the cleaned text, the document part of an extraction cache key.
+    """
+    return hashlib.sha256(clean_text(text).encode("utf-8")).hexdigest()
+
+
+def evict_least_recent(model, max_entries):
+    """
+    Delete the rows of a cache table with the oldest last_used_at beyond
+    max_entries. Returns the number of rows removed.
+    """
+    excess = model.objects.count() - max_entries
+    if excess <= 0:
+        return 0
+    stale = model.objects.order_by("last_used_at").values_list("id", flat=True)[:excess]
+    deleted, _ = model.objects.filter(id__in=list(stale)).delete()
+    return deleted
+
+
+class EmbeddingCache:
+    """
+    Two-level embedding cache: a per-process LRU in front of the shared
+    CachedEmbedding table.
+    """
+
+    def __init__(self, memory_entries=EMBEDDING_CACHE_MEMORY_ENTRIES, max_entries=EMBEDDING_CACHE_MAX_ENTRIES):
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes_since_eviction = 0
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def _remember(self, key, vector):
+        # Caller holds self._lock
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.memory_entries:
+            self._lru.popitem(last=False)
+
+    def get_many(self, keys):
+        """
+        Return {key: vector} for every key found in memory or in the table.
+        """
+        found = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                vector = self._lru.get(key)
+                if vector is None:
+                    missing.append(key)
+                else:
+                    self._lru.move_to_end(key)
+                    found[key] = vector
+            self.memory_hits += len(found)
+
+        if missing:
+            rows = CachedEmbedding.objects.filter(key__in=missing).values_list("key", "vector")
+            from_db = {key: unpack_embedding(vector).tolist() for key, vector in rows}
+            if from_db:
+                CachedEmbedding.objects.filter(key__in=list(from_db)).update(
+                    last_used_at=timezone.now(), hit_count=F("hit_count") + 1
+                )
+            with self._lock:
+                for key, vector in from_db.items():
+                    self._remember(key, vector)
+                self.db_hits += len(from_db)
+                self.misses += len(missing) - len(from_db)
+            found.update(from_db)
+            CACHE_LOOKUPS.inc(len(from_db), cache="embedding", result="db_hit")
+            CACHE_LOOKUPS.inc(len(missing) - len(from_db), cache="embedding", result="miss")
+        CACHE_LOOKUPS.inc(len(keys) - len(missing), cache="embedding", result="memory_hit")
+        return found
+
+    def set_many(self, model, vectors):
+        """
+        Store {key: vector} computed with `model`.
+        """
+        if not vectors:
+            return
+        CachedEmbedding.objects.bulk_create(
+            [CachedEmbedding(key=key, model=model, vector=pack_embedding(vector)) for key, vector in vectors.items()],
+            ignore_conflicts=True,
+        )
+        with self._lock:
+            for key, vector in vectors.items():
+                self._remember(key, vector)
+            self._writes_since_eviction += len(vectors)
+            check = self._writes_since_eviction >= EVICTION_CHECK_INTERVAL
+            if check:
+                self._writes_since_eviction = 0
+        if check:
+            self.evict()
+
+    def evict(self):
+        """
+        Delete the least recently used rows beyond max_entries.
+        Returns the number of rows removed.
+        """
+        return evict_least_recent(CachedEmbedding, self.max_entries)
+
+    def clear_memory(self):
+        with self._lock:
+            self._lru.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "memory_entries": len(self._lru),
+            }
+
+
+embedding_cache = EmbeddingCache()
+
+
+class ExtractionCache:
+    """
+    Structured extractions in the shared CachedExtraction table, keyed on
+    (text_digest, role, prompt version).
+    """
+
+    def __init__(self, max_entries=EXTRACTION_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes_since_eviction = 0
+
+    def get(self, text_hash, role, prompt_version):
+        """
+        The cached CachedExtraction row, or None.
+        """
+        entry = CachedExtraction.objects.filter(
+            text_hash=text_hash, role=role, prompt_version=prompt_version
+        ).first()
+        if entry is not None:
+            CachedExtraction.objects.filter(pk=entry.pk).update(
+                last_used_at=timezone.now(), hit_count=F("hit_count") + 1
+            )
+        return entry
+
+    def set(self, text_hash, role, prompt_version, data, prompt_tokens=0, completion_tokens=0):
+        CachedExtraction.objects.bulk_create(
+            [
+                CachedExtraction(
+                    text_hash=text_hash,
+                    role=role,
+                    prompt_version=prompt_version,
+                    data=data,
+                    prompt_tokens=prompt_tokens,
+                    completion_tokens=completion_tokens,
+                )
+            ],
+            ignore_conflicts=True,
+        )
+        with self._lock:
+            self._writes_since_eviction += 1
+            check = self._writes_since_eviction >= EVICTION_CHECK_INTERVAL
+            if check:
+                self._writes_since_eviction = 0
+        if check:
+            self.evict()
+
+    def evict(self):
+        return evict_least_recent(CachedExtraction, self.max_entries)
+
+
+extraction_cache = ExtractionCache()
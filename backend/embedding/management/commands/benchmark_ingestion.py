@@ -0,0 +1,411 @@
+import io
+import json
+import os
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+import docx
+import numpy as np
+import openai
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.db.models import Sum
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from backend import metrics
+from embedding.models import IngestionTask
+from embedding.reembed import active_embedding
+from embedding.utils import pinecone_client
+from embedding.utils.fake_services import DEFAULT_DIMENSION, start_fake_services
+from embedding.utils.vector_store import get_vector_store
+from embedding.worker import run_task
+
+FORMATS = (".txt", ".docx", ".pdf")
+# Stages reported, in pipeline order (see embedding.pipeline)
+STAGES = ("parse", "embed", "upsert", "extract", "save", "score", "openai_wait", "db")
+
+SKILLS = [
+    "Python", "Django", "PostgreSQL", "React", "TypeScript", "Kubernetes", "AWS", "Terraform", "Kafka",
+    "Spark", "Go", "Rust", "Java", "Spring", "GraphQL", "Redis", "Airflow", "TensorFlow", "PyTorch", "SQL",
+]
+TITLES = ["Backend Engineer", "Data Engineer", "Frontend Developer", "ML Engineer", "Platform Engineer", "SRE"]
+COMPANIES = ["Acme Corp", "Globex", "Initech", "Umbrella", "Hooli", "Stark Industries", "Wayne Enterprises"]
+
+
+def document_lines(kind, serial, rng):
+    """
+    A synthetic resume or job description. The serial and a random token
+    make every document unique, so the embedding and extraction caches miss.
+    """
+    skills = rng.sample(SKILLS, 6)
+    title = rng.choice(TITLES)
+    if kind == IngestionTask.KIND_RESUME:
+        lines = [f"Candidate {serial} ({uuid.uuid4().hex[:8]})", f"{title} with {rng.randint(1, 15)} years of experience"]
+        lines.append("Skills: " + ", ".join(skills))
+        for company in rng.sample(COMPANIES, 3):
+            lines.append(f"{rng.choice(TITLES)} at {company}, {rng.randint(2008, 2024)}")
+            lines.extend(f"- Built {skill} services handling {rng.randint(1, 900)}k requests a day" for skill in rng.sample(skills, 2))
+        lines.append(f"Education: BSc Computer Science, {rng.randint(2000, 2020)}")
+    else:
+        lines = [f"{title} (job {serial}, {uuid.uuid4().hex[:8]})", f"{rng.choice(COMPANIES)} is hiring a {title}."]
+        lines.append(f"Requirements: {rng.randint(2, 8)}+ years with " + ", ".join(skills[:4]))
+        lines.append("Nice to have: " + ", ".join(skills[4:]))
+        lines.extend(f"- You will own our {skill} stack end to end" for skill in skills[:3])
+    return lines
+
+
+def minimal_pdf(lines):
+    """
+    A one-page PDF showing `lines` in Helvetica; enough for pdfminer to
+    extract the text.
+    """
+    def escape(line):
+        return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    content = "BT /F1 10 Tf 14 TL 50 800 Td " + " ".join(f"({escape(line)}) '" for line in lines) + " ET"
+    content = content.encode("latin-1", "replace")
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+        b"/Resources << /Font << /F1 5 0 R >> >> /Contents 4 0 R >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    out.writelines(b"%010d 00000 n \n" % offset for offset in offsets)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def render_document(lines, extension):
+    if extension == ".pdf":
+        return minimal_pdf(lines)
+    if extension == ".docx":
+        document = docx.Document()
+        for line in lines:
+            document.add_paragraph(line)
+        out = io.BytesIO()
+        document.save(out)
+        return out.getvalue()
+    return "\n".join(lines).encode()
+
+
+def generate_documents(kind, count, formats, rng):
+    """
+    [(filename, bytes)] of `count` synthetic documents cycling through `formats`.
+    """
+    documents = []
+    for serial in range(count):
+        extension = formats[serial % len(formats)]
+        lines = document_lines(kind, serial, rng)
+        documents.append((f"{kind}-{serial}{extension}", render_document(lines, extension)))
+    return documents
+
+
+def load_corpus(path):
+    """
+    Documents for each kind read from `path`: its resumes/ and jds/
+    subdirectories if it has them, otherwise every file for both kinds.
+    """
+    def read(directory):
+        documents = []
+        for name in sorted(os.listdir(directory)):
+            full = os.path.join(directory, name)
+            if os.path.isfile(full) and os.path.splitext(name)[1].lower() in FORMATS:
+                with open(full, "rb") as f:
+                    documents.append((name, f.read()))
+        return documents
+
+    if not os.path.isdir(path):
+        raise CommandError(f"{path} is not a directory.")
+    resumes_dir, jds_dir = os.path.join(path, "resumes"), os.path.join(path, "jds")
+    if os.path.isdir(resumes_dir) and os.path.isdir(jds_dir):
+        corpus = {IngestionTask.KIND_RESUME: read(resumes_dir), IngestionTask.KIND_JD: read(jds_dir)}
+    else:
+        documents = read(path)
+        corpus = {IngestionTask.KIND_RESUME: documents, IngestionTask.KIND_JD: documents}
+    if not all(corpus.values()):
+        raise CommandError(f"No {', '.join(FORMATS)} files found in {path}.")
+    return corpus
+
+
+def summarize(samples_ms):
+    if not samples_ms:
+        return None
+    values = np.asarray(samples_ms, dtype=np.float64)
+    p50, p99 = np.percentile(values, [50, 99])
+    return {"count": len(values), "p50": round(p50, 2), "p99": round(p99, 2), "mean": round(values.mean(), 2)}
+
+
+def process(task_id):
+    """
+    Run one queued task until it succeeds or fails for good, retrying
+    transient failures straight away instead of after their backoff.
+    Returns ({stage: seconds}, total seconds), summed over every attempt.
+    """
+    timings, token = metrics.start_request_timings()
+    started = time.perf_counter()
+    try:
+        while True:
+            run_task(task_id)
+            # run_task put it back to pending (with a run_after) to retry later
+            if not IngestionTask.objects.filter(pk=task_id, status=IngestionTask.STATUS_PENDING).update(run_after=None):
+                break
+    finally:
+        close_old_connections()
+        metrics.reset_request_timings(token)
+    return timings, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test resume uploads and job creation: POST a corpus of PDF/DOCX/TXT documents to "
+        "/api/candidate/resume/upload/ and /api/job/create/, run the queued pipeline, and report "
+        "p50/p99 latency and docs/sec per stage. With --fake, OpenAI and Pinecone are replaced by local "
+        "stand-ins (embedding.utils.fake_services) with configurable latency and errors."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--resumes", type=int, default=30, help="Resumes to upload.")
+        parser.add_argument("--jobs", type=int, default=10, help="Jobs to create.")
+        parser.add_argument("--corpus", help="Directory of documents to upload instead of generated ones.")
+        parser.add_argument("--formats", default="txt,docx,pdf", help="Formats of generated documents.")
+        parser.add_argument("--concurrency", type=int, default=4, help="Uploads sent in parallel.")
+        parser.add_argument("--workers", type=int, default=4, help="Pipeline tasks processed in parallel.")
+        parser.add_argument("--fake", action="store_true", help="Run against local fake OpenAI and Pinecone APIs.")
+        parser.add_argument("--latency-ms", type=float, default=50.0, help="Fake API latency per request.")
+        parser.add_argument("--jitter-ms", type=float, default=20.0, help="Fake API extra random latency.")
+        parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake API requests that fail.")
+        parser.add_argument("--error-status", type=int, default=503, help="HTTP status of injected failures.")
+        parser.add_argument("--dimension", type=int, default=DEFAULT_DIMENSION, help="Fake embedding dimension.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="Append the result as one JSON line to this file.")
+        parser.add_argument("--keep", action="store_true", help="Keep the benchmark users, jobs and vectors.")
+
+    def handle(self, *args, **options):
+        if not metrics.ENABLED:
+            raise CommandError("Per-stage timings need METRICS_ENABLED.")
+        if options["resumes"] < 0 or options["jobs"] < 0 or options["resumes"] + options["jobs"] == 0:
+            raise CommandError("--resumes and --jobs must not be negative, and not both 0.")
+        if options["concurrency"] < 1 or options["workers"] < 1:
+            raise CommandError("--concurrency and --workers must be at least 1.")
+
+        rng = random.Random(options["seed"])
+        if options["corpus"]:
+            corpus = load_corpus(options["corpus"])
+        else:
+            formats = [f".{name.strip().lstrip('.')}" for name in options["formats"].split(",") if name.strip()]
+            if not formats or set(formats) - set(FORMATS):
+                raise CommandError(f"--formats must be a subset of {','.join(f[1:] for f in FORMATS)}.")
+            corpus = {
+                IngestionTask.KIND_RESUME: generate_documents(IngestionTask.KIND_RESUME, options["resumes"], formats, rng),
+                IngestionTask.KIND_JD: generate_documents(IngestionTask.KIND_JD, options["jobs"], formats, rng),
+            }
+
+        with ExitStack() as stack:
+            stack.enter_context(override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+                # Tasks are run by the benchmark itself so each stage can be timed
+                INGESTION_WORKERS=0,
+            ))
+            server = self.start_fakes(stack, options) if options["fake"] else None
+            if server is None:
+                self.stdout.write(self.style.WARNING(
+                    "Using the configured OpenAI and vector store backends; this sends real API requests."
+                ))
+            result = self.run(corpus, options)
+            if server is not None:
+                stats = server.stats()
+                result["fake_services"] = {"requests": stats["requests"], "errors": stats["errors"]}
+
+        self.report(result)
+        if options["output"]:
+            with open(options["output"], "a") as f:
+                f.write(json.dumps(result) + "\n")
+            self.stdout.write(f"Result appended to {options['output']}.")
+
+    def start_fakes(self, stack, options):
+        """
+        Start the fake OpenAI/Pinecone server and point this process at it
+        until `stack` exits.
+        """
+        _, index_name = active_embedding()
+        server = start_fake_services(
+            latency_ms=options["latency_ms"],
+            jitter_ms=options["jitter_ms"],
+            error_rate=options["error_rate"],
+            error_status=options["error_status"],
+            dimension=options["dimension"],
+            indexes=[index_name or pinecone_client.INDEX_NAME],
+            seed=options["seed"],
+        )
+        stack.callback(server.shutdown)
+
+        api_base, api_key = openai.api_base, openai.api_key
+        openai.api_base, openai.api_key = server.openai_base, "fake"
+        stack.callback(setattr, openai, "api_base", api_base)
+        stack.callback(setattr, openai, "api_key", api_key)
+
+        stack.callback(pinecone_client.configure, pinecone_client.PINECONE_API_KEY, pinecone_client.PINECONE_HOST)
+        pinecone_client.configure(api_key="fake", host=server.url)
+        stack.enter_context(override_settings(VECTOR_STORE_BACKEND="pinecone"))
+        self.stdout.write(f"Fake OpenAI and Pinecone APIs on {server.url}.")
+        return server
+
+    def run(self, corpus, options):
+        User = get_user_model()
+        password = make_password(None)
+        prefix = f"bench-ingest-{uuid.uuid4().hex[:8]}"
+        recruiter = User.objects.create(username=f"{prefix}-recruiter", role="job", password=password)
+        User.objects.bulk_create([
+            User(username=f"{prefix}-{i}", role="candidate", password=password) for i in range(options["resumes"])
+        ])
+        candidates = list(User.objects.filter(username__startswith=f"{prefix}-", role="candidate").order_by("id"))
+
+        uploads = [
+            (IngestionTask.KIND_RESUME, user, corpus[IngestionTask.KIND_RESUME][i % len(corpus[IngestionTask.KIND_RESUME])])
+            for i, user in enumerate(candidates)
+        ] + [
+            (IngestionTask.KIND_JD, recruiter, corpus[IngestionTask.KIND_JD][i % len(corpus[IngestionTask.KIND_JD])])
+            for i in range(options["jobs"])
+        ]
+        tokens = {user.id: str(RefreshToken.for_user(user).access_token) for user in [recruiter, *candidates]}
+
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options["concurrency"], thread_name_prefix="bench-upload") as executor:
+                uploaded = list(executor.map(lambda upload: self.upload(*upload, tokens), uploads))
+            upload_seconds = time.perf_counter() - started
+
+            task_ids = [task_id for _, _, task_id in uploaded if task_id]
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options["workers"], thread_name_prefix="bench-ingest") as executor:
+                processed = list(executor.map(process, task_ids))
+            pipeline_seconds = time.perf_counter() - started
+
+            tasks = IngestionTask.objects.filter(pk__in=task_ids)
+            failures = list(tasks.filter(status=IngestionTask.STATUS_FAILED).values_list("error", flat=True))
+            succeeded = tasks.filter(status=IngestionTask.STATUS_SUCCEEDED).count()
+            retries = tasks.aggregate(retries=Sum("attempts"))["retries"] or 0
+            retries -= len(task_ids)
+        finally:
+            if not options["keep"]:
+                self.clean_up(prefix)
+
+        stages = {}
+        for stage in STAGES:
+            stats = summarize([timings[stage] * 1000 for timings, _ in processed if stage in timings])
+            if stats:
+                stats["docs_per_s_per_worker"] = round(1000 / stats["mean"], 1) if stats["mean"] else None
+                stages[stage] = stats
+
+        return {
+            "timestamp": timezone.now().isoformat(),
+            "documents": len(uploads),
+            "formats": sorted({os.path.splitext(name)[1] for _, _, (name, _) in uploads}),
+            "fake": options["fake"],
+            "latency_ms": options["latency_ms"] if options["fake"] else None,
+            "error_rate": options["error_rate"] if options["fake"] else None,
+            "concurrency": options["concurrency"],
+            "workers": options["workers"],
+            "upload_ms": {
+                kind: summarize([elapsed for upload_kind, elapsed, _ in uploaded if upload_kind == kind])
+                for kind in (IngestionTask.KIND_RESUME, IngestionTask.KIND_JD)
+            },
+            "upload_errors": len(uploads) - len(task_ids),
+            "upload_docs_per_s": round(len(uploads) / upload_seconds, 1),
+            "stages": stages,
+            "pipeline_ms": summarize([seconds * 1000 for _, seconds in processed]),
+            "pipeline_docs_per_s": round(len(task_ids) / pipeline_seconds, 1) if task_ids else None,
+            "succeeded": succeeded,
+            "failed": len(failures),
+            "retries": retries,
+            "errors": sorted(set(failures))[:5],
+        }
+
+    def upload(self, kind, user, document, tokens):
+        """
+        POST one document. Returns (kind, elapsed ms, task id or None).
+        """
+        name, data = document
+        client = Client(HTTP_AUTHORIZATION=f"Bearer {tokens[user.id]}")
+        if kind == IngestionTask.KIND_RESUME:
+            url, payload = reverse("resume-upload"), {"resume_file": SimpleUploadedFile(name, data)}
+        else:
+            url = reverse("job-create")
+            payload = {"title": f"Benchmark {name}", "description": "", "jd_file": SimpleUploadedFile(name, data)}
+        try:
+            started = time.perf_counter()
+            response = client.post(url, payload)
+            elapsed = (time.perf_counter() - started) * 1000
+        finally:
+            close_old_connections()
+        if response.status_code != 202:
+            self.stderr.write(f"POST {url} returned {response.status_code}: {response.content[:200]!r}")
+            return kind, elapsed, None
+        return kind, elapsed, response.json()["task_id"]
+
+    def clean_up(self, prefix):
+        """
+        Delete the benchmark's vectors, then its users (with their profiles,
+        jobs and tasks).
+        """
+        User = get_user_model()
+        users = User.objects.filter(username__startswith=f"{prefix}-")
+        doc_ids = [f"candidate-{user_id}-resume" for user_id in users.filter(role="candidate").values_list("id", flat=True)]
+        doc_ids += [f"job-{job_id}-jd" for job_id in users.filter(role="job").values_list("jobs__id", flat=True) if job_id]
+        _, index_name = active_embedding()
+        try:
+            if doc_ids:
+                get_vector_store(index_name).delete(doc_ids)
+        except Exception as e:
+            self.stderr.write(f"Could not delete the benchmark vectors: {e}")
+        users.delete()
+
+    def report(self, result):
+        def line(label, stats, extra=""):
+            if not stats:
+                return f"  {label:<16} -"
+            return f"  {label:<16} p50 {stats['p50']:>8.1f} / p99 {stats['p99']:>8.1f} ms{extra}"
+
+        lines = [
+            f"{result['documents']} document(s) {'/'.join(result['formats'])}, "
+            f"{result['concurrency']} upload thread(s), {result['workers']} pipeline worker(s)"
+            + (f", fake APIs at {result['latency_ms']} ms, {result['error_rate']:.0%} errors" if result["fake"] else ""),
+            "uploads:",
+            line("resume upload", result["upload_ms"][IngestionTask.KIND_RESUME]),
+            line("job create", result["upload_ms"][IngestionTask.KIND_JD]),
+            f"  {result['upload_docs_per_s']} docs/s accepted, {result['upload_errors']} rejected",
+            "pipeline stages:",
+        ]
+        for stage, stats in result["stages"].items():
+            lines.append(line(stage, stats, f"  ({stats['docs_per_s_per_worker']} docs/s per worker)"))
+        lines.append(line("end to end", result["pipeline_ms"]))
+        lines.append(
+            f"  {result['pipeline_docs_per_s']} docs/s, {result['succeeded']} succeeded, {result['failed']} failed "
+            f"({result['retries']} retried attempt(s))"
+        )
+        lines.extend(f"  error: {error}" for error in result["errors"])
+        if "fake_services" in result:
+            lines.append(f"fake API requests: {result['fake_services']['requests']}")
+            if result["fake_services"]["errors"]:
+                lines.append(f"fake API errors injected: {result['fake_services']['errors']}")
+        self.stdout.write("\n".join(lines))
@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from embedding.models import ExtractionUsage
+
+
+class Command(BaseCommand):
+    help = "Summarise structured-extraction calls: cache hits, tokens spent and saved, and text trimmed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=7, help="How many days back to report (0 for all time).")
+
+    def handle(self, *args, **options):
+        calls = ExtractionUsage.objects.all()
+        if options["days"]:
+            calls = calls.filter(created_at__gte=timezone.now() - timedelta(days=options["days"]))
+
+        for row in calls.values("role").order_by("role").annotate(
+            calls=Count("id"),
+            hits=Count("id", filter=Q(cached=True)),
+            prompt_tokens=Sum("prompt_tokens"),
+            completion_tokens=Sum("completion_tokens"),
+            saved_tokens=Sum("saved_tokens"),
+            input_chars=Sum("input_chars", filter=Q(cached=False)),
+            sent_chars=Sum("sent_chars"),
+            duration_ms=Sum("duration_ms", filter=Q(cached=False)),
+        ):
+            misses = row["calls"] - row["hits"]
+            trimmed = 1 - row["sent_chars"] / row["input_chars"] if row["input_chars"] else 0
+            self.stdout.write(
+                f"{row['role']}: {row['calls']} call(s), {row['hits']} cache hit(s) "
+                f"({row['hits'] / row['calls']:.0%})\n"
+                f"  tokens spent: {row['prompt_tokens']} prompt + {row['completion_tokens']} completion, "
+                f"saved by cache: {row['saved_tokens']}\n"
+                f"  text trimmed before sending: {trimmed:.0%}, "
+                f"mean extraction time: {row['duration_ms'] / misses if misses else 0:.0f} ms"
+            )
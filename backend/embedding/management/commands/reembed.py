@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from embedding.models import EmbeddingMigration
+from embedding.reembed import (
+    REEMBED_BATCH_SIZE,
+    active_embedding,
+    pending_migration,
+    run_migration,
+    start_migration,
+    switch_migration,
+)
+from embedding.utils.openai_client import run_as_bulk
+from job.models import Job
+from similarity.utils import refresh_job_scores
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-embed every candidate profile and job with a new embedding model into a shadow index, "
+        "then (with --switch) make it the active model. Safe to interrupt and re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("model", nargs="?", help="Embedding model to migrate to, e.g. text-embedding-3-small.")
+        parser.add_argument("--batch-size", type=int, default=REEMBED_BATCH_SIZE, help="Documents embedded per request.")
+        parser.add_argument("--switch", action="store_true", help="Switch reads to the new model once the backfill is done.")
+        parser.add_argument(
+            "--force", action="store_true", help="With --switch: drop embeddings of documents that could not be re-embedded."
+        )
+        parser.add_argument("--cancel", action="store_true", help="Abandon the pending migration.")
+        parser.add_argument("--status", action="store_true", help="Show the active model and any pending migration.")
+
+    def handle(self, *args, **options):
+        run_as_bulk()
+        if options["status"]:
+            return self.show_status()
+        if options["cancel"]:
+            cancelled = EmbeddingMigration.objects.filter(
+                status__in=[EmbeddingMigration.STATUS_RUNNING, EmbeddingMigration.STATUS_READY]
+            ).update(status=EmbeddingMigration.STATUS_CANCELLED)
+            self.stdout.write(f"Cancelled {cancelled} migration(s).")
+            return
+        if not options["model"]:
+            raise CommandError("Give the model to migrate to (or --status / --cancel).")
+
+        try:
+            migration = start_migration(options["model"])
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(f"Backfilling {migration.model} into index {migration.index_name}...")
+        run_migration(migration, batch_size=options["batch_size"], on_batch=self.report)
+        self.stdout.write(self.style.SUCCESS(
+            f"Backfill complete: {migration.embedded} embedded, {migration.skipped} unchanged."
+        ))
+
+        if not options["switch"]:
+            self.stdout.write("Run again with --switch to make it the active model.")
+            return
+        try:
+            dropped = switch_migration(migration, batch_size=options["batch_size"], force=options["force"])
+        except ValueError as e:
+            raise CommandError(str(e))
+        if dropped:
+            self.stdout.write(self.style.WARNING(f"{dropped} document(s) were left without an embedding."))
+        self.stdout.write(self.style.SUCCESS(f"Switched to {migration.model}. Refreshing job match scores..."))
+        for job in Job.objects.filter(embedding__isnull=False).only("id", "embedding", "embedding_dtype").iterator():
+            refresh_job_scores(job)
+
+    def report(self, migration):
+        self.stdout.write(
+            f"  candidates up to #{migration.last_candidate_id}, jobs up to #{migration.last_job_id}: "
+            f"{migration.embedded} embedded, {migration.skipped} unchanged"
+        )
+
+    def show_status(self):
+        model, index_name = active_embedding()
+        self.stdout.write(f"Active model: {model} (index {index_name or 'default'})")
+        migration = pending_migration()
+        if migration is None:
+            self.stdout.write("No migration pending.")
+        else:
+            self.stdout.write(f"Pending: {migration}")
+            self.report(migration)
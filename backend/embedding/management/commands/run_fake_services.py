@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from embedding.utils.fake_services import DEFAULT_DIMENSION, start_fake_services
+from embedding.utils.pinecone_client import INDEX_NAME
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve local stand-ins for the OpenAI embedding/chat and Pinecone APIs, with optional latency "
+        "and error injection. Point OPENAI_API_BASE and PINECONE_HOST at it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8900)
+        parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every request.")
+        parser.add_argument("--jitter-ms", type=float, default=0.0, help="Extra random delay of up to this much.")
+        parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail.")
+        parser.add_argument("--error-status", type=int, default=503, help="HTTP status of injected failures.")
+        parser.add_argument("--dimension", type=int, default=DEFAULT_DIMENSION, help="Embedding dimension.")
+        parser.add_argument(
+            "--index", action="append", dest="indexes",
+            help=f"Pinecone index to create up front (repeatable, default {INDEX_NAME}).",
+        )
+        parser.add_argument("--seed", type=int, help="Random seed for latency jitter and injected errors.")
+
+    def handle(self, *args, **options):
+        server = start_fake_services(
+            options["host"],
+            options["port"],
+            latency_ms=options["latency_ms"],
+            jitter_ms=options["jitter_ms"],
+            error_rate=options["error_rate"],
+            error_status=options["error_status"],
+            dimension=options["dimension"],
+            indexes=options["indexes"] or [INDEX_NAME],
+            seed=options["seed"],
+        )
+        self.stdout.write(
+            f"Fake OpenAI and Pinecone APIs listening on {server.url}. Run the app with:\n"
+            f"  OPENAI_API_BASE={server.openai_base} OPENAI_API_KEY=fake "
+            f"PINECONE_HOST={server.url} PINECONE_API_KEY=fake VECTOR_STORE_BACKEND=pinecone"
+        )
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.shutdown()
+            self.stdout.write(f"Stopped. {server.stats()}")
@@ -0,0 +1,53 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from embedding.worker import DEFAULT_STALE_AFTER, pending_task_ids, requeue_stale, run_task
+
+
+class Command(BaseCommand):
+    help = "Process queued resume/JD ingestion tasks from the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Number of tasks processed concurrently.")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds to sleep when the queue is empty.")
+        parser.add_argument(
+            "--stale-after",
+            type=int,
+            default=int(DEFAULT_STALE_AFTER.total_seconds()),
+            help="Requeue tasks that have been running for longer than this many seconds.",
+        )
+        parser.add_argument("--once", action="store_true", help="Drain the current queue and exit.")
+
+    def handle(self, *args, **options):
+        workers = options["workers"]
+        stale_after = timedelta(seconds=options["stale_after"])
+
+        requeued = requeue_stale(stale_after)
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale task(s).")
+
+        processed = 0
+        # future -> task id; topped up as tasks finish so one slow task
+        # doesn't hold the others' slots
+        running = {}
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingestion") as executor:
+            while True:
+                task_ids = pending_task_ids(limit=workers * 2 - len(running), exclude=running.values())
+                for task_id in task_ids:
+                    running[executor.submit(run_task, task_id)] = task_id
+                if not running:
+                    if options["once"]:
+                        break
+                    time.sleep(options["poll_interval"])
+                    requeue_stale(stale_after)
+                    continue
+                done, _ = wait(running, timeout=options["poll_interval"], return_when=FIRST_COMPLETED)
+                for future in done:
+                    del running[future]
+                    future.result()
+                processed += len(done)
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} task(s)."))
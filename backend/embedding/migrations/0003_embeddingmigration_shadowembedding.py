@@ -0,0 +1,102 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("embedding", "0002_cachedembedding"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EmbeddingMigration",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("model", models.CharField(max_length=100)),
+                ("index_name", models.CharField(max_length=45)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("running", "Running"),
+                            ("ready", "Ready to switch"),
+                            ("switched", "Switched"),
+                            ("cancelled", "Cancelled"),
+                        ],
+                        default="running",
+                        max_length=20,
+                    ),
+                ),
+                ("last_candidate_id", models.BigIntegerField(default=0)),
+                ("last_job_id", models.BigIntegerField(default=0)),
+                ("embedded", models.PositiveIntegerField(default=0)),
+                ("skipped", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("switched_at", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ShadowEmbedding",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("candidate", "Candidate profile"), ("job", "Job")],
+                        max_length=20,
+                    ),
+                ),
+                ("object_id", models.BigIntegerField()),
+                ("embedding", models.BinaryField()),
+                (
+                    "embedding_dtype",
+                    models.CharField(
+                        choices=[
+                            ("f32", "float32"),
+                            ("f16", "float16"),
+                            ("i8", "int8 (per-vector scale)"),
+                        ],
+                        default="f32",
+                        max_length=3,
+                    ),
+                ),
+                ("text_hash", models.CharField(max_length=64)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "migration",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="shadow_embeddings",
+                        to="embedding.embeddingmigration",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("migration", "kind", "object_id"),
+                        name="unique_shadow_embedding",
+                    )
+                ],
+            },
+        ),
+    ]
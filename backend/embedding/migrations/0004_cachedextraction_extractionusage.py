@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("embedding", "0003_embeddingmigration_shadowembedding"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExtractionUsage",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("role", models.CharField(max_length=10)),
+                ("prompt_version", models.CharField(max_length=20)),
+                ("cached", models.BooleanField(default=False)),
+                ("chunks", models.PositiveSmallIntegerField(default=0)),
+                ("input_chars", models.PositiveIntegerField(default=0)),
+                ("sent_chars", models.PositiveIntegerField(default=0)),
+                ("prompt_tokens", models.PositiveIntegerField(default=0)),
+                ("completion_tokens", models.PositiveIntegerField(default=0)),
+                ("saved_tokens", models.PositiveIntegerField(default=0)),
+                ("duration_ms", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="CachedExtraction",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("text_hash", models.CharField(max_length=64)),
+                ("role", models.CharField(max_length=10)),
+                ("prompt_version", models.CharField(max_length=20)),
+                ("data", models.JSONField()),
+                ("prompt_tokens", models.PositiveIntegerField(default=0)),
+                ("completion_tokens", models.PositiveIntegerField(default=0)),
+                ("hit_count", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "last_used_at",
+                    models.DateTimeField(auto_now_add=True, db_index=True),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("text_hash", "role", "prompt_version"),
+                        name="unique_cached_extraction",
+                    )
+                ],
+            },
+        ),
+    ]
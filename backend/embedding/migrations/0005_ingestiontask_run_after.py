@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("embedding", "0004_cachedextraction_extractionusage"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ingestiontask",
+            name="run_after",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
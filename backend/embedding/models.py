@@ -1,3 +1,236 @@
+import uuid
+
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+from .vectors import DTYPE_CHOICES, DTYPE_FLOAT32, EMBEDDING_STORAGE_DTYPE, pack_embedding, unpack_embedding
+
+
+class EmbeddedModel(models.Model):
+    """
+    Abstract base for rows that keep their own embedding: the vector packed
+    into bytes (see embedding.vectors), its storage format, the model that
+    produced it and the text it was computed from (so it can be re-embedded
+    with another model). Read many rows at once with load_embedding_matrix.
+    """
+    embedding = models.BinaryField(null=True, blank=True)
+    embedding_dtype = models.CharField(max_length=3, choices=DTYPE_CHOICES, default=DTYPE_FLOAT32)
+    embedding_model = models.CharField(max_length=100, blank=True)
+    embedding_text = models.TextField(blank=True)
+
+    class Meta:
+        abstract = True
+
+    def set_embedding(self, vector, model, dtype=None, text=None):
+        self.embedding_dtype = dtype or EMBEDDING_STORAGE_DTYPE
+        self.embedding = pack_embedding(vector, self.embedding_dtype)
+        self.embedding_model = model
+        if text is not None:
+            self.embedding_text = text
+
+    def get_embedding(self):
+        """
+        The stored embedding as a float32 NumPy vector, or None.
+        """
+        if self.embedding is None:
+            return None
+        return unpack_embedding(self.embedding, self.embedding_dtype)
+
+
+class IngestionTask(models.Model):
+    """
+    A queued upload waiting for (or going through) the parse -> embed ->
+    upsert -> extract pipeline. The uploaded file is kept in the row itself so
+    no outside broker or shared filesystem is needed.
+    """
+    KIND_RESUME = 'resume'
+    KIND_JD = 'jd'
+    KIND_RESUME_EMBEDDING = 'resume_embedding'
+    KIND_JD_EMBEDDING = 'jd_embedding'
+    KIND_CHOICES = (
+        (KIND_RESUME, 'Resume'),
+        (KIND_JD, 'Job Description'),
+        (KIND_RESUME_EMBEDDING, 'Resume Embedding'),
+        (KIND_JD_EMBEDDING, 'Job Description Embedding'),
+    )
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='ingestion_tasks'
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # Only set for JD tasks that update an existing job
+    job = models.ForeignKey(
+        'job.Job',
+        on_delete=models.CASCADE,
+        related_name='ingestion_tasks',
+        null=True,
+        blank=True
+    )
+    filename = models.CharField(max_length=255)
+    payload = models.BinaryField()
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    # Pipeline stage currently running (parse, embed, upsert, extract, save, score)
+    stage = models.CharField(max_length=20, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Not picked up again before this time (backoff after a transient error)
+    run_after = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} task {self.id} ({self.status})"
+
+
+class CachedEmbedding(models.Model):
+    """
+    Embedding vector keyed on a hash of the cleaned text and the model name,
+    so identical documents are never sent to the embedding API twice.
+    """
+    key = models.CharField(max_length=64, unique=True)
+    model = models.CharField(max_length=100)
+    # Packed little-endian float32 values
+    vector = models.BinaryField()
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.model} embedding {self.key[:12]}"
+
+
+class CachedExtraction(models.Model):
+    """
+    Structured data extracted from a document, keyed on a hash of its
+    cleaned text, the role (resume or jd) and the prompt version, so a
+    document is only sent to the chat model once per prompt version.
+    """
+    text_hash = models.CharField(max_length=64)
+    role = models.CharField(max_length=10)
+    prompt_version = models.CharField(max_length=20)
+    data = models.JSONField()
+    # What the extraction cost, i.e. what every later hit saves
+    prompt_tokens = models.PositiveIntegerField(default=0)
+    completion_tokens = models.PositiveIntegerField(default=0)
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['text_hash', 'role', 'prompt_version'], name='unique_cached_extraction'),
+        ]
+
+    def __str__(self):
+        return f"{self.role} extraction {self.text_hash[:12]} (v{self.prompt_version})"
+
+
+class ExtractionUsage(models.Model):
+    """
+    One extract_structured_data call: how much text came in, how much was
+    sent after trimming, and the tokens spent (or saved by a cache hit).
+    """
+    role = models.CharField(max_length=10)
+    prompt_version = models.CharField(max_length=20)
+    cached = models.BooleanField(default=False)
+    chunks = models.PositiveSmallIntegerField(default=0)
+    input_chars = models.PositiveIntegerField(default=0)
+    sent_chars = models.PositiveIntegerField(default=0)
+    prompt_tokens = models.PositiveIntegerField(default=0)
+    completion_tokens = models.PositiveIntegerField(default=0)
+    saved_tokens = models.PositiveIntegerField(default=0)
+    duration_ms = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        source = "cache" if self.cached else f"{self.prompt_tokens + self.completion_tokens} tokens"
+        return f"{self.role} extraction ({source})"
+
+
+class EmbeddingMigration(models.Model):
+    """
+    A move of every stored embedding to a new embedding model. Documents are
+    re-embedded into a shadow (ShadowEmbedding rows plus a separate vector
+    index) while the current vectors keep serving reads; once complete the
+    shadow is switched in within one transaction (see embedding.reembed).
+    The latest switched migration defines the active model and index.
+    """
+    STATUS_RUNNING = 'running'
+    STATUS_READY = 'ready'
+    STATUS_SWITCHED = 'switched'
+    STATUS_CANCELLED = 'cancelled'
+    STATUS_CHOICES = (
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_READY, 'Ready to switch'),
+        (STATUS_SWITCHED, 'Switched'),
+        (STATUS_CANCELLED, 'Cancelled'),
+    )
+
+    model = models.CharField(max_length=100)
+    index_name = models.CharField(max_length=45)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_RUNNING)
+    # Keyset position of the backfill, so an interrupted run resumes
+    last_candidate_id = models.BigIntegerField(default=0)
+    last_job_id = models.BigIntegerField(default=0)
+    embedded = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    switched_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Migration to {self.model} ({self.status})"
+
+
+class ShadowEmbedding(models.Model):
+    """
+    A document's embedding under an in-progress EmbeddingMigration's model,
+    with a hash of the text it was computed from so unchanged documents are
+    not embedded twice.
+    """
+    KIND_CANDIDATE = 'candidate'
+    KIND_JOB = 'job'
+    KIND_CHOICES = (
+        (KIND_CANDIDATE, 'Candidate profile'),
+        (KIND_JOB, 'Job'),
+    )
+
+    migration = models.ForeignKey(EmbeddingMigration, on_delete=models.CASCADE, related_name='shadow_embeddings')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    embedding = models.BinaryField()
+    embedding_dtype = models.CharField(max_length=3, choices=DTYPE_CHOICES, default=DTYPE_FLOAT32)
+    text_hash = models.CharField(max_length=64)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['migration', 'kind', 'object_id'], name='unique_shadow_embedding'),
+        ]
+
+    def __str__(self):
+        return f"Shadow {self.kind} {self.object_id} for migration {self.migration_id}"
@@ -0,0 +1,186 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from rest_framework import status
+
+from backend.metrics import timed
+from candidate.models import CandidateProfile
+from job.models import Job
+from similarity.utils import refresh_candidate_scores, refresh_job_scores
+
+from .models import IngestionTask, ShadowEmbedding
+from .reembed import active_embedding, dual_write
+from .utils.file_parser import parse_file
+from .utils.openai_client import (
+    OpenAIServiceError,
+    aextract_structured_data,
+    agenerate_embedding,
+    extract_structured_data,
+    generate_embedding,
+)
+from .utils.vector_store import get_vector_store
+
+
+# Parsing for async views: runs off the event loop (PDFs go to the parser pool)
+aparse_file = sync_to_async(parse_file, thread_sensitive=False)
+
+
+def set_stage(task, stage):
+    """
+    Record which pipeline stage a task is in so pollers can follow progress.
+    """
+    task.stage = stage
+    IngestionTask.objects.filter(pk=task.pk).update(stage=stage)
+
+
+def parse_payload(task):
+    """
+    Parse the raw text of the queued upload straight from its stored bytes.
+    """
+    return parse_file(task.payload, filename=task.filename)
+
+
+def run_stages(task, role, doc_id, metadata):
+    """
+    parse -> embed -> upsert -> extract.
+    Returns (raw_text, embedding, model, structured_json).
+    """
+    set_stage(task, "parse")
+    with timed("parse"):
+        raw_text = parse_payload(task)
+
+    set_stage(task, "embed")
+    model, index_name = active_embedding()
+    with timed("embed"):
+        embedding = generate_embedding(raw_text, model=model)
+
+    set_stage(task, "upsert")
+    with timed("upsert"):
+        get_vector_store(index_name).upsert(doc_id, embedding, metadata=metadata)
+
+    set_stage(task, "extract")
+    with timed("extract"):
+        structured_json = extract_structured_data(raw_text, role=role)
+    return raw_text, embedding, model, structured_json
+
+
+async def arun_stages(raw_text, role, doc_id, metadata):
+    """
+    Async pipeline for already-parsed text: the embedding (followed by its
+    vector upsert) and the structured extraction are independent API calls,
+    so they run concurrently. Returns (embedding, model, structured_json).
+    """
+    model, index_name = await sync_to_async(active_embedding)()
+
+    async def embed_and_upsert():
+        with timed("embed"):
+            embedding = await agenerate_embedding(raw_text, model=model)
+        with timed("upsert"):
+            await sync_to_async(get_vector_store(index_name).upsert, thread_sensitive=False)(
+                doc_id, embedding, metadata=metadata
+            )
+        return embedding
+
+    async def extract():
+        with timed("extract"):
+            return await aextract_structured_data(raw_text, role=role)
+
+    embedding, structured_json = await asyncio.gather(embed_and_upsert(), extract())
+    return embedding, model, structured_json
+
+
+async def aprocess_upload(upload, role, doc_id, metadata, save, refresh_scores):
+    """
+    Inline pipeline of the async upload views: parse the uploaded file, run
+    arun_stages, then save(structured_json, embedding, model, raw_text) and
+    refresh_scores(saved). Returns (saved, structured_json, None) or
+    (None, None, JsonResponse) with the error to answer with.
+    """
+    try:
+        with timed("parse"):
+            raw_text = await aparse_file(upload)
+        embedding, model, structured_json = await arun_stages(raw_text, role, doc_id, metadata)
+        with timed("save"):
+            saved = await sync_to_async(save)(structured_json, embedding, model, raw_text)
+        with timed("score"):
+            await sync_to_async(refresh_scores)(saved)
+    except OpenAIServiceError as e:
+        return None, None, JsonResponse({"error": str(e)}, status=e.status_code, headers=e.headers())
+    except Exception as e:
+        return None, None, JsonResponse({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return saved, structured_json, None
+
+
+def save_resume(user_id, structured_json, embedding, model, raw_text):
+    profile, created = CandidateProfile.objects.get_or_create(user_id=user_id)
+    profile.resume_data = structured_json
+    profile.set_embedding(embedding, model, text=raw_text)
+    profile.save()
+    dual_write(ShadowEmbedding.KIND_CANDIDATE, [profile])
+    return profile
+
+
+def save_jd(job_id, structured_json, embedding, model, raw_text):
+    job = Job.objects.get(pk=job_id)
+    job.jd_file = structured_json
+    job.set_embedding(embedding, model, text=raw_text)
+    job.save()
+    dual_write(ShadowEmbedding.KIND_JOB, [job])
+    return job
+
+
+def process_resume(task):
+    doc_id = f"candidate-{task.owner_id}-resume"
+    raw_text, embedding, model, structured_json = run_stages(
+        task, "resume", doc_id, {"type": "resume", "candidate_id": task.owner_id}
+    )
+
+    set_stage(task, "save")
+    with timed("save"):
+        profile = save_resume(task.owner_id, structured_json, embedding, model, raw_text)
+
+    set_stage(task, "score")
+    with timed("score"):
+        refresh_candidate_scores(profile)
+    return {"structured_resume": structured_json}
+
+
+def process_jd(task):
+    doc_id = f"job-{task.job_id}-jd"
+    raw_text, embedding, model, structured_json = run_stages(
+        task, "jd", doc_id, {"type": "jd", "job_id": task.job_id}
+    )
+
+    set_stage(task, "save")
+    with timed("save"):
+        job = save_jd(task.job_id, structured_json, embedding, model, raw_text)
+
+    set_stage(task, "score")
+    with timed("score"):
+        refresh_job_scores(job)
+    return {"job_id": job.id, "structured_jd": structured_json}
+
+
+def process_resume_embedding(task):
+    doc_id = f"resume-{task.owner_id}"
+    _, _, _, structured_json = run_stages(
+        task, "resume", doc_id, {"role": "resume", "user_id": task.owner_id}
+    )
+    return {"embedding_upserted": True, "structured_json": structured_json}
+
+
+def process_jd_embedding(task):
+    doc_id = f"jd-{task.owner_id}"
+    _, _, _, structured_json = run_stages(
+        task, "jd", doc_id, {"role": "jd", "user_id": task.owner_id}
+    )
+    return {"embedding_upserted": True, "structured_json": structured_json}
+
+
+PROCESSORS = {
+    IngestionTask.KIND_RESUME: process_resume,
+    IngestionTask.KIND_JD: process_jd,
+    IngestionTask.KIND_RESUME_EMBEDDING: process_resume_embedding,
+    IngestionTask.KIND_JD_EMBEDDING: process_jd_embedding,
+}
@@ -0,0 +1,259 @@
+import hashlib
+import logging
+import re
+
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from candidate.models import CandidateProfile
+from candidate.structured import load_structured
+from job.models import Job
+from similarity.search import iter_strings
+
+from .models import EmbeddingMigration, ShadowEmbedding
+from .utils.openai_client import EMBEDDING_MODEL, generate_embeddings
+from .utils.rate_limit import PRIORITY_BULK, priority
+from .utils.vector_store import get_vector_store
+from .vectors import DTYPE_FLOAT32, EMBEDDING_STORAGE_DTYPE, pack_embedding
+
+logger = logging.getLogger(__name__)
+
+REEMBED_BATCH_SIZE = 100
+# Pinecone index names: lower-case letters, digits and hyphens, at most 45 characters
+INDEX_NAME_PREFIX = "ats-"
+
+_ensured_indexes = set()
+
+
+def active_embedding():
+    """
+    (model, index_name) that new embeddings are computed and upserted with:
+    those of the latest switched migration, or the default model and index
+    (index_name None) if there has never been one.
+    """
+    migration = (
+        EmbeddingMigration.objects.filter(status=EmbeddingMigration.STATUS_SWITCHED)
+        .order_by("-switched_at")
+        .first()
+    )
+    if migration is None:
+        return EMBEDDING_MODEL, None
+    return migration.model, migration.index_name
+
+
+def pending_migration():
+    """
+    The migration currently being backfilled or waiting to be switched, if any.
+    """
+    return (
+        EmbeddingMigration.objects.filter(
+            status__in=[EmbeddingMigration.STATUS_RUNNING, EmbeddingMigration.STATUS_READY]
+        )
+        .order_by("-created_at")
+        .first()
+    )
+
+
+def index_name_for(model):
+    slug = re.sub(r"[^a-z0-9]+", "-", model.lower()).strip("-")
+    return (INDEX_NAME_PREFIX + slug)[:45].rstrip("-")
+
+
+def start_migration(model):
+    """
+    Return the pending migration to `model`, creating it if needed. Raises
+    ValueError if the model is already active or another migration is pending.
+    """
+    if model == active_embedding()[0]:
+        raise ValueError(f"{model} is already the active embedding model.")
+    migration = pending_migration()
+    if migration is not None:
+        if migration.model != model:
+            raise ValueError(f"A migration to {migration.model} is already in progress.")
+        return migration
+    return EmbeddingMigration.objects.create(model=model, index_name=index_name_for(model))
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def document_text(obj):
+    """
+    The text a candidate profile or job is embedded from. Rows embedded
+    before the text was stored fall back to their structured data.
+    """
+    if obj.embedding_text:
+        return obj.embedding_text
+    if isinstance(obj, CandidateProfile):
+        parts = list(iter_strings(load_structured(obj.resume_data)))
+    else:
+        parts = [obj.title, obj.description, *iter_strings(load_structured(obj.jd_file))]
+    return " ".join(part for part in parts if part)
+
+
+# Per kind: model, columns needed to build the text, vector id and metadata
+KINDS = {
+    ShadowEmbedding.KIND_CANDIDATE: (
+        CandidateProfile,
+        ("id", "user_id", "resume_data", "embedding_text", "embedding_model"),
+        lambda profile: f"candidate-{profile.user_id}-resume",
+        lambda profile: {"type": "resume", "candidate_id": profile.user_id},
+    ),
+    ShadowEmbedding.KIND_JOB: (
+        Job,
+        ("id", "title", "description", "jd_file", "embedding_text", "embedding_model"),
+        lambda job: f"job-{job.id}-jd",
+        lambda job: {"type": "jd", "job_id": job.id},
+    ),
+}
+
+
+def shadow_write(migration, kind, objects):
+    """
+    Embed `objects` with the migration's model into its shadow table and
+    shadow index, skipping those whose text hasn't changed since they were
+    last shadowed. Returns (embedded, skipped).
+    """
+    _, _, vector_id, metadata = KINDS[kind]
+    texts = {obj.pk: document_text(obj) for obj in objects}
+    existing = dict(
+        ShadowEmbedding.objects.filter(migration=migration, kind=kind, object_id__in=list(texts))
+        .values_list("object_id", "text_hash")
+    )
+    todo = [obj for obj in objects if texts[obj.pk] and existing.get(obj.pk) != text_hash(texts[obj.pk])]
+    if not todo:
+        return 0, len(objects)
+
+    embeddings = generate_embeddings([texts[obj.pk] for obj in todo], model=migration.model)
+    store = get_vector_store(migration.index_name)
+    if migration.index_name not in _ensured_indexes:
+        store.ensure_index(len(embeddings[0]))
+        _ensured_indexes.add(migration.index_name)
+
+    ShadowEmbedding.objects.bulk_create(
+        [
+            ShadowEmbedding(
+                migration=migration,
+                kind=kind,
+                object_id=obj.pk,
+                embedding=pack_embedding(embedding, EMBEDDING_STORAGE_DTYPE),
+                embedding_dtype=EMBEDDING_STORAGE_DTYPE,
+                text_hash=text_hash(texts[obj.pk]),
+            )
+            for obj, embedding in zip(todo, embeddings)
+        ],
+        update_conflicts=True,
+        unique_fields=["migration", "kind", "object_id"],
+        update_fields=["embedding", "embedding_dtype", "text_hash", "updated_at"],
+    )
+    store.upsert_many([
+        (vector_id(obj), embedding, metadata(obj)) for obj, embedding in zip(todo, embeddings)
+    ])
+    return len(todo), len(objects) - len(todo)
+
+
+def dual_write(kind, objects):
+    """
+    While a migration is pending, also embed freshly saved documents under
+    its model so the shadow doesn't fall behind. Failures are logged rather
+    than raised; switch_migration catches those documents up.
+    """
+    migration = pending_migration()
+    if migration is None:
+        return
+    try:
+        # Backfill work: don't hold up other interactive requests
+        with priority(PRIORITY_BULK):
+            shadow_write(migration, kind, [obj for obj in objects if obj.embedding_model != migration.model])
+    except Exception:
+        logger.exception("Dual write to the %s shadow index failed", migration.model)
+
+
+def _embedded(kind):
+    model, fields, _, _ = KINDS[kind]
+    return model.objects.filter(embedding__isnull=False).only(*fields).order_by("pk")
+
+
+def backfill(migration, kind, after, batch_size=REEMBED_BATCH_SIZE):
+    """
+    Yield (last_pk, embedded, skipped) for each batch of documents of `kind`
+    shadowed after primary key `after`.
+    """
+    while True:
+        batch = list(_embedded(kind).filter(pk__gt=after)[:batch_size])
+        if not batch:
+            return
+        embedded, skipped = shadow_write(migration, kind, batch)
+        after = batch[-1].pk
+        yield after, embedded, skipped
+
+
+def run_migration(migration, batch_size=REEMBED_BATCH_SIZE, on_batch=None):
+    """
+    Shadow every embedded candidate profile and job, resuming from the
+    migration's saved position, then mark it ready to switch.
+    """
+    for kind, position in (
+        (ShadowEmbedding.KIND_CANDIDATE, "last_candidate_id"),
+        (ShadowEmbedding.KIND_JOB, "last_job_id"),
+    ):
+        for last_pk, embedded, skipped in backfill(migration, kind, getattr(migration, position), batch_size):
+            setattr(migration, position, last_pk)
+            migration.embedded += embedded
+            migration.skipped += skipped
+            migration.save(update_fields=[position, "embedded", "skipped", "updated_at"])
+            if on_batch:
+                on_batch(migration)
+
+    migration.status = EmbeddingMigration.STATUS_READY
+    migration.save(update_fields=["status", "updated_at"])
+    return migration
+
+
+def switch_migration(migration, batch_size=REEMBED_BATCH_SIZE, force=False):
+    """
+    Make the migration's model and index the active ones.
+    Documents edited since they were shadowed are re-embedded first; then
+    every stored embedding is replaced by its shadow in one transaction, so
+    readers see either all old or all new vectors. Raises ValueError if
+    some documents have no shadow (e.g. no text to embed) unless `force`,
+    in which case their embeddings are cleared.
+    Returns the number of documents left without an embedding.
+    """
+    for kind in KINDS:
+        for _ in backfill(migration, kind, 0, batch_size):
+            pass
+
+    missing = 0
+    for kind, (model, _, _, _) in KINDS.items():
+        shadowed = ShadowEmbedding.objects.filter(migration=migration, kind=kind).values("object_id")
+        missing += model.objects.filter(embedding__isnull=False).exclude(pk__in=shadowed).count()
+    if missing and not force:
+        raise ValueError(f"{missing} document(s) have no shadow embedding; switch with force to drop them.")
+
+    now = timezone.now()
+    with transaction.atomic():
+        for kind, (model, _, _, _) in KINDS.items():
+            shadow = ShadowEmbedding.objects.filter(migration=migration, kind=kind, object_id=OuterRef("pk"))
+            changes = {
+                "embedding": Subquery(shadow.values("embedding")[:1]),
+                "embedding_dtype": Coalesce(Subquery(shadow.values("embedding_dtype")[:1]), Value(DTYPE_FLOAT32)),
+                "embedding_model": migration.model,
+            }
+            if model is CandidateProfile:
+                # update() skips auto_now; the candidate matrix cache keys on it
+                changes["updated_at"] = now
+            model.objects.filter(embedding__isnull=False).update(**changes)
+
+        EmbeddingMigration.objects.filter(
+            status__in=[EmbeddingMigration.STATUS_RUNNING, EmbeddingMigration.STATUS_READY]
+        ).exclude(pk=migration.pk).update(status=EmbeddingMigration.STATUS_CANCELLED)
+        migration.status = EmbeddingMigration.STATUS_SWITCHED
+        migration.switched_at = now
+        migration.save(update_fields=["status", "switched_at", "updated_at"])
+
+    ShadowEmbedding.objects.filter(migration=migration).delete()
+    return missing
@@ -0,0 +1,9 @@
+from rest_framework import serializers
+from .models import IngestionTask
+
+class IngestionTaskSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = IngestionTask
+        fields = ['id', 'kind', 'job', 'filename', 'status', 'stage', 'result', 'error',
+                  'attempts', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
@@ -1,3 +1,636 @@
-from django.test import TestCase
+import io
+import tempfile
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import openai
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from pinecone.exceptions import PineconeApiException
+
+from candidate.models import CandidateProfile
+from job.models import Job
+from similarity.models import MatchScore
+from similarity.utils import reset_candidate_matrix
+from . import reembed, worker
+from .management.commands import benchmark_ingestion, reembed as reembed_command
+from .models import EmbeddingMigration, IngestionTask, ShadowEmbedding
+from .vectors import DTYPE_FLOAT16, DTYPE_FLOAT32, DTYPE_INT8, load_embedding_matrix, pack_embedding, unpack_embedding
+from .utils import file_parser, openai_client, pinecone_client
+from .utils.batching import MicroBatcher
+from .utils.fake_services import start_fake_services
+from .utils.prompt_templates import chunk_document, merge_structured, trim_document
+from .utils.rate_limit import PRIORITY_BULK, PRIORITY_INTERACTIVE, RateLimiter, current_priority, priority
+from .utils.vector_store import LocalVectorStore
+
+
+class EmbeddingPackingTests(SimpleTestCase):
+    def setUp(self):
+        self.vector = np.random.default_rng(0).standard_normal(16).astype(np.float32)
+
+    def test_round_trips(self):
+        for dtype, tolerance in [(DTYPE_FLOAT32, 0), (DTYPE_FLOAT16, 1e-2), (DTYPE_INT8, 2e-2)]:
+            with self.subTest(dtype=dtype):
+                packed = pack_embedding(self.vector, dtype)
+                unpacked = unpack_embedding(packed, dtype)
+                self.assertEqual(unpacked.dtype, np.float32)
+                np.testing.assert_allclose(unpacked, self.vector, atol=tolerance * np.abs(self.vector).max())
+        self.assertEqual(len(pack_embedding(self.vector, DTYPE_INT8)), 4 + 16)
+        np.testing.assert_array_equal(unpack_embedding(pack_embedding(np.zeros(4), DTYPE_INT8), DTYPE_INT8), np.zeros(4))
+
+    def test_matrix_of_mixed_dtypes(self):
+        dtypes = [DTYPE_FLOAT32, DTYPE_FLOAT16, DTYPE_INT8]
+        rows = [(pack_embedding(self.vector * i, dtype), dtype) for i, dtype in enumerate(dtypes, 1)]
+        matrix = load_embedding_matrix(rows)
+        self.assertEqual(matrix.shape, (3, 16))
+        for i, row in enumerate(matrix, 1):
+            np.testing.assert_allclose(row, self.vector * i, atol=0.05 * i * np.abs(self.vector).max())
+        self.assertEqual(load_embedding_matrix([], dim=16).shape, (0, 16))
+
+    def test_invalid_input(self):
+        with self.assertRaises(ValueError):
+            pack_embedding([[1.0, 2.0]])
+        with self.assertRaises(ValueError):
+            pack_embedding(self.vector, "f64")
+        with self.assertRaises(ValueError):
+            load_embedding_matrix([(pack_embedding(self.vector), DTYPE_FLOAT32), (pack_embedding(self.vector[:8]), DTYPE_FLOAT32)])
+
+
+class PromptTemplateTests(SimpleTestCase):
+    def test_trim_document(self):
+        text = (
+            "Jane Doe | Berlin. Page 1 of 2 Curriculum Vitae. Built data pipelines in Go. "
+            "Jane Doe | Berlin. Led a team of five! References available upon request. "
+            "Page 2 of 2 built DATA pipelines in go."
+        )
+        self.assertEqual(trim_document(text), "Jane Doe\nBerlin.\nBuilt data pipelines in Go.\nLed a team of five!")
+
+    def test_chunk_document(self):
+        self.assertEqual(chunk_document("short", max_chars=10), ["short"])
+        text = "\n".join(["alpha beta", "gamma", "delta epsilon zeta eta theta", "iota"])
+        chunks = chunk_document(text, max_chars=12)
+        self.assertTrue(all(len(chunk) <= 12 for chunk in chunks))
+        self.assertEqual(" ".join(" ".join(chunks).split()), " ".join(text.split()))
+        self.assertEqual(chunk_document("x" * 25, max_chars=10), ["x" * 10, "x" * 10, "x" * 5])
+
+    def test_merge_structured(self):
+        merged = merge_structured([
+            {"skills": ["Go", "SQL"], "years_of_experience": 3, "location": "", "education": None},
+            {"skills": ["SQL", "Kubernetes"], "years_of_experience": 5, "location": "Berlin", "education": "MSc"},
+            {"skills": [], "location": "Munich", "years_of_experience": None},
+        ])
+        self.assertEqual(merged["skills"], ["Go", "SQL", "Kubernetes"])
+        self.assertEqual(merged["years_of_experience"], 5)
+        self.assertEqual(merged["location"], "Berlin")
+        self.assertEqual(merged["education"], "MSc")
+        self.assertIn("certifications", merged)
+        self.assertIsNone(merged["certifications"])
+        self.assertEqual(set(merge_structured([], role="jd")), {
+            "about_company", "role_overview", "qualifications", "location", "job_type", "benefits",
+        })
+
+
+class LocalVectorStoreTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = tmp.name
+
+    def test_upsert_and_query(self):
+        store = LocalVectorStore(self.path)
+        store.upsert_many([("a", [1, 0, 0], {"type": "resume"}), ("b", [0, 1, 0], {"type": "jd"})])
+        store.upsert("c", [1, 1, 0], {"type": "resume"})
+
+        matches = store.query([1, 0, 0], top_k=2)
+        self.assertEqual([match["id"] for match in matches], ["a", "c"])
+        self.assertAlmostEqual(matches[0]["score"], 1.0, places=5)
+        self.assertEqual(matches[0]["metadata"], {"type": "resume"})
+        self.assertEqual([m["id"] for m in store.query([0, 1, 0], filter={"type": "resume"})], ["c", "a"])
+
+    def test_upsert_replaces_existing_vector(self):
+        store = LocalVectorStore(self.path)
+        store.upsert("a", [1, 0, 0])
+        store.upsert("a", [0, 1, 0])
+        self.assertEqual(len(store), 1)
+        self.assertEqual(store.query([0, 1, 0], top_k=1)[0]["id"], "a")
+        self.assertAlmostEqual(store.query([0, 1, 0])[0]["score"], 1.0, places=5)
+
+    def test_duplicate_ids_in_one_batch_keep_the_last_vector(self):
+        store = LocalVectorStore(self.path)
+        store.upsert_many([("a", [1, 0, 0], None), ("a", [0, 1, 0], None), ("b", [0, 0, 1], None)])
+        self.assertEqual(len(store), 2)
+        self.assertEqual(sorted(match["id"] for match in store.query([1, 1, 1])), ["a", "b"])
+        self.assertAlmostEqual(store.query([0, 1, 0], top_k=1)[0]["score"], 1.0, places=5)
+
+        store.delete(["a"])
+        self.assertEqual([match["id"] for match in store.query([1, 0, 0])], ["b"])
+        self.assertEqual([match["id"] for match in LocalVectorStore(self.path).query([1, 0, 0])], ["b"])
+
+    def test_delete_and_reopen(self):
+        store = LocalVectorStore(self.path)
+        store.upsert_many([("a", [1, 0, 0], {"n": 1}), ("b", [0, 1, 0], {"n": 2})])
+        store.delete(["a", "missing"])
+        store.upsert("c", [0, 0, 1], {"n": 3})
+
+        reopened = LocalVectorStore(self.path)
+        self.assertEqual(len(reopened), 2)
+        self.assertEqual(sorted(reopened.fetch(["a", "b", "c"])), ["b", "c"])
+        self.assertEqual(reopened.query([0, 0, 1], top_k=1)[0]["metadata"], {"n": 3})
+
+        reopened.compact()
+        self.assertEqual(len(LocalVectorStore(self.path)), 2)
+
+    def test_reopen_with_other_dimension_fails(self):
+        LocalVectorStore(self.path).upsert("a", [1, 0, 0])
+        with self.assertRaises(ValueError):
+            LocalVectorStore(self.path, dim=4)
+
+    def test_non_positive_top_k_is_rejected(self):
+        store = LocalVectorStore(self.path)
+        store.upsert("a", [1, 0, 0])
+        for top_k in (0, -1):
+            with self.assertRaises(ValueError):
+                store.query([1, 0, 0], top_k=top_k)
+
+
+class MicroBatcherTests(SimpleTestCase):
+    def make_batcher(self, batch_fn, **options):
+        batcher = MicroBatcher(batch_fn, **options)
+        self.addCleanup(batcher.close)
+        return batcher
+
+    def test_concurrent_items_are_coalesced(self):
+        batches = []
+
+        def batch_fn(items):
+            batches.append(list(items))
+            return [item * 2 for item in items]
+
+        batcher = self.make_batcher(batch_fn, max_batch_size=4, max_wait=0.5)
+        futures = [batcher.submit(i) for i in range(10)]
+        self.assertEqual([future.result(5) for future in futures], [i * 2 for i in range(10)])
+        self.assertEqual(sorted(len(batch) for batch in batches), [2, 4, 4])
+        self.assertEqual(sorted(sum(batches, [])), list(range(10)))
+
+    def test_batch_errors_reach_every_caller(self):
+        def batch_fn(items):
+            raise ValueError("upstream failed")
+
+        batcher = self.make_batcher(batch_fn, max_wait=0.2)
+        futures = [batcher.submit(i) for i in range(3)]
+        for future in futures:
+            with self.assertRaisesMessage(ValueError, "upstream failed"):
+                future.result(5)
+
+    def test_wrong_number_of_results_fails_the_batch(self):
+        batcher = self.make_batcher(lambda items: items[:-1], max_wait=0.2)
+        futures = [batcher.submit(i) for i in range(3)]
+        for future in futures:
+            with self.assertRaises(RuntimeError):
+                future.result(5)
+
+    def test_slow_batch_does_not_block_later_ones(self):
+        started, release = threading.Event(), threading.Event()
+
+        def batch_fn(items):
+            if "slow" in items:
+                started.set()
+                release.wait(5)
+            return items
+
+        batcher = self.make_batcher(batch_fn, max_wait=0, max_workers=2)
+        slow = batcher.submit("slow")
+        self.assertTrue(started.wait(5))
+        self.assertEqual(batcher.submit("fast").result(2), "fast")
+        self.assertFalse(slow.done())
+        release.set()
+        self.assertEqual(slow.result(5), "slow")
+
+    def test_close_processes_queued_items(self):
+        batcher = MicroBatcher(lambda items: items, max_wait=0.5)
+        future = batcher.submit("queued")
+        batcher.close()
+        self.assertEqual(future.result(0), "queued")
+        with self.assertRaises(RuntimeError):
+            batcher.submit("late")
+
+
+@mock.patch.object(file_parser, "PARSER_MAX_WORKERS", 1)
+class ParserPoolTests(SimpleTestCase):
+    def setUp(self):
+        pool = mock.patch.object(file_parser, "_pool", None)
+        pool.start()
+        self.addCleanup(pool.stop)
+        self.addCleanup(lambda: file_parser._pool and file_parser._pool.shutdown(cancel_futures=True))
+
+    def test_timeout_does_not_fail_other_parses(self):
+        pool = file_parser._get_pool()
+        wedged = file_parser.Submission(pool, pool.submit(time.sleep, 30), b"", ".txt")
+        queued = file_parser._submit(b"hello", ".txt")
+
+        with mock.patch.object(file_parser, "PARSER_TIMEOUT", 0.5), \
+                mock.patch.object(file_parser, "RESULT_TIMEOUT_GRACE", 0):
+            with self.assertRaises(TimeoutError):
+                file_parser._result(wedged, "wedged.pdf")
+        self.assertIsNot(file_parser._pool, pool)
+
+        # Caught in the reset, parsed again in a fresh pool
+        self.assertEqual(file_parser._result(queued, "hello.txt"), "hello")
+        self.assertIsNot(file_parser._pool, pool)
+
+    def test_stale_reset_keeps_replacement_pool(self):
+        old = file_parser._get_pool()
+        file_parser._reset_pool(old)
+        new = file_parser._get_pool()
+        file_parser._reset_pool(old)
+        self.assertIs(file_parser._pool, new)
+
+
+class RateLimiterTests(SimpleTestCase):
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition():
+            if time.monotonic() > deadline:
+                self.fail("condition not reached")
+            time.sleep(0.005)
+
+    def test_interactive_lane_is_served_before_bulk(self):
+        limiter = RateLimiter(0, 0, max_concurrency=1)
+        served = []
+
+        def request(name, lane):
+            with limiter.slot(lane=lane):
+                served.append(name)
+
+        held = limiter.acquire()
+        threads = []
+        for name, lane in [("bulk-1", PRIORITY_BULK), ("bulk-2", PRIORITY_BULK), ("interactive", PRIORITY_INTERACTIVE)]:
+            thread = threading.Thread(target=request, args=(name, lane))
+            thread.start()
+            threads.append(thread)
+            self.wait_for(lambda: limiter.stats()["waiting"] == len(threads))
+        limiter.release(held)
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(served, ["interactive", "bulk-1", "bulk-2"])
+
+    def test_lane_follows_the_callers_context(self):
+        limiter = RateLimiter(0, 0, max_concurrency=1)
+        held = limiter.acquire()
+        served = []
+
+        def request(name, lane):
+            with priority(lane), limiter.slot():
+                served.append(name)
+
+        bulk = threading.Thread(target=request, args=("bulk", PRIORITY_BULK))
+        bulk.start()
+        self.wait_for(lambda: limiter.stats()["waiting"] == 1)
+        interactive = threading.Thread(target=request, args=("interactive", PRIORITY_INTERACTIVE))
+        interactive.start()
+        self.wait_for(lambda: limiter.stats()["waiting"] == 2)
+        limiter.release(held)
+        bulk.join(5)
+        interactive.join(5)
+        self.assertEqual(served, ["interactive", "bulk"])
+
+    def test_overload_halves_concurrency_and_pauses(self):
+        limiter = RateLimiter(0, 0, max_concurrency=8)
+        lease = limiter.acquire()
+        lease.overloaded(retry_after=30)
+        limiter.release(lease)
+        self.assertEqual(limiter.stats()["concurrency_limit"], 4)
+        with self.assertRaises(TimeoutError):
+            limiter.acquire(timeout=0.05)
+
+    def test_share_scales_the_budget(self):
+        limiter = RateLimiter(600, 60000, max_concurrency=8)
+        limiter.set_share(0.5)
+        self.assertEqual(limiter.requests.rate, 5)
+        self.assertEqual(limiter.tokens.rate, 500)
+        self.assertLessEqual(limiter.requests.level, limiter.requests.capacity)
+
+    @mock.patch.object(openai_client, "EMBEDDING_CACHE_ENABLED", False)
+    def test_batched_embeddings_keep_the_callers_lane(self):
+        lanes = []
+
+        def backend(texts, model):
+            lanes.append(current_priority())
+            return [[1.0, 0.0] for _ in texts]
+
+        openai_client.set_embedding_backend(backend)
+        self.addCleanup(openai_client.set_embedding_backend, None)
+        with priority(PRIORITY_BULK):
+            openai_client.generate_embedding("bulk text")
+        openai_client.generate_embedding("interactive text")
+        self.assertEqual(lanes, [PRIORITY_BULK, PRIORITY_INTERACTIVE])
+
+
+class OpenAIBackoffTests(SimpleTestCase):
+    """
+    call_openai against the local fake API with injected failures.
+    """
+
+    def setUp(self):
+        self.server = start_fake_services(dimension=8)
+        self.addCleanup(self.server.shutdown)
+        for name, value in [("api_base", self.server.openai_base), ("api_key", "fake")]:
+            patcher = mock.patch.object(openai, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.limiter = RateLimiter(0, 0, max_concurrency=8)
+        for patcher in [
+            mock.patch.dict(openai_client._limiters, {"embeddings": self.limiter}),
+            mock.patch.object(openai_client, "OPENAI_MAX_RETRIES", 2),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(openai_client.time, "sleep")
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def embed(self):
+        return openai_client.openai_embedding_backend(["some text"], openai_client.EMBEDDING_MODEL)
+
+    def test_429_is_retried_after_retry_after_then_raised(self):
+        self.server.error_rate, self.server.error_status = 1.0, 429
+        with self.assertRaises(openai_client.OpenAIRateLimitError) as raised:
+            self.embed()
+        self.assertEqual(self.server.stats()["requests"]["openai_embeddings"], 3)
+        self.assertEqual([call.args[0] for call in self.sleep.call_args_list], [1.0, 1.0])
+        self.assertEqual(raised.exception.retry_after, 1.0)
+        # 8 -> 4 -> 2 -> 1 slots, and the lanes are paused for Retry-After
+        self.assertEqual(self.limiter.stats()["concurrency_limit"], 1)
+        self.assertGreater(self.limiter.paused_until, time.monotonic())
+
+    def test_5xx_backs_off_exponentially(self):
+        self.server.error_rate, self.server.error_status = 1.0, 503
+        with self.assertRaises(openai_client.OpenAIUnavailableError):
+            self.embed()
+        first, second = (call.args[0] for call in self.sleep.call_args_list)
+        self.assertTrue(0.25 <= first <= 0.75 and 0.5 <= second <= 1.5)
+
+    def test_recovers_once_the_api_does(self):
+        self.server.error_rate, self.server.error_status = 1.0, 429
+        self.sleep.side_effect = lambda seconds: setattr(self.server, "error_rate", 0.0)
+        vectors = self.embed()
+        self.assertEqual(len(vectors), 1)
+        self.assertEqual(len(vectors[0]), 8)
+        self.assertEqual(self.server.stats()["errors"]["openai_embeddings"], 1)
+
+    def test_client_errors_are_not_retried(self):
+        self.server.error_rate, self.server.error_status = 1.0, 400
+        with self.assertRaises(openai_client.OpenAIServiceError):
+            self.embed()
+        self.assertEqual(self.server.stats()["requests"]["openai_embeddings"], 1)
+        self.sleep.assert_not_called()
+
+
+@mock.patch.object(pinecone_client.time, "sleep")
+class PineconeRetryTests(SimpleTestCase):
+    def test_transient_errors_are_retried(self, sleep):
+        func = mock.Mock(side_effect=[
+            PineconeApiException(message="busy", status_code=503),
+            ConnectionResetError(),
+            "done",
+        ])
+        self.assertEqual(pinecone_client.with_retry(func, 1, key="value"), "done")
+        self.assertEqual(func.call_count, 3)
+        func.assert_called_with(1, key="value")
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_other_errors_are_raised_immediately(self, sleep):
+        for error in [
+            ValueError("bad vector"),
+            KeyError("id"),
+            PineconeApiException(message="not found", status_code=404),
+        ]:
+            func = mock.Mock(side_effect=error)
+            with self.assertRaises(type(error)):
+                pinecone_client.with_retry(func)
+            self.assertEqual(func.call_count, 1)
+        sleep.assert_not_called()
+
+    @mock.patch.object(pinecone_client, "PINECONE_MAX_RETRIES", 2)
+    def test_gives_up_after_max_retries(self, sleep):
+        func = mock.Mock(side_effect=PineconeApiException(message="slow down", status_code=429))
+        with self.assertRaises(PineconeApiException):
+            pinecone_client.with_retry(func)
+        self.assertEqual(func.call_count, 3)
+
+
+class IngestionWorkerTests(TestCase):
+    def setUp(self):
+        owner = get_user_model().objects.create(username="candidate", role="candidate")
+        self.task = IngestionTask.objects.create(
+            owner=owner, kind=IngestionTask.KIND_RESUME, filename="resume.txt", payload=b"text"
+        )
+
+    def run_with(self, processor):
+        with mock.patch.dict(worker.PROCESSORS, {IngestionTask.KIND_RESUME: processor}):
+            worker.run_task(self.task.pk)
+        self.task.refresh_from_db()
+
+    def test_success_records_the_result(self):
+        self.run_with(lambda task: {"ok": True})
+        self.assertEqual(self.task.status, IngestionTask.STATUS_SUCCEEDED)
+        self.assertEqual(self.task.result, {"ok": True})
+        self.assertEqual(self.task.attempts, 1)
+
+    def test_transient_error_requeues_with_backoff(self):
+        self.run_with(mock.Mock(side_effect=openai_client.OpenAIUnavailableError("down")))
+        self.assertEqual(self.task.status, IngestionTask.STATUS_PENDING)
+        self.assertEqual(self.task.error, "down")
+        self.assertGreater(self.task.run_after, timezone.now())
+        self.assertEqual(worker.pending_task_ids(10), [])
+
+        IngestionTask.objects.filter(pk=self.task.pk).update(run_after=timezone.now())
+        self.assertEqual(worker.pending_task_ids(10), [self.task.pk])
+        self.run_with(lambda task: {"ok": True})
+        self.assertEqual(self.task.status, IngestionTask.STATUS_SUCCEEDED)
+        self.assertEqual((self.task.attempts, self.task.error), (2, ""))
+
+    def test_transient_errors_give_up_after_max_attempts(self):
+        IngestionTask.objects.filter(pk=self.task.pk).update(attempts=worker.INGESTION_MAX_ATTEMPTS - 1)
+        self.run_with(mock.Mock(side_effect=openai_client.OpenAIRateLimitError("slow down")))
+        self.assertEqual(self.task.status, IngestionTask.STATUS_FAILED)
+
+    def test_other_errors_fail_at_once(self):
+        self.run_with(mock.Mock(side_effect=ValueError("unreadable file")))
+        self.assertEqual(self.task.status, IngestionTask.STATUS_FAILED)
+        self.assertEqual(self.task.error, "unreadable file")
+
+    def test_benchmark_retries_until_final(self):
+        unavailable = openai_client.OpenAIUnavailableError("down")
+        flaky = mock.Mock(side_effect=[unavailable, unavailable, {"ok": True}])
+        with mock.patch.dict(worker.PROCESSORS, {IngestionTask.KIND_RESUME: flaky}):
+            benchmark_ingestion.process(self.task.pk)
+        self.task.refresh_from_db()
+        self.assertEqual((self.task.status, self.task.attempts), (IngestionTask.STATUS_SUCCEEDED, 3))
+
+        IngestionTask.objects.filter(pk=self.task.pk).update(status=IngestionTask.STATUS_PENDING, attempts=0)
+        with mock.patch.dict(worker.PROCESSORS, {IngestionTask.KIND_RESUME: mock.Mock(side_effect=unavailable)}):
+            with self.assertLogs("embedding.worker", "WARNING"):
+                benchmark_ingestion.process(self.task.pk)
+        self.task.refresh_from_db()
+        self.assertEqual(
+            (self.task.status, self.task.attempts), (IngestionTask.STATUS_FAILED, worker.INGESTION_MAX_ATTEMPTS)
+        )
+
+    def test_stale_running_tasks_are_requeued(self):
+        started = timezone.now() - worker.DEFAULT_STALE_AFTER * 2
+        IngestionTask.objects.filter(pk=self.task.pk).update(
+            status=IngestionTask.STATUS_RUNNING, started_at=started, attempts=1, stage="embed"
+        )
+        self.assertEqual(worker.requeue_stale(worker.DEFAULT_STALE_AFTER), 1)
+        self.task.refresh_from_db()
+        self.assertEqual((self.task.status, self.task.stage), (IngestionTask.STATUS_PENDING, ""))
+
+        IngestionTask.objects.filter(pk=self.task.pk).update(
+            status=IngestionTask.STATUS_RUNNING, started_at=started, attempts=worker.INGESTION_MAX_ATTEMPTS
+        )
+        self.assertEqual(worker.requeue_stale(worker.DEFAULT_STALE_AFTER), 0)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, IngestionTask.STATUS_FAILED)
+
+
+def model_embeddings(texts, model):
+    # Deterministic per (model, text), so old and new vectors differ
+    return [np.random.default_rng(list((model + text).encode())).standard_normal(8).tolist() for text in texts]
+
+
+class ReembedTests(TestCase):
+    def setUp(self):
+        for target, name, value in [
+            (reembed, "generate_embeddings", mock.Mock(side_effect=model_embeddings)),
+            (reembed, "get_vector_store", mock.Mock()),
+            (reembed, "_ensured_indexes", set()),
+        ]:
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.embed = reembed.generate_embeddings
+        reset_candidate_matrix()
+        self.addCleanup(reset_candidate_matrix)
+        self.store = reembed.get_vector_store.return_value
+
+        User = get_user_model()
+        self.profiles = []
+        for i, text in enumerate(["Go developer", "Python engineer", "Kubernetes operator"]):
+            profile = CandidateProfile(user=User.objects.create(username=f"candidate-{i}", role="candidate"))
+            profile.set_embedding(model_embeddings([text], "old-model")[0], "old-model", text=text)
+            profile.save()
+            self.profiles.append(profile)
+        recruiter = User.objects.create(username="recruiter", role="job")
+        self.job = Job(poster=recruiter, title="Engineer", description="")
+        self.job.set_embedding(model_embeddings(["Engineer"], "old-model")[0], "old-model", text="Engineer")
+        self.job.save()
+
+    def embedded_texts(self):
+        return [text for call in self.embed.call_args_list for text in call.args[0]]
+
+    def test_interrupted_backfill_resumes_where_it_stopped(self):
+        migration = reembed.start_migration("new-model")
+        with self.assertRaises(KeyboardInterrupt):
+            reembed.run_migration(migration, batch_size=1, on_batch=mock.Mock(side_effect=KeyboardInterrupt))
+        migration.refresh_from_db()
+        self.assertEqual((migration.status, migration.last_candidate_id, migration.embedded), (
+            EmbeddingMigration.STATUS_RUNNING, self.profiles[0].pk, 1,
+        ))
+
+        self.embed.reset_mock()
+        self.assertEqual(reembed.start_migration("new-model"), migration)
+        reembed.run_migration(migration, batch_size=1)
+        migration.refresh_from_db()
+        self.assertEqual(self.embedded_texts(), ["Python engineer", "Kubernetes operator", "Engineer"])
+        self.assertEqual((migration.status, migration.embedded), (EmbeddingMigration.STATUS_READY, 4))
+        self.assertEqual(ShadowEmbedding.objects.filter(migration=migration).count(), 4)
+        self.store.ensure_index.assert_called_once_with(8)
+
+    def test_dual_write_keeps_the_shadow_current(self):
+        reembed.dual_write(ShadowEmbedding.KIND_CANDIDATE, self.profiles)
+        self.embed.assert_not_called()  # no migration pending
+
+        migration = reembed.start_migration("new-model")
+        reembed.run_migration(migration)
+        # Edited and added after their batch was shadowed
+        edited = self.profiles[0]
+        edited.embedding_text = "Go and Rust developer"
+        edited.save()
+        added = CandidateProfile(user=get_user_model().objects.create(username="late", role="candidate"))
+        added.set_embedding(model_embeddings(["SRE"], "old-model")[0], "old-model", text="SRE")
+        added.save()
+        self.embed.reset_mock()
+        reembed.dual_write(ShadowEmbedding.KIND_CANDIDATE, [edited, added, self.profiles[1]])
+        self.assertEqual(self.embedded_texts(), ["Go and Rust developer", "SRE"])
+        shadow = ShadowEmbedding.objects.get(migration=migration, object_id=edited.pk, kind=ShadowEmbedding.KIND_CANDIDATE)
+        self.assertEqual(shadow.text_hash, reembed.text_hash("Go and Rust developer"))
+
+        # A failing dual write doesn't fail the save it follows
+        self.embed.side_effect = RuntimeError("down")
+        edited.embedding_text = "Rust developer"
+        with self.assertLogs("embedding.reembed", "ERROR"):
+            reembed.dual_write(ShadowEmbedding.KIND_CANDIDATE, [edited])
+
+        # The switch catches up what the failed dual write missed
+        self.embed.side_effect = model_embeddings
+        edited.save()
+        self.embed.reset_mock()
+        reembed.switch_migration(migration, force=True)
+        self.assertEqual(self.embedded_texts(), ["Rust developer"])
+        edited.refresh_from_db()
+        expected = model_embeddings(["Rust developer"], "new-model")[0]
+        np.testing.assert_allclose(edited.get_embedding(), expected, rtol=1e-6)
+        self.assertEqual(reembed.active_embedding(), ("new-model", migration.index_name))
+
+    def assert_old_embeddings_active(self):
+        self.assertEqual(reembed.active_embedding(), (openai_client.EMBEDDING_MODEL, None))
+        for obj in [*self.profiles, self.job]:
+            stored = type(obj).objects.get(pk=obj.pk)
+            self.assertEqual(stored.embedding_model, "old-model")
+            np.testing.assert_array_equal(stored.get_embedding(), obj.get_embedding())
+
+    def test_failed_switch_keeps_the_old_embeddings(self):
+        # A document without any text to embed can't be shadowed
+        blank = CandidateProfile(user=get_user_model().objects.create(username="blank", role="candidate"))
+        blank.set_embedding(model_embeddings([""], "old-model")[0], "old-model")
+        blank.save()
+        self.profiles.append(blank)
+        migration = reembed.start_migration("new-model")
+        reembed.run_migration(migration)
+
+        with self.assertRaises(ValueError):
+            reembed.switch_migration(migration)
+        self.assert_old_embeddings_active()
+
+        # An error halfway through the swap rolls it back
+        CandidateProfile.objects.filter(pk=blank.pk).update(embedding_text="SRE")
+        # (after every embedding has been replaced)
+        with mock.patch.object(EmbeddingMigration.objects, "filter", side_effect=DatabaseError("lost")):
+            with self.assertRaises(DatabaseError):
+                reembed.switch_migration(migration)
+        self.assert_old_embeddings_active()
+        migration.refresh_from_db()
+        self.assertEqual(migration.status, EmbeddingMigration.STATUS_READY)
+        self.assertTrue(ShadowEmbedding.objects.filter(migration=migration).exists())
+
+    def test_command_backfills_then_switches(self):
+        options = {"stdout": io.StringIO(), "stderr": io.StringIO()}
+        with mock.patch.object(reembed_command, "run_as_bulk"):
+            call_command("reembed", "new-model", **options)
+            self.assertEqual(reembed.pending_migration().status, EmbeddingMigration.STATUS_READY)
+            self.assertEqual(reembed.active_embedding()[0], openai_client.EMBEDDING_MODEL)
+
+            self.embed.reset_mock()
+            call_command("reembed", "new-model", "--switch", **options)
+            self.embed.assert_not_called()  # nothing changed since the backfill
+            self.assertEqual(reembed.active_embedding()[0], "new-model")
+            self.assertEqual(CandidateProfile.objects.filter(embedding_model="new-model").count(), 3)
+            self.assertEqual(MatchScore.objects.filter(job=self.job).count(), 3)
+            with self.assertRaises(CommandError):
+                call_command("reembed", "new-model", **options)
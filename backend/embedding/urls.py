@@ -1,8 +1,9 @@
 # embedding/urls.py
 from django.urls import path
-from .views import ResumeEmbeddingView, JDEmbeddingView
+from .views import ResumeEmbeddingView, JDEmbeddingView, IngestionTaskStatusView
 
 urlpatterns = [
     path("resume/", ResumeEmbeddingView.as_view(), name="embedding-resume"),
     path("jd/", JDEmbeddingView.as_view(), name="embedding-jd"),
+    path("tasks/<uuid:task_id>/", IngestionTaskStatusView.as_view(), name="ingestion-task-status"),
 ]
@@ -0,0 +1,92 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent single-item requests into batched calls.
+
+    Items submitted from any thread are collected until either `max_batch_size`
+    items are waiting or `max_wait` seconds have passed since the first one
+    arrived, then `batch_fn(items)` is called once for the whole batch. It must
+    return one result per item, in order. Batches run on a pool of up to
+    `max_workers` threads, so a slow batch (e.g. one backing off after a
+    429) doesn't hold up the ones collected after it.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=64, max_wait=0.01, max_workers=4):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._closed = False
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="micro-batch")
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        """
+        Queue an item and return a Future resolving to its result.
+        """
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed")
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def __call__(self, item):
+        return self.submit(item).result()
+
+    def close(self):
+        """
+        Stop accepting items; anything already queued is still processed.
+        """
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        self._executor.shutdown(wait=True)
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is None:
+                # Put the sentinel back so the loop exits after this batch
+                self._queue.put(None)
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            self._executor.submit(self._process, batch)
+
+    def _process(self, batch):
+        items = [item for item, _ in batch]
+        try:
+            results = self.batch_fn(items)
+            if len(results) != len(items):
+                raise RuntimeError(f"Batch function returned {len(results)} results for {len(items)} items")
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
@@ -0,0 +1,339 @@
+"""
+Local stand-ins for the OpenAI embedding/chat and Pinecone index APIs, for
+load tests and benchmarks that shouldn't spend money or hit real rate limits.
+
+One threaded HTTP server answers both protocols:
+- OpenAI at <url>/v1 (point openai.api_base or OPENAI_API_BASE there):
+  POST /v1/embeddings returns deterministic unit vectors seeded by the text,
+  POST /v1/chat/completions returns a small JSON object plus token usage.
+- Pinecone at <url> (PINECONE_HOST): the control plane under /indexes and,
+  per index, a data plane at <url>/pinecone/<name> with upsert, query and
+  delete over an in-memory store.
+
+Every request can be delayed (latency_ms plus up to jitter_ms) and failed
+with probability error_rate (error_status, with a Retry-After on 429s).
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from .vector_store import matches_filter
+
+DEFAULT_DIMENSION = 1536
+
+WORD_RE = re.compile(r"[A-Za-z][A-Za-z+#.]{3,}")
+
+
+def fake_embedding(text, dimension):
+    """
+    A unit vector that depends only on the text, so identical texts embed
+    identically across runs.
+    """
+    seed = int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "big")
+    vector = np.random.default_rng(seed).standard_normal(dimension, dtype=np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def fake_structured_reply(messages):
+    """
+    The JSON object a fake extraction answers with: the most frequent words
+    of the document as "skills". Missing fields are filled in by the caller.
+    """
+    text = messages[-1]["content"] if messages else ""
+    words = Counter(word.lower() for word in WORD_RE.findall(text))
+    return {"skills": [word for word, _ in words.most_common(10)]}
+
+
+def _tokens(text):
+    return len(text) // 4 + 1
+
+
+class FakeServicesServer(ThreadingHTTPServer):
+    """
+    Holds the configuration and the in-memory Pinecone indexes; see the
+    module docstring. Start it with start_fake_services().
+    """
+    daemon_threads = True
+
+    def __init__(self, address, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, error_status=503,
+                 dimension=DEFAULT_DIMENSION, indexes=(), seed=None):
+        super().__init__(address, FakeServicesHandler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.dimension = dimension
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = Counter()
+        self.errors = Counter()
+        # name -> {"dimension", "metric", "vectors": {id: (unit vector, metadata)}}
+        self.indexes = {}
+        for name in indexes:
+            self.create_index(name, dimension)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def openai_base(self):
+        return f"{self.url}/v1"
+
+    def create_index(self, name, dimension, metric="cosine"):
+        with self.lock:
+            return self.indexes.setdefault(name, {"dimension": dimension, "metric": metric, "vectors": {}})
+
+    def describe_index(self, name):
+        index = self.indexes[name]
+        return {
+            "name": name,
+            "dimension": index["dimension"],
+            "metric": index["metric"],
+            "host": f"{self.url}/pinecone/{name}",
+            "vector_type": "dense",
+            "deletion_protection": "disabled",
+            "status": {"ready": True, "state": "Ready"},
+            "spec": {"serverless": {"cloud": "aws", "region": "local"}},
+            "deployment": {"deployment_type": "managed", "cloud": "aws", "region": "local"},
+            "schema": {"fields": {"values": {
+                "type": "dense_vector", "dimension": index["dimension"], "metric": index["metric"],
+            }}},
+        }
+
+    def delay_and_fail(self):
+        """
+        Sleep for the configured latency; returns the status to fail the
+        request with, or None.
+        """
+        delay = self.latency_ms + (self.random.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+        if delay > 0:
+            time.sleep(delay / 1000)
+        if self.error_rate and self.random.random() < self.error_rate:
+            return self.error_status
+        return None
+
+    def stats(self):
+        with self.lock:
+            return {
+                "requests": dict(self.requests),
+                "errors": dict(self.errors),
+                "vectors": {name: len(index["vectors"]) for name, index in self.indexes.items()},
+            }
+
+
+class FakeServicesHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.dispatch()
+
+    def do_POST(self):
+        self.dispatch()
+
+    def do_DELETE(self):
+        self.dispatch()
+
+    def dispatch(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length)) if length else {}
+        except ValueError:
+            return self.reply(400, {"error": {"message": "Request body is not valid JSON."}})
+
+        path = self.path.split("?", 1)[0].rstrip("/")
+        route = self.route(path)
+        if route is None:
+            return self.reply(404, {"error": {"message": f"No route for {self.command} {path}"}})
+        name, handler, args = route
+
+        server = self.server
+        with server.lock:
+            server.requests[name] += 1
+        failure = server.delay_and_fail()
+        if failure:
+            with server.lock:
+                server.errors[name] += 1
+            headers = {"Retry-After": "1"} if failure == 429 else {}
+            return self.reply(failure, {"error": {"message": "Injected failure", "code": str(failure)}}, headers)
+        status, payload = handler(body, *args)
+        self.reply(status, payload)
+
+    def route(self, path):
+        method = self.command
+        if path == "/v1/embeddings" and method == "POST":
+            return "openai_embeddings", self.embeddings, ()
+        if path == "/v1/chat/completions" and method == "POST":
+            return "openai_chat", self.chat_completion, ()
+        if path == "/indexes" and method == "GET":
+            return "pinecone_list_indexes", self.list_indexes, ()
+        if path == "/indexes" and method == "POST":
+            return "pinecone_create_index", self.create_index, ()
+        match = re.fullmatch(r"/indexes/([^/]+)", path)
+        if match and method in ("GET", "DELETE"):
+            return "pinecone_describe_index", self.describe_index, (match.group(1),)
+        match = re.fullmatch(r"/pinecone/([^/]+)/(vectors/upsert|query|vectors/delete)", path)
+        if match and method == "POST":
+            operation = match.group(2).rsplit("/", 1)[-1]
+            handler = {"upsert": self.upsert, "query": self.query, "delete": self.delete}[operation]
+            return f"pinecone_{operation}", handler, (match.group(1),)
+        return None
+
+    def reply(self, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for header, value in (headers or {}).items():
+            self.send_header(header, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    # -- OpenAI ------------------------------------------------------------
+
+    def embeddings(self, body):
+        texts = body.get("input") or []
+        texts = [texts] if isinstance(texts, str) else texts
+        dimension = body.get("dimensions") or self.server.dimension
+        tokens = sum(_tokens(text) for text in texts)
+        return 200, {
+            "object": "list",
+            "model": body.get("model"),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": fake_embedding(text, dimension)}
+                for i, text in enumerate(texts)
+            ],
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    def chat_completion(self, body):
+        messages = body.get("messages") or []
+        content = json.dumps(fake_structured_reply(messages))
+        prompt_tokens = sum(_tokens(message.get("content") or "") for message in messages)
+        completion_tokens = _tokens(content)
+        return 200, {
+            "object": "chat.completion",
+            "model": body.get("model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    # -- Pinecone control plane ------------------------------------------
+
+    def list_indexes(self, body):
+        server = self.server
+        return 200, {"indexes": [server.describe_index(name) for name in sorted(server.indexes)]}
+
+    def create_index(self, body):
+        server = self.server
+        name = body.get("name")
+        # Older clients send dimension/metric, newer ones a schema of fields
+        vector_fields = [
+            field for field in ((body.get("schema") or {}).get("fields") or {}).values()
+            if field.get("type") == "dense_vector"
+        ]
+        field = vector_fields[0] if vector_fields else body
+        if not name or not field.get("dimension"):
+            return 400, {"error": {"message": "name and dimension are required."}}
+        if name in server.indexes:
+            return 409, {"error": {"message": f"Index {name} already exists."}}
+        server.create_index(name, int(field["dimension"]), field.get("metric") or "cosine")
+        return 201, server.describe_index(name)
+
+    def describe_index(self, body, name):
+        server = self.server
+        if name not in server.indexes:
+            return 404, {"error": {"message": f"Index {name} not found."}}
+        if self.command == "DELETE":
+            with server.lock:
+                del server.indexes[name]
+            return 202, {}
+        return 200, server.describe_index(name)
+
+    # -- Pinecone data plane ---------------------------------------------
+
+    def upsert(self, body, name):
+        index = self.server.indexes.get(name)
+        if index is None:
+            return 404, {"error": {"message": f"Index {name} not found."}}
+        records = body.get("vectors") or []
+        for record in records:
+            if len(record["values"]) != index["dimension"]:
+                return 400, {"error": {"message": (
+                    f"Vector dimension {len(record['values'])} does not match the dimension "
+                    f"of the index {index['dimension']}"
+                )}}
+        with self.server.lock:
+            for record in records:
+                values = np.asarray(record["values"], dtype=np.float32)
+                norm = np.linalg.norm(values)
+                index["vectors"][str(record["id"])] = (values / norm if norm else values, record.get("metadata") or {})
+        return 200, {"upsertedCount": len(records)}
+
+    def query(self, body, name):
+        index = self.server.indexes.get(name)
+        if index is None:
+            return 404, {"error": {"message": f"Index {name} not found."}}
+        vector = np.asarray(body.get("vector") or [], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        with self.server.lock:
+            candidates = [
+                (doc_id, values, metadata) for doc_id, (values, metadata) in index["vectors"].items()
+                if matches_filter(metadata, body.get("filter"))
+            ]
+        if candidates and norm:
+            scores = np.stack([values for _, values, _ in candidates]) @ (vector / norm)
+            order = np.argsort(-scores)[:int(body.get("topK") or 10)]
+        else:
+            order = []
+        matches = []
+        for i in order:
+            doc_id, values, metadata = candidates[i]
+            match = {"id": doc_id, "score": float(scores[i])}
+            if body.get("includeMetadata"):
+                match["metadata"] = metadata
+            if body.get("includeValues"):
+                match["values"] = values.tolist()
+            matches.append(match)
+        return 200, {"matches": matches, "namespace": body.get("namespace") or ""}
+
+    def delete(self, body, name):
+        index = self.server.indexes.get(name)
+        if index is None:
+            return 404, {"error": {"message": f"Index {name} not found."}}
+        with self.server.lock:
+            if body.get("deleteAll"):
+                index["vectors"].clear()
+            for doc_id in body.get("ids") or []:
+                index["vectors"].pop(str(doc_id), None)
+        return 200, {}
+
+
+def start_fake_services(host="127.0.0.1", port=0, **options):
+    """
+    Start a FakeServicesServer on a daemon thread (port 0 picks a free port)
+    and return it; call shutdown() to stop it. `options` are passed to
+    FakeServicesServer.
+    """
+    server = FakeServicesServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, name="fake-services", daemon=True).start()
+    return server
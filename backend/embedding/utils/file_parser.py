@@ -1,42 +1,256 @@
+import codecs
+import io
+import multiprocessing
 import os
 import re
+import signal
+import threading
+from collections import namedtuple
+from concurrent.futures import CancelledError, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
 
 # If you want to parse PDFs:
-from pdfminer.high_level import extract_text
+from pdfminer.converter import TextConverter
+from pdfminer.layout import LAParams
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
 # If you want to parse DOCX:
 import docx
 
-def parse_file(file_path):
+# Processes used to parse PDFs off the request/worker thread (0 parses inline)
+PARSER_MAX_WORKERS = int(os.getenv("PARSER_MAX_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Seconds a single document may take before it is abandoned
+PARSER_TIMEOUT = float(os.getenv("PARSER_TIMEOUT", "30"))
+# Stop reading a PDF after this many pages / characters of extracted text
+PARSER_MAX_PAGES = int(os.getenv("PARSER_MAX_PAGES", "50"))
+PARSER_MAX_CHARS = int(os.getenv("PARSER_MAX_CHARS", "100000"))
+
+# Extra seconds the caller waits beyond the worker's own deadline
+RESULT_TIMEOUT_GRACE = 5
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# A document handed to the pool: the pool, its future and what was sent
+Submission = namedtuple("Submission", "pool future payload extension")
+
+
+# Leading bytes that identify a format regardless of the file name
+MAGIC_NUMBERS = (
+    (b"%PDF-", ".pdf"),
+    (b"PK\x03\x04", ".docx"),  # DOCX is a zip container
+)
+SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".doc", ".txt")
+SNIFF_BYTES = 1024
+
+
+def parse_file(source, filename=None):
     """
-    Parses a file at the given path (PDF, DOCX, or TXT) and returns the extracted text.
+    Parses a document (PDF, DOCX, or TXT) and returns the extracted text.
+    - source: a path, raw bytes, or a binary file-like object such as a
+      Django UploadedFile, so uploads can be parsed without a temp file.
+    - filename: used as a format hint when the content can't be sniffed.
     """
-    extension = os.path.splitext(file_path)[1].lower()
+    data, name = _as_input(source, filename)
+    extension = detect_format(data, name)
+    _count_parsed(data, extension)
 
     if extension == ".pdf":
-        return parse_pdf(file_path)
+        return parse_pdf(data)
     elif extension in [".docx", ".doc"]:
-        return parse_docx(file_path)
+        return parse_docx(data)
     elif extension == ".txt":
-        return parse_txt(file_path)
+        return parse_txt(data)
     else:
         raise ValueError(f"Unsupported file format: {extension}")
 
-def parse_pdf(file_path):
+def parse_files(sources, return_exceptions=False):
     """
-    Extract text from a PDF file using pdfminer.six
+    Parse many documents (paths or buffers) concurrently across the process
+    pool and return their texts in the same order as `sources`.
+    - return_exceptions: put the exception in the result list for files that
+      fail instead of raising the first error.
+    """
+    sources = list(sources)
+    pool = _get_pool()
+    futures = []
+    for source in sources:
+        if pool is None:
+            futures.append(None)
+            continue
+        try:
+            payload, extension = _transportable(source)
+            _count_parsed(payload, extension)
+            futures.append(_submit(payload, extension))
+        except Exception as e:
+            # e.g. an unsupported format, detected before submitting
+            futures.append(e)
+
+    results = []
+    for source, future in zip(sources, futures):
+        try:
+            if future is None:
+                text = parse_file(source)
+            elif isinstance(future, Exception):
+                raise future
+            else:
+                text = _result(future, _display_name(source))
+        except Exception as e:
+            if not return_exceptions:
+                for pending in futures:
+                    if isinstance(pending, Submission):
+                        pending.future.cancel()
+                raise
+            text = e
+        results.append(text)
+    return results
+
+def detect_format(source, filename=None):
+    """
+    Work out a document's format from its leading bytes, falling back to the
+    file extension and finally to UTF-8 text. Returns an extension like ".pdf".
+    """
+    head = _peek(source, SNIFF_BYTES)
+    for magic, extension in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return extension
+
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension in SUPPORTED_EXTENSIONS:
+        return extension
+    if b"\x00" not in head:
+        try:
+            codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+            return ".txt"
+        except UnicodeDecodeError:
+            pass
+    raise ValueError(f"Unsupported file format: {extension or 'unknown'}")
+
+def _as_input(source, filename=None):
     """
+    Normalise a parse source to (path or seekable binary file, name).
+    """
+    if isinstance(source, (str, os.PathLike)):
+        path = os.fspath(source)
+        return path, filename or path
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source), filename
+    name = filename or getattr(source, "name", None)
+    # Large Django uploads are already spooled to disk; read them in place
+    if hasattr(source, "temporary_file_path"):
+        return source.temporary_file_path(), name
+    if hasattr(source, "seekable") and source.seekable():
+        return source, name
+    return io.BytesIO(source.read()), name
+
+def _peek(source, size):
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            return f.read(size)
+    position = source.tell()
+    head = source.read(size)
+    source.seek(position)
+    return head
+
+def _transportable(source, filename=None):
+    """
+    Turn a parse source into picklable (payload, extension) arguments for
+    the process pool: a path stays a path, anything else becomes bytes.
+    """
+    data, name = _as_input(source, filename)
+    extension = detect_format(data, name)
+    if isinstance(data, str):
+        return data, extension
+    if isinstance(data, io.BytesIO):
+        return data.getvalue(), extension
+    return data.read(), extension
+
+def _byte_size(data):
+    if isinstance(data, str):
+        return os.path.getsize(data)
+    if isinstance(data, (bytes, bytearray)):
+        return len(data)
+    position = data.tell()
+    size = data.seek(0, os.SEEK_END)
+    data.seek(position)
+    return size
+
+def _count_parsed(data, extension):
+    # Imported here: the parser pool's worker processes load this module
+    # without configuring Django
+    from backend.metrics import ENABLED, PARSED_BYTES, PARSED_DOCUMENTS
+    if not ENABLED:
+        return
+    file_format = extension.lstrip(".")
+    PARSED_DOCUMENTS.inc(format=file_format)
+    PARSED_BYTES.inc(_byte_size(data), format=file_format)
+
+def _display_name(source):
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.basename(os.fspath(source))
+    return getattr(source, "name", None) or "document"
+
+def parse_pdf(source):
+    """
+    Extract text from a PDF (path or binary file) using pdfminer.six, in a
+    worker process (bounded by PARSER_TIMEOUT, PARSER_MAX_PAGES and
+    PARSER_MAX_CHARS).
+    """
+    pool = _get_pool()
+    if pool is None:
+        return _parse_pdf_inline(source)
+    payload, _ = _transportable(source)
+    return _result(_submit(payload, ".pdf"), _display_name(source))
+
+def _parse_pdf_inline(source):
     try:
-        text = extract_text(file_path)
-        return clean_text(text)
+        text = extract_pdf_text(source)
+        return clean_text(text)[:PARSER_MAX_CHARS]
     except Exception as e:
         raise Exception(f"Error parsing PDF: {str(e)}")
 
-def parse_docx(file_path):
+def iter_pdf_pages(source, max_pages=None):
     """
-    Extract text from a DOCX file using python-docx
+    Yield the text of each PDF page in turn, so callers can stop early.
     """
+    resource_manager = PDFResourceManager(caching=True)
+    output = io.StringIO()
+    device = TextConverter(resource_manager, output, laparams=LAParams())
+    interpreter = PDFPageInterpreter(resource_manager, device)
+    fp = open(source, "rb") if isinstance(source, str) else source
     try:
-        doc = docx.Document(file_path)
+        for page in PDFPage.get_pages(fp, maxpages=max_pages or 0):
+            interpreter.process_page(page)
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate()
+    finally:
+        device.close()
+        if fp is not source:
+            fp.close()
+
+def extract_pdf_text(source, max_pages=None, max_chars=None):
+    """
+    Extract PDF text page by page, stopping after `max_pages` pages or once
+    `max_chars` characters have been read.
+    """
+    max_pages = max_pages or PARSER_MAX_PAGES
+    max_chars = max_chars or PARSER_MAX_CHARS
+    pages = []
+    length = 0
+    for page_text in iter_pdf_pages(source, max_pages=max_pages):
+        pages.append(page_text)
+        length += len(page_text)
+        if length >= max_chars:
+            break
+    return "".join(pages)
+
+def parse_docx(source):
+    """
+    Extract text from a DOCX file (path or binary file) using python-docx
+    """
+    try:
+        doc = docx.Document(source)
         full_text = []
         for para in doc.paragraphs:
             if para.text:
@@ -45,14 +259,17 @@ def parse_docx(file_path):
     except Exception as e:
         raise Exception(f"Error parsing DOCX: {str(e)}")
 
-def parse_txt(file_path):
+def parse_txt(source):
     """
-    Read text from a plain .txt file
+    Read UTF-8 text from a plain .txt file (path or binary file)
     """
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            text = f.read()
-        return clean_text(text)
+        if isinstance(source, str):
+            with open(source, "rb") as f:
+                data = f.read()
+        else:
+            data = source.read()
+        return clean_text(data.decode("utf-8"))
     except Exception as e:
         raise Exception(f"Error reading text file: {str(e)}")
 
@@ -64,3 +281,91 @@ def clean_text(text):
     text = text.replace("\r", " ").replace("\n", " ")
     text = re.sub(r'\s+', ' ', text).strip()
     return text
+
+
+def _get_pool():
+    """
+    Lazily start the parser process pool (None when PARSER_MAX_WORKERS is 0).
+    Uses the spawn start method because callers run inside threaded servers.
+    """
+    global _pool
+    if PARSER_MAX_WORKERS <= 0:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=PARSER_MAX_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _pool
+
+def _reset_pool(pool):
+    """
+    Tear down `pool`, e.g. after a worker got stuck past its timeout, unless
+    another caller already replaced it.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not pool:
+            return
+        _pool = None
+    for process in list((getattr(pool, "_processes", None) or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def _submit(payload, extension):
+    pool = _get_pool()
+    try:
+        future = pool.submit(_parse_in_worker, payload, extension)
+    except BrokenProcessPool:
+        # A worker died (e.g. crashed in C code); start a fresh pool
+        _reset_pool(pool)
+        pool = _get_pool()
+        future = pool.submit(_parse_in_worker, payload, extension)
+    return Submission(pool, future, payload, extension)
+
+def _wait(submission, name):
+    # The worker enforces PARSER_TIMEOUT itself; this is a backstop for a
+    # process that is wedged in C code and never sees the alarm. Only the
+    # wedged pool is torn down, not one that replaced it meanwhile.
+    try:
+        return submission.future.result(timeout=PARSER_TIMEOUT * 2 + RESULT_TIMEOUT_GRACE)
+    except FutureTimeoutError:
+        _reset_pool(submission.pool)
+        raise TimeoutError(f"Parsing {name} timed out")
+
+def _result(submission, name):
+    """
+    Wait for a submitted document. If the pool was torn down under it
+    (another document timed out, or a worker crashed), it is parsed once
+    more in a fresh pool rather than failing along with the culprit.
+    """
+    try:
+        return _wait(submission, name)
+    except (BrokenProcessPool, CancelledError):
+        return _wait(_submit(submission.payload, submission.extension), name)
+
+def _on_alarm(signum, frame):
+    raise TimeoutError(f"Document took longer than {PARSER_TIMEOUT:g}s to parse")
+
+def _parse_in_worker(source, extension):
+    """
+    Runs in a pool process: parse one document (path or bytes) under a
+    SIGALRM deadline.
+    """
+    use_alarm = hasattr(signal, "SIGALRM") and PARSER_TIMEOUT > 0
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, PARSER_TIMEOUT)
+    try:
+        if isinstance(source, bytes):
+            source = io.BytesIO(source)
+        if extension == ".pdf":
+            return _parse_pdf_inline(source)
+        elif extension in [".docx", ".doc"]:
+            return parse_docx(source)
+        return parse_txt(source)
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
@@ -1,49 +1,472 @@
+import asyncio
+import json
+import math
 import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import openai
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+from backend.metrics import API_CALLS, API_TOKENS, CACHE_LOOKUPS, timed
+from embedding.cache import (
+    EMBEDDING_CACHE_ENABLED,
+    EXTRACTION_CACHE_ENABLED,
+    cache_key,
+    embedding_cache,
+    extraction_cache,
+    text_digest,
+)
+from embedding.models import ExtractionUsage
+
+from .batching import MicroBatcher
+from .rate_limit import PRIORITY_BULK, RateLimiter, current_priority, priority, set_default_priority
+from .prompt_templates import (
+    EXTRACTION_MODEL,
+    JD_FIELDS,
+    PROMPT_VERSION,
+    RESUME_FIELDS,
+    build_messages,
+    chunk_document,
+    merge_structured,
+    trim_document,
+)
 
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
-def generate_embedding(text, model="text-embedding-ada-002"):
+EMBEDDING_MODEL = "text-embedding-ada-002"
+# Largest number of texts sent in one Embedding.create call
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "64"))
+# How long generate_embedding waits for other callers to share its request (0 disables)
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "10"))
+# Coalesced batches sent concurrently per model
+EMBEDDING_BATCH_WORKERS = int(os.getenv("EMBEDDING_BATCH_WORKERS", "4"))
+# Chunks of one over-long document extracted concurrently
+EXTRACTION_CHUNK_WORKERS = int(os.getenv("EXTRACTION_CHUNK_WORKERS", "4"))
+
+
+# Client-side limits per API, so bursts queue here instead of failing upstream.
+# Point OPENAI_API_BASE at a local fake server to exercise them.
+OPENAI_EMBEDDING_RPM = int(os.getenv("OPENAI_EMBEDDING_RPM", "3000"))
+OPENAI_EMBEDDING_TPM = int(os.getenv("OPENAI_EMBEDDING_TPM", "1000000"))
+OPENAI_CHAT_RPM = int(os.getenv("OPENAI_CHAT_RPM", "3500"))
+OPENAI_CHAT_TPM = int(os.getenv("OPENAI_CHAT_TPM", "90000"))
+# The limiters below live in each process, so they can't order or pace
+# requests across processes. With N processes (web workers plus bulk
+# commands) on one API key, set OPENAI_PROCESS_SHARE to about 1/N so their
+# budgets add up to the account's. Bulk commands (import_resumes, reembed)
+# use only OPENAI_BULK_SHARE of that, leaving the rest to web uploads.
+OPENAI_PROCESS_SHARE = float(os.getenv("OPENAI_PROCESS_SHARE", "1"))
+OPENAI_BULK_SHARE = float(os.getenv("OPENAI_BULK_SHARE", "0.5"))
+# Upper bound of the adaptive limit on requests in flight per API
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "5"))
+# Seconds a request may wait for rate limit capacity before giving up
+OPENAI_QUEUE_TIMEOUT = float(os.getenv("OPENAI_QUEUE_TIMEOUT", "60"))
+# Completion tokens reserved per extraction until the real count is known
+EXTRACTION_COMPLETION_ESTIMATE = 600
+
+
+class OpenAIServiceError(Exception):
     """
-    Get vector embedding for a text using OpenAI's API.
+    An OpenAI request failed. status_code is the HTTP status a view should
+    answer with, and retry_after (seconds) is set when retrying later helps.
+    """
+    status_code = 502
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    def headers(self):
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after)))} if self.retry_after else {}
+
+
+class OpenAIRateLimitError(OpenAIServiceError):
+    """
+    Still rate limited after every retry, or no client-side capacity freed
+    up within OPENAI_QUEUE_TIMEOUT.
+    """
+    status_code = 429
+
+
+class OpenAIUnavailableError(OpenAIServiceError):
+    """
+    OpenAI kept failing with server or connection errors.
+    """
+    status_code = 503
+
+
+_limiters = {
+    "embeddings": RateLimiter(
+        OPENAI_EMBEDDING_RPM, OPENAI_EMBEDDING_TPM, OPENAI_MAX_CONCURRENCY, share=OPENAI_PROCESS_SHARE
+    ),
+    "chat": RateLimiter(OPENAI_CHAT_RPM, OPENAI_CHAT_TPM, OPENAI_MAX_CONCURRENCY, share=OPENAI_PROCESS_SHARE),
+}
+
+
+def run_as_bulk():
+    """
+    Mark this process as a backfill: its requests queue in the bulk lane
+    and it keeps to OPENAI_BULK_SHARE of the process budget, so web uploads
+    running in other processes still find capacity.
+    """
+    set_default_priority(PRIORITY_BULK)
+    for limiter in _limiters.values():
+        limiter.set_share(OPENAI_PROCESS_SHARE * OPENAI_BULK_SHARE)
+
+
+def estimate_tokens(texts):
+    """
+    Rough token count (about four characters a token) used to reserve
+    tokens-per-minute capacity before a request is sent.
+    """
+    return sum(len(text) // 4 + 1 for text in texts)
+
+
+def _is_overload(error):
+    status = getattr(error, "http_status", None)
+    if status is None:
+        return isinstance(error, openai.error.Timeout)
+    return status == 429 or status >= 500
+
+
+def _is_retryable(error):
+    return _is_overload(error) or isinstance(error, (openai.error.APIConnectionError, openai.error.TryAgain))
+
+
+def _retry_after(error):
+    try:
+        return float((getattr(error, "headers", None) or {}).get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def call_openai(api, create, estimated_tokens, **kwargs):
     """
+    Send one request through the rate limiter of `api` ("embeddings" or
+    "chat"), in the caller's priority lane. 429s, 5xx and connection errors
+    are retried with jittered exponential backoff (or after the server's
+    Retry-After) up to OPENAI_MAX_RETRIES times.
+    Raises OpenAIRateLimitError, OpenAIUnavailableError or, for errors
+    retrying can't fix, OpenAIServiceError.
+    """
+    limiter = _limiters[api]
+    for attempt in range(OPENAI_MAX_RETRIES + 1):
+        try:
+            with timed("openai_wait"):
+                lease = limiter.acquire(estimated_tokens, timeout=OPENAI_QUEUE_TIMEOUT)
+        except TimeoutError:
+            API_CALLS.inc(api=f"openai_{api}", outcome="throttled")
+            raise OpenAIRateLimitError(
+                "OpenAI rate limit reached, try again later.", retry_after=OPENAI_QUEUE_TIMEOUT
+            )
+        try:
+            response = create(**kwargs)
+            usage = response.get("usage") or {}
+            if "total_tokens" in usage:
+                lease.record_usage(usage["total_tokens"])
+            API_CALLS.inc(api=f"openai_{api}", outcome="ok")
+            for kind in ("prompt_tokens", "completion_tokens"):
+                if usage.get(kind):
+                    API_TOKENS.inc(usage[kind], api=f"openai_{api}", kind=kind.split("_")[0])
+            return response
+        except openai.error.OpenAIError as e:
+            error = e
+            API_CALLS.inc(api=f"openai_{api}", outcome=str(getattr(e, "http_status", None) or "connection_error"))
+            if _is_overload(e):
+                lease.overloaded(_retry_after(e))
+        finally:
+            limiter.release(lease)
+
+        if not _is_retryable(error):
+            raise OpenAIServiceError(f"OpenAI API error: {error}") from error
+        retry_after = _retry_after(error)
+        if attempt == OPENAI_MAX_RETRIES:
+            exception = OpenAIRateLimitError if getattr(error, "http_status", None) == 429 else OpenAIUnavailableError
+            raise exception(f"OpenAI API error: {error}", retry_after=retry_after or 1) from error
+        time.sleep(retry_after or min(30.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.5))
+
+
+def openai_embedding_backend(texts, model):
+    """
+    Embed a list of texts with a single OpenAI API call.
+    """
+    response = call_openai(
+        "embeddings",
+        openai.Embedding.create,
+        estimate_tokens(texts),
+        input=texts,
+        model=model,
+    )
+    data = sorted(response['data'], key=lambda item: item['index'])
+    return [item['embedding'] for item in data]
+
+
+_embedding_backend = openai_embedding_backend
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def set_embedding_backend(backend):
+    """
+    Swap the function used to embed texts, e.g. for a local fake in tests or
+    benchmarks. `backend(texts, model)` must return one vector per text.
+    Pass None to restore the OpenAI backend.
+    """
+    global _embedding_backend
+    with _batchers_lock:
+        _embedding_backend = backend or openai_embedding_backend
+        for batcher in _batchers.values():
+            batcher.close()
+        _batchers.clear()
+
+
+def _embed_uncached(texts, model, batch_size=None):
+    """
+    Call the embedding backend for every text, at most `batch_size`
+    (default EMBEDDING_BATCH_MAX_SIZE) texts per call.
+    """
+    batch_size = batch_size or EMBEDDING_BATCH_MAX_SIZE
+    embeddings = []
     try:
-        response = openai.Embedding.create(
-            input=text,
-            model=model
-        )
-        embedding = response['data'][0]['embedding']
-        return embedding
+        for start in range(0, len(texts), batch_size):
+            embeddings.extend(_embedding_backend(texts[start:start + batch_size], model))
+    except OpenAIServiceError:
+        raise
     except Exception as e:
-        raise Exception(f"OpenAI API error: {e}")
+        raise OpenAIServiceError(f"OpenAI API error: {e}") from e
+    return embeddings
+
+
+def _embed_and_store(texts, model, batch_size=None):
+    """
+    Embed texts that missed the cache (each distinct text once) and store them.
+    """
+    if not EMBEDDING_CACHE_ENABLED:
+        return _embed_uncached(texts, model, batch_size)
+    keys = [cache_key(text, model) for text in texts]
+    unique = dict(zip(keys, texts))
+    vectors = dict(zip(unique, _embed_uncached(list(unique.values()), model, batch_size)))
+    embedding_cache.set_many(model, vectors)
+    return [vectors[key] for key in keys]
+
+
+def generate_embeddings(texts, model=EMBEDDING_MODEL, batch_size=None):
+    """
+    Get vector embeddings for many texts. Cached texts are served from the
+    embedding cache; the rest are sent at most `batch_size` per API call.
+    """
+    texts = list(texts)
+    if not EMBEDDING_CACHE_ENABLED:
+        return _embed_uncached(texts, model, batch_size)
+
+    keys = [cache_key(text, model) for text in texts]
+    found = embedding_cache.get_many(list(dict.fromkeys(keys)))
+    missing = {key: text for key, text in zip(keys, texts) if key not in found}
+    if missing:
+        found.update(zip(missing, _embed_and_store(list(missing.values()), model, batch_size)))
+    return [found[key] for key in keys]
+
+
+def _embed_batch(items, model):
+    """
+    Embed (text, lane) items coalesced by the batcher. Batcher threads
+    don't share their callers' context, so the batch is sent in the most
+    urgent of their lanes. Like a request, the batch closes the thread's
+    database connection (used by the cache) once it's past CONN_MAX_AGE.
+    """
+    close_old_connections()
+    try:
+        with priority(min(lane for _, lane in items)):
+            return _embed_and_store([text for text, _ in items], model)
+    finally:
+        close_old_connections()
+
+
+def _get_batcher(model):
+    batcher = _batchers.get(model)
+    if batcher is None:
+        with _batchers_lock:
+            batcher = _batchers.get(model)
+            if batcher is None:
+                batcher = MicroBatcher(
+                    lambda items: _embed_batch(items, model),
+                    max_batch_size=EMBEDDING_BATCH_MAX_SIZE,
+                    max_wait=EMBEDDING_BATCH_MAX_WAIT_MS / 1000,
+                    max_workers=EMBEDDING_BATCH_WORKERS,
+                )
+                _batchers[model] = batcher
+    return batcher
+
+
+def generate_embedding(text, model=EMBEDDING_MODEL):
+    """
+    Get vector embedding for a text using OpenAI's API.
+    The embedding cache is checked first; concurrent misses are coalesced
+    into a single batched request.
+    """
+    if EMBEDDING_CACHE_ENABLED:
+        key = cache_key(text, model)
+        cached = embedding_cache.get_many([key]).get(key)
+        if cached is not None:
+            return cached
+    if EMBEDDING_BATCH_MAX_WAIT_MS <= 0:
+        return _embed_and_store([text], model)[0]
+    return _get_batcher(model)((text, current_priority()))
+
+
+# A ```json ... ``` fence some replies wrap the object in
+FENCE_RE = re.compile(r"^```(?:json)?\s*(.*?)\s*```$", re.DOTALL)
+
+
+def parse_structured_data(content, role="resume"):
+    """
+    Parse the model's reply into a dict that has every field required for
+    `role`. Raises ValueError if the reply is not a JSON object.
+    """
+    text = content.strip()
+    match = FENCE_RE.match(text)
+    if match:
+        text = match.group(1)
+    try:
+        data = json.loads(text)
+    except ValueError as e:
+        raise ValueError(f"Structured data is not valid JSON: {e}") from e
+    if not isinstance(data, dict):
+        raise ValueError("Structured data must be a JSON object.")
+
+    for field in RESUME_FIELDS if role == "resume" else JD_FIELDS:
+        data.setdefault(field, None)
+    return data
+
+
+def _complete(messages):
+    """
+    One chat completion. Returns (reply content, token usage dict).
+    """
+    response = call_openai(
+        "chat",
+        openai.ChatCompletion.create,
+        estimate_tokens(message["content"] for message in messages) + EXTRACTION_COMPLETION_ESTIMATE,
+        model=EXTRACTION_MODEL,
+        messages=messages,
+        temperature=0,
+        response_format={"type": "json_object"},
+    )
+    return response["choices"][0]["message"]["content"], response.get("usage") or {}
+
+
+def _extract_chunk(text, role, part, parts, lane=None):
+    with priority(current_priority() if lane is None else lane):
+        content, usage = _complete(build_messages(text, role, part=part, parts=parts))
+    return parse_structured_data(content, role=role), usage
 
 
 def extract_structured_data(text, role="resume"):
     """
     Use ChatCompletion with gpt-3.5-turbo to parse text into structured JSON.
+    Returns the parsed dict.
+    Results are cached per (text, role, PROMPT_VERSION). On a miss the text
+    is trimmed of boilerplate and repeated sentences, and documents longer
+    than EXTRACTION_MAX_CHARS are extracted chunk by chunk and merged.
+    Every call is recorded as an ExtractionUsage row.
+    """
+    started = time.monotonic()
+    role = "resume" if role == "resume" else "jd"
+    key, usage, data = _cached_extraction(text, role, started)
+    if data is None:
+        data = _extract_uncached(text, role, usage)
+        _store_extraction(key, role, usage, data, started)
+    return data
+
+
+def _cached_extraction(text, role, started):
     """
-    if role == "resume":
-        system_prompt = (
-            "You are an AI assistant that can parse resumes into structured JSON. "
-            "Required fields: summary, experience, skills, education, projects, certifications. "
-            "Output valid JSON only."
-        )
+    Look the extraction up in the cache. Returns (cache key, usage row,
+    data); on a hit the usage row is already recorded, on a miss data is None.
+    """
+    usage = ExtractionUsage(role=role, prompt_version=PROMPT_VERSION, input_chars=len(text))
+    key = text_digest(text) if EXTRACTION_CACHE_ENABLED else None
+    if key:
+        entry = extraction_cache.get(key, role, PROMPT_VERSION)
+        CACHE_LOOKUPS.inc(cache="extraction", result="miss" if entry is None else "hit")
+        if entry is not None:
+            usage.cached = True
+            usage.saved_tokens = entry.prompt_tokens + entry.completion_tokens
+            _record_usage(usage, started)
+            return key, usage, entry.data
+    return key, usage, None
+
+
+def _extract_uncached(text, role, usage):
+    """
+    The API part of an extraction (no database access): trim, chunk,
+    extract and merge, filling in the size and token counts of `usage`.
+    """
+    chunks = chunk_document(trim_document(text))
+    usage.chunks = len(chunks)
+    usage.sent_chars = sum(len(chunk) for chunk in chunks)
+    if len(chunks) == 1:
+        results = [_extract_chunk(chunks[0], role, 1, 1)]
     else:
-        system_prompt = (
-            "You are an AI assistant that can parse job descriptions into structured JSON. "
-            "Required fields: about_company, role_overview, qualifications, location, job_type, benefits. "
-            "Output valid JSON only."
-        )
-    
-    user_prompt = f"Extract and summarize the following text in JSON format:\n\n{text}\n\n"
-
-    response = openai.ChatCompletion.create(
-        model="gpt-3.5-turbo",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
-        temperature=0,
-    )
-    structured_response = response["choices"][0]["message"]["content"]
-    return structured_response
\ No newline at end of file
+        # Pool threads don't inherit the caller's priority lane; pass it on
+        lane = current_priority()
+        with ThreadPoolExecutor(max_workers=min(len(chunks), EXTRACTION_CHUNK_WORKERS)) as executor:
+            results = list(executor.map(
+                lambda item: _extract_chunk(item[1], role, item[0], len(chunks), lane), enumerate(chunks, 1)
+            ))
+
+    usage.prompt_tokens = sum(tokens.get("prompt_tokens", 0) for _, tokens in results)
+    usage.completion_tokens = sum(tokens.get("completion_tokens", 0) for _, tokens in results)
+    return merge_structured([result for result, _ in results], role=role)
+
+
+def _store_extraction(key, role, usage, data, started):
+    if key:
+        extraction_cache.set(key, role, PROMPT_VERSION, data, usage.prompt_tokens, usage.completion_tokens)
+    _record_usage(usage, started)
+
+
+def _record_usage(usage, started):
+    usage.duration_ms = int((time.monotonic() - started) * 1000)
+    usage.save()
+
+
+# Async variants for ASGI views. Only the API calls run on pool threads
+# (thread_sensitive=False) so independent calls can overlap; cache and usage
+# rows go through the ORM on the thread-sensitive thread, whose connection
+# Django manages, rather than opening one in every pool thread.
+
+async def agenerate_embedding(text, model=EMBEDDING_MODEL):
+    """
+    Async generate_embedding. Coalesced misses are awaited without holding
+    a thread.
+    """
+    key = cache_key(text, model) if EMBEDDING_CACHE_ENABLED else None
+    if key:
+        cached = (await sync_to_async(embedding_cache.get_many)([key])).get(key)
+        if cached is not None:
+            return cached
+    if EMBEDDING_BATCH_MAX_WAIT_MS > 0:
+        return await asyncio.wrap_future(_get_batcher(model).submit((text, current_priority())))
+    vector = (await sync_to_async(_embed_uncached, thread_sensitive=False)([text], model))[0]
+    if key:
+        await sync_to_async(embedding_cache.set_many)(model, {key: vector})
+    return vector
+
+
+async def aextract_structured_data(text, role="resume"):
+    """
+    Async extract_structured_data.
+    """
+    started = time.monotonic()
+    role = "resume" if role == "resume" else "jd"
+    key, usage, data = await sync_to_async(_cached_extraction)(text, role, started)
+    if data is None:
+        data = await sync_to_async(_extract_uncached, thread_sensitive=False)(text, role, usage)
+        await sync_to_async(_store_extraction)(key, role, usage, data, started)
+    return data
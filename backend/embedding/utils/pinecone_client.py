@@ -1,31 +1,140 @@
 import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import urllib3
 from pinecone import Pinecone, ServerlessSpec
+from pinecone.exceptions import PineconeApiException, PineconeProtocolError
+
+from backend.metrics import API_CALLS
+
+try:
+    from pinecone.errors import PineconeConnectionError, PineconeTimeoutError
+except ImportError:
+    # Older clients let urllib3's transport errors through instead
+    PineconeConnectionError = PineconeTimeoutError = ConnectionError
+
+# Failures of the request itself rather than of what was sent
+TRANSPORT_ERRORS = (
+    ConnectionError,
+    TimeoutError,
+    PineconeConnectionError,
+    PineconeTimeoutError,
+    PineconeProtocolError,
+    urllib3.exceptions.HTTPError,
+)
 
 # Load the Pinecone API key from environment variables
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_ENV = os.getenv("PINECONE_ENV")
+# Control-plane URL override, e.g. the stand-in from `manage.py run_fake_services`
+PINECONE_HOST = os.getenv("PINECONE_HOST")
 INDEX_NAME = "ats"
 
-# Create an instance of the Pinecone client using the new API.
-pc = Pinecone(api_key=PINECONE_API_KEY)
+# Parallel upsert requests (and pooled HTTP connections) per process
+PINECONE_POOL_THREADS = int(os.getenv("PINECONE_POOL_THREADS", "8"))
+# Vectors per upsert request; Pinecone recommends batches of around 100
+PINECONE_UPSERT_BATCH_SIZE = int(os.getenv("PINECONE_UPSERT_BATCH_SIZE", "100"))
+PINECONE_MAX_RETRIES = int(os.getenv("PINECONE_MAX_RETRIES", "5"))
+
+_client = None
+_indexes = {}
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Create the Pinecone client on first use rather than at import time, so
+    the module can be imported (e.g. with the local vector store) without
+    Pinecone credentials.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = Pinecone(api_key=PINECONE_API_KEY, host=PINECONE_HOST)
+    return _client
+
+def configure(api_key=None, host=None):
+    """
+    Point this process at another Pinecone deployment (e.g. a local fake
+    server). Clients and index handles created so far are dropped.
+    """
+    global PINECONE_API_KEY, PINECONE_HOST, _client
+    with _client_lock:
+        PINECONE_API_KEY = api_key
+        PINECONE_HOST = host
+        _client = None
+        _indexes.clear()
 
-def create_index(dimensions):
+def get_index(name=None):
+    """
+    Return the shared handle for an index (default INDEX_NAME), created once
+    per process. Its HTTP connection pool is sized for PINECONE_POOL_THREADS
+    concurrent requests, so repeated upserts reuse open connections.
     """
-    Create the Pinecone index if it doesn't already exist.
+    name = name or INDEX_NAME
+    index = _indexes.get(name)
+    if index is None:
+        client = get_client()
+        with _client_lock:
+            index = _indexes.get(name)
+            if index is None:
+                index = client.Index(name, pool_threads=PINECONE_POOL_THREADS)
+                _indexes[name] = index
+    return index
+
+def _status(error):
+    # Older clients set `status`, newer ones `status_code`
+    return getattr(error, "status", None) or getattr(error, "status_code", None)
+
+def is_transient(error):
+    # Rate limits, server errors and transport failures; anything else (bad
+    # input, auth, a bug) fails the same way on every attempt
+    if isinstance(error, PineconeApiException):
+        status = _status(error)
+        return status is not None and (status == 429 or status >= 500)
+    return isinstance(error, TRANSPORT_ERRORS)
+
+def with_retry(func, *args, **kwargs):
+    """
+    Call func, retrying rate-limit (429), 5xx and connection errors with
+    exponential backoff plus jitter, up to PINECONE_MAX_RETRIES times.
+    Other exceptions are raised straight away.
+    """
+    for attempt in range(PINECONE_MAX_RETRIES + 1):
+        try:
+            result = func(*args, **kwargs)
+            API_CALLS.inc(api="pinecone", outcome="ok")
+            return result
+        except Exception as e:
+            retryable = is_transient(e)
+            outcome = _status(e) if isinstance(e, PineconeApiException) else None
+            API_CALLS.inc(api="pinecone", outcome=str(outcome or ("connection_error" if retryable else "error")))
+            if attempt == PINECONE_MAX_RETRIES or not retryable:
+                raise
+            time.sleep(min(30.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.5))
+
+def create_index(dimensions, name=None):
     """
+    Create the Pinecone index (default INDEX_NAME) if it doesn't already exist.
+    """
+    name = name or INDEX_NAME
+    pc = get_client()
     # Get the list of current indexes and extract their names
     existing_indexes = pc.list_indexes().names()
     print(existing_indexes)
-    if INDEX_NAME not in existing_indexes:
+    if name not in existing_indexes:
         pc.create_index(
-            name=INDEX_NAME,
+            name=name,
             dimension=dimensions,
             metric="cosine",  # or use 'euclidean' as per your use case
             spec=ServerlessSpec(cloud="aws", region=PINECONE_ENV)
         )
-        print(f"Index '{INDEX_NAME}' created.")
+        print(f"Index '{name}' created.")
     else:
-        print(f"Index '{INDEX_NAME}' already exists.")
+        print(f"Index '{name}' already exists.")
 
 def upsert_embedding(doc_id, embedding, metadata=None):
     """
@@ -34,7 +143,76 @@ def upsert_embedding(doc_id, embedding, metadata=None):
     - embedding: The vector embedding (list of floats).
     - metadata: A dictionary with additional info (e.g., {"type": "resume"} or {"type": "jd"}).
     """
-    # Obtain the index instance
-    index = pc.Index(INDEX_NAME)
-    vector = {"id": str(doc_id), "values": embedding, "metadata": metadata or {}}
-    index.upsert([vector])
+    upsert_vectors([(doc_id, embedding, metadata)])
+
+def _to_records(vectors):
+    return [
+        {"id": str(doc_id), "values": list(embedding), "metadata": metadata or {}}
+        for doc_id, embedding, metadata in vectors
+    ]
+
+def upsert_vectors(vectors, index_name=None):
+    """
+    Upsert several (doc_id, embedding, metadata) tuples in one request.
+    """
+    with_retry(get_index(index_name).upsert, vectors=_to_records(vectors))
+
+def upsert_embeddings_bulk(vectors, batch_size=None, max_workers=None, index_name=None):
+    """
+    Upsert any number of (doc_id, embedding, metadata) tuples, split into
+    batches of `batch_size` sent over `max_workers` parallel requests on the
+    shared index handle. Each batch is retried independently.
+    Returns the number of vectors upserted.
+    """
+    batch_size = batch_size or PINECONE_UPSERT_BATCH_SIZE
+    max_workers = max_workers or PINECONE_POOL_THREADS
+    index = get_index(index_name)
+
+    def batches():
+        batch = []
+        for vector in vectors:
+            batch.append(vector)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def send(batch):
+        with_retry(index.upsert, vectors=_to_records(batch))
+        return len(batch)
+
+    total = 0
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pinecone-upsert") as executor:
+        pending = set()
+        for batch in batches():
+            # Bound the number of in-flight batches so huge iterables stream
+            if len(pending) >= max_workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                total += sum(future.result() for future in done)
+            pending.add(executor.submit(send, batch))
+        total += sum(future.result() for future in wait(pending).done)
+    return total
+
+def delete_embeddings(doc_ids, index_name=None):
+    """
+    Delete vectors by id from the Pinecone index.
+    """
+    with_retry(get_index(index_name).delete, ids=[str(doc_id) for doc_id in doc_ids])
+
+def query_embedding(embedding, top_k=10, filter=None, index_name=None):
+    """
+    Return the top_k closest vectors as [{"id", "score", "metadata"}, ...].
+    - filter: Pinecone metadata filter, e.g. {"type": "resume"}.
+    """
+    response = with_retry(
+        get_index(index_name).query,
+        vector=list(embedding),
+        top_k=top_k,
+        filter=filter,
+        include_metadata=True,
+    )
+    return [
+        {"id": match["id"], "score": match["score"], "metadata": match.get("metadata") or {}}
+        for match in response["matches"]
+    ]
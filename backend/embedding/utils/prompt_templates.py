@@ -0,0 +1,166 @@
+import os
+import re
+
+# Bump whenever the prompts, the trimming rules below or the chat model
+# change, so cached extractions made with the old ones are not reused.
+PROMPT_VERSION = "2"
+EXTRACTION_MODEL = "gpt-3.5-turbo"
+
+# Longest text sent in one extraction request; longer documents are split
+# into chunks that are extracted separately and merged
+EXTRACTION_MAX_CHARS = int(os.getenv("EXTRACTION_MAX_CHARS", "12000"))
+
+# Fields extract_structured_data asks for; missing ones are filled with None
+RESUME_FIELDS = (
+    "summary", "location", "years_of_experience", "experience", "skills",
+    "education", "projects", "certifications",
+)
+JD_FIELDS = ("about_company", "role_overview", "qualifications", "location", "job_type", "benefits")
+
+# Built once rather than on every call
+SYSTEM_PROMPTS = {
+    "resume": (
+        "You are an AI assistant that can parse resumes into structured JSON. "
+        f"Required fields: {', '.join(RESUME_FIELDS)}. "
+        "skills is a list of short skill names, location is the candidate's city and country, "
+        "and years_of_experience is the total years of professional experience as a number. "
+        "Output valid JSON only."
+    ),
+    "jd": (
+        "You are an AI assistant that can parse job descriptions into structured JSON. "
+        f"Required fields: {', '.join(JD_FIELDS)}. "
+        "Output valid JSON only."
+    ),
+}
+USER_PROMPT = "Extract and summarize the following text in JSON format:\n\n{text}"
+CHUNK_PROMPT = (
+    "This is part {part} of {parts} of the document. Extract only what appears in this part "
+    "in JSON format, using null for fields it does not mention:\n\n{text}"
+)
+
+# Sentence ends, bullets and pipes: the boundaries documents are trimmed and
+# chunked on (parsed text has its line breaks collapsed)
+SEGMENT_RE = re.compile(r"(?<=[.!?])\s+|\s+[•▪●◦·|]\s+")
+PAGE_MARKER_RE = re.compile(r"\bpage \d+(?: of \d+)?\b", re.IGNORECASE)
+# Segments that carry nothing worth extracting
+BOILERPLATE_RE = re.compile(
+    r"^(?:"
+    r"curriculum vitae|r[eé]sum[eé]|cv"
+    r"|references (?:are )?available (?:up)?on request"
+    r"|i hereby declare\b.*"
+    r"|.*\bequal (?:employment )?opportunity employer\b.*"
+    r"|.*\bwithout regard to (?:race|age|gender|religion)\b.*"
+    r")[.!]?$",
+    re.IGNORECASE,
+)
+WORD_RE = re.compile(r"\w+")
+
+
+def system_prompt(role):
+    return SYSTEM_PROMPTS["resume" if role == "resume" else "jd"]
+
+
+def fields_for(role):
+    return RESUME_FIELDS if role == "resume" else JD_FIELDS
+
+
+def split_segments(text):
+    return [segment.strip() for segment in SEGMENT_RE.split(text) if segment.strip()]
+
+
+def trim_document(text):
+    """
+    Shrink a parsed document before it is sent for extraction: drop page
+    markers, boilerplate sentences (references, declarations, equal
+    opportunity statements) and sentences repeated verbatim, e.g. headers
+    and footers carried over from every page. Returns one segment per line.
+    """
+    kept = []
+    seen = set()
+    for segment in split_segments(PAGE_MARKER_RE.sub(" ", text)):
+        segment = " ".join(segment.split())
+        if not segment or BOILERPLATE_RE.match(segment):
+            continue
+        key = " ".join(WORD_RE.findall(segment.lower()))
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        kept.append(segment)
+    return "\n".join(kept)
+
+
+def chunk_document(text, max_chars=None):
+    """
+    Split trimmed text into chunks of at most max_chars (default
+    EXTRACTION_MAX_CHARS) on line boundaries, breaking over-long lines on
+    whitespace.
+    """
+    max_chars = max_chars or EXTRACTION_MAX_CHARS
+    if len(text) <= max_chars:
+        return [text]
+
+    chunks = []
+    current = []
+    length = 0
+    for line in text.split("\n"):
+        while len(line) > max_chars:
+            cut = line.rfind(" ", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            if current:
+                chunks.append("\n".join(current))
+                current, length = [], 0
+            chunks.append(line[:cut])
+            line = line[cut:].strip()
+        if current and length + len(line) + 1 > max_chars:
+            chunks.append("\n".join(current))
+            current, length = [], 0
+        current.append(line)
+        length += len(line) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def build_messages(text, role, part=1, parts=1):
+    """
+    Chat messages for extracting one chunk (part of parts) of a document.
+    """
+    if parts == 1:
+        user_prompt = USER_PROMPT.format(text=text)
+    else:
+        user_prompt = CHUNK_PROMPT.format(part=part, parts=parts, text=text)
+    return [
+        {"role": "system", "content": system_prompt(role)},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+def _merge_values(first, second):
+    if first in (None, "", [], {}):
+        return second
+    if second in (None, "", [], {}):
+        return first
+    if isinstance(first, list) and isinstance(second, list):
+        merged = list(first)
+        merged.extend(item for item in second if item not in first)
+        return merged
+    if isinstance(first, (int, float)) and isinstance(second, (int, float)):
+        # e.g. years_of_experience: each chunk only sees part of the history
+        return max(first, second)
+    return first
+
+
+def merge_structured(results, role="resume"):
+    """
+    Combine the extractions of a document's chunks: lists are concatenated
+    without duplicates, numbers take the largest value and anything else
+    keeps the first non-empty value.
+    """
+    merged = {}
+    for data in results:
+        for field, value in data.items():
+            merged[field] = _merge_values(merged.get(field), value)
+    for field in fields_for(role):
+        merged.setdefault(field, None)
+    return merged
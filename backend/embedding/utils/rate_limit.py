@@ -0,0 +1,253 @@
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+# Lanes: lower values are served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
+# Bucket capacity in seconds of refill, i.e. how large a burst is allowed
+BURST_SECONDS = 10
+
+_priority = contextvars.ContextVar("rate_limit_priority", default=None)
+_default_priority = PRIORITY_INTERACTIVE
+
+
+def current_priority():
+    """
+    The lane requests made from the current context are queued in.
+    """
+    lane = _priority.get()
+    return _default_priority if lane is None else lane
+
+
+def set_default_priority(lane):
+    """
+    Set the lane for the whole process, including threads that don't
+    inherit the caller's context. Lanes don't span processes, so backfill
+    commands should also cap their share of the budget (see
+    openai_client.run_as_bulk).
+    """
+    global _default_priority
+    _default_priority = lane
+
+
+@contextmanager
+def priority(lane):
+    """
+    Queue requests made inside the block in `lane`.
+    """
+    token = _priority.set(lane)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    """
+    Refills at per_minute / 60 units a second up to `capacity` (default
+    BURST_SECONDS of refill). A request larger than the capacity is let
+    through once the bucket is full and leaves it in debt, so it is never
+    starved. per_minute <= 0 means unlimited. Callers serialise access.
+    """
+
+    def __init__(self, per_minute, capacity=None):
+        self.fixed_capacity = capacity
+        self.set_rate(per_minute)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def set_rate(self, per_minute):
+        self.rate = per_minute / 60.0
+        self.capacity = self.fixed_capacity or max(1.0, self.rate * BURST_SECONDS)
+        if hasattr(self, "level"):
+            self.level = min(self.level, self.capacity)
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """
+        Seconds until `amount` units can be taken (0 if they can be now).
+        """
+        if self.rate <= 0:
+            return 0.0
+        self._refill(now)
+        needed = min(amount, self.capacity)
+        if self.level >= needed:
+            return 0.0
+        return (needed - self.level) / self.rate
+
+    def take(self, amount):
+        self.level -= amount
+
+    def adjust(self, delta):
+        """
+        Take `delta` more units (or give back a negative delta), e.g. once the
+        real token count of a request whose size was estimated is known.
+        """
+        self.level = min(self.capacity, self.level - delta)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD limit on requests in flight: grows by one slot per window of
+    successful requests and halves whenever the server signals overload,
+    never leaving [min_limit, max_limit].
+    """
+
+    def __init__(self, max_limit, min_limit=1):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = float(self.max_limit)
+
+    @property
+    def slots(self):
+        return int(self.limit)
+
+    def on_success(self):
+        self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+
+    def on_overload(self):
+        self.limit = max(float(self.min_limit), self.limit / 2)
+
+
+class Lease:
+    """
+    Permission to send one request, handed out by RateLimiter.slot().
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.used_tokens = None
+        self.overload = False
+        self.retry_after = None
+
+    def record_usage(self, tokens):
+        """
+        The tokens the request really used, to correct the estimate.
+        """
+        self.used_tokens = tokens
+
+    def overloaded(self, retry_after=None):
+        """
+        Mark the request as rejected for overload (429 or 5xx): the
+        concurrency limit is cut and, with retry_after, every lane pauses.
+        """
+        self.overload = True
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    """
+    Client-side scheduler for one API: requests-per-minute and
+    tokens-per-minute buckets, an adaptive limit on requests in flight, and
+    priority lanes. Waiters are served strictly by (lane, arrival), so bulk
+    work only gets capacity no interactive request is waiting for.
+
+    State lives in the process: lanes only order requests made by the same
+    process, and `share` is the fraction of the per-minute budgets this
+    process may use when several share one API key.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute, max_concurrency, share=1.0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.requests = TokenBucket(requests_per_minute * share)
+        self.tokens = TokenBucket(tokens_per_minute * share)
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._arrivals = itertools.count()
+
+    def _wait_time(self, entry, tokens, now):
+        # None: wait to be notified; otherwise seconds until capacity frees up
+        if self._waiters[0] != entry or self.in_flight >= self.concurrency.slots:
+            return None
+        return max(
+            self.paused_until - now,
+            self.requests.wait_time(1, now),
+            self.tokens.wait_time(tokens, now),
+            0.0,
+        )
+
+    def acquire(self, tokens=0, lane=None, timeout=None):
+        """
+        Block until a request of (an estimated) `tokens` may be sent and
+        return its Lease. Raises TimeoutError after `timeout` seconds.
+        """
+        entry = (current_priority() if lane is None else lane, next(self._arrivals))
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = self._wait_time(entry, tokens, now)
+                    if wait == 0:
+                        break
+                    if deadline is not None:
+                        remaining = deadline - now
+                        if remaining <= 0:
+                            raise TimeoutError("Timed out waiting for rate limit capacity")
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self._cond.wait(wait)
+                heapq.heappop(self._waiters)
+            except BaseException:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+                raise
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self.in_flight += 1
+            self._cond.notify_all()
+        return Lease(tokens)
+
+    def set_share(self, share):
+        """
+        Limit this process to `share` of the configured per-minute budgets.
+        """
+        with self._cond:
+            self.requests.set_rate(self.requests_per_minute * share)
+            self.tokens.set_rate(self.tokens_per_minute * share)
+            self._cond.notify_all()
+
+    def release(self, lease):
+        with self._cond:
+            self.in_flight -= 1
+            if lease.used_tokens is not None:
+                self.tokens.adjust(lease.used_tokens - lease.tokens)
+            if lease.overload:
+                self.concurrency.on_overload()
+                if lease.retry_after:
+                    self.paused_until = max(self.paused_until, time.monotonic() + lease.retry_after)
+            else:
+                self.concurrency.on_success()
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, tokens=0, lane=None, timeout=None):
+        """
+        acquire() as a context manager that releases the lease on exit.
+        """
+        lease = self.acquire(tokens, lane=lane, timeout=timeout)
+        try:
+            yield lease
+        finally:
+            self.release(lease)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "in_flight": self.in_flight,
+                "concurrency_limit": self.concurrency.slots,
+                "waiting": len(self._waiters),
+            }
@@ -0,0 +1,469 @@
+import fcntl
+import json
+import os
+import threading
+
+import numpy as np
+
+
+class VectorStore:
+    """
+    Minimal vector-store interface shared by the Pinecone and local backends.
+    Vectors are passed as (doc_id, embedding, metadata) tuples; query results
+    are dicts with "id", "score" and "metadata", best match first.
+    """
+
+    def upsert(self, doc_id, embedding, metadata=None):
+        self.upsert_many([(doc_id, embedding, metadata)])
+
+    def upsert_many(self, vectors):
+        raise NotImplementedError
+
+    def delete(self, doc_ids):
+        raise NotImplementedError
+
+    def query(self, embedding, top_k=10, filter=None):
+        raise NotImplementedError
+
+    def ensure_index(self, dimensions):
+        """
+        Make sure the backing index exists for vectors of this size.
+        """
+
+
+class PineconeVectorStore(VectorStore):
+    """
+    VectorStore backed by a hosted Pinecone index (see pinecone_client).
+    """
+
+    def __init__(self, index_name=None):
+        self.index_name = index_name
+
+    def upsert_many(self, vectors):
+        from .pinecone_client import upsert_embeddings_bulk
+        upsert_embeddings_bulk(vectors, index_name=self.index_name)
+
+    def delete(self, doc_ids):
+        from .pinecone_client import delete_embeddings
+        delete_embeddings(doc_ids, index_name=self.index_name)
+
+    def query(self, embedding, top_k=10, filter=None):
+        from .pinecone_client import query_embedding
+        return query_embedding(embedding, top_k=top_k, filter=filter, index_name=self.index_name)
+
+    def ensure_index(self, dimensions):
+        from .pinecone_client import create_index
+        create_index(dimensions, name=self.index_name)
+
+
+def _match_condition(value, condition):
+    if not isinstance(condition, dict):
+        return value == condition
+    for op, expected in condition.items():
+        if op == "$eq":
+            ok = value == expected
+        elif op == "$ne":
+            ok = value != expected
+        elif op == "$in":
+            ok = value in expected
+        elif op == "$nin":
+            ok = value not in expected
+        elif op in ("$gt", "$gte", "$lt", "$lte"):
+            if value is None:
+                return False
+            ok = {
+                "$gt": value > expected,
+                "$gte": value >= expected,
+                "$lt": value < expected,
+                "$lte": value <= expected,
+            }[op]
+        else:
+            raise ValueError(f"Unsupported filter operator: {op}")
+        if not ok:
+            return False
+    return True
+
+
+def matches_filter(metadata, filter):
+    """
+    Evaluate a Pinecone-style metadata filter, e.g.
+    {"type": "resume", "years": {"$gte": 3}, "$and": [...], "$or": [...]}.
+    """
+    if not filter:
+        return True
+    metadata = metadata or {}
+    for field, condition in filter.items():
+        if field == "$and":
+            if not all(matches_filter(metadata, sub) for sub in condition):
+                return False
+        elif field == "$or":
+            if not any(matches_filter(metadata, sub) for sub in condition):
+                return False
+        elif not _match_condition(metadata.get(field), condition):
+            return False
+    return True
+
+
+class LocalVectorStore(VectorStore):
+    """
+    On-disk vector store for running ranking and tests without a network hop.
+
+    Layout of `path`:
+    - vectors.f32: memory-mapped float32 matrix (capacity x dim) of
+      L2-normalised vectors, so a query is one matrix-vector product.
+    - log.jsonl: append-only log of upserts/deletes (id, row, metadata),
+      replayed on open and tailed by other processes sharing the directory.
+    - ivf.npz: optional coarse centroids for approximate search (build_ivf).
+
+    Writes take an exclusive flock on the directory so several worker
+    processes can share one store.
+    """
+
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, path, dim=None):
+        self.path = str(path)
+        os.makedirs(self.path, exist_ok=True)
+        self._vectors_path = os.path.join(self.path, "vectors.f32")
+        self._log_path = os.path.join(self.path, "log.jsonl")
+        self._meta_path = os.path.join(self.path, "meta.json")
+        self._ivf_path = os.path.join(self.path, "ivf.npz")
+        self._lock = threading.RLock()
+
+        self.dim = dim
+        self._ids = []          # row -> doc_id (None for a free row)
+        self._metadata = []     # row -> metadata dict
+        self._rows = {}         # doc_id -> row
+        self._free = set()
+        self._log_offset = 0
+        self._matrix = None
+        self._capacity = 0
+        self._centroids = None
+        self._assignments = None
+        self._ivf_mtime = None
+
+        if os.path.exists(self._meta_path):
+            stored_dim = self._read_dim()
+            if self.dim is not None and self.dim != stored_dim:
+                raise ValueError(f"Store at {self.path} has dimension {stored_dim}, not {self.dim}")
+        self._refresh()
+
+    # -- persistence -----------------------------------------------------
+
+    def _file_lock(self):
+        return _FileLock(os.path.join(self.path, ".lock"))
+
+    def _read_dim(self):
+        with open(self._meta_path) as f:
+            return json.load(f)["dim"]
+
+    def _open_matrix(self):
+        size = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+        capacity = size // (4 * self.dim) if self.dim else 0
+        if capacity and capacity != self._capacity:
+            self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+            self._capacity = capacity
+
+    def _ensure_capacity(self, rows):
+        if rows <= self._capacity:
+            return
+        capacity = max(self.INITIAL_CAPACITY, self._capacity)
+        while capacity < rows:
+            capacity *= 2
+        if self._matrix is not None:
+            self._matrix.flush()
+        with open(self._vectors_path, "ab") as f:
+            f.truncate(capacity * self.dim * 4)
+        self._open_matrix()
+
+    def _apply(self, entry):
+        op = entry["op"]
+        doc_id = entry["id"]
+        if op == "upsert":
+            row = entry["row"]
+            while len(self._ids) <= row:
+                self._free.add(len(self._ids))
+                self._ids.append(None)
+                self._metadata.append(None)
+            self._free.discard(row)
+            self._ids[row] = doc_id
+            self._metadata[row] = entry.get("metadata") or {}
+            self._rows[doc_id] = row
+        elif op == "delete":
+            row = self._rows.pop(doc_id, None)
+            if row is not None:
+                self._ids[row] = None
+                self._metadata[row] = None
+                self._free.add(row)
+
+    def _refresh(self):
+        """
+        Replay log entries written since the last refresh (possibly by
+        another process) and remap the matrix if it grew.
+        """
+        with self._lock:
+            if self.dim is None and os.path.exists(self._meta_path):
+                self.dim = self._read_dim()
+            log_size = os.path.getsize(self._log_path) if os.path.exists(self._log_path) else 0
+            if log_size < self._log_offset:
+                # The log was compacted by another process; replay it from scratch
+                self._ids, self._metadata, self._rows, self._free = [], [], {}, set()
+                self._log_offset = 0
+            if log_size > self._log_offset:
+                with open(self._log_path) as f:
+                    f.seek(self._log_offset)
+                    for line in f:
+                        if not line.endswith("\n"):
+                            break  # partially written entry; pick it up next time
+                        self._apply(json.loads(line))
+                        self._log_offset += len(line.encode("utf-8"))
+            if self.dim:
+                self._open_matrix()
+            self._load_ivf()
+
+    def _append_log(self, entries):
+        with open(self._log_path, "a") as f:
+            for entry in entries:
+                line = json.dumps(entry) + "\n"
+                f.write(line)
+                self._log_offset += len(line.encode("utf-8"))
+
+    # -- writes ----------------------------------------------------------
+
+    def upsert_many(self, vectors):
+        # A doc_id repeated within the batch keeps its last vector
+        vectors = list({str(doc_id): (str(doc_id), values, metadata) for doc_id, values, metadata in vectors}.values())
+        if not vectors:
+            return
+        values = np.asarray([v[1] for v in vectors], dtype=np.float32)
+        if values.ndim != 2:
+            raise ValueError("All vectors must have the same dimension.")
+        norms = np.linalg.norm(values, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        values /= norms
+
+        with self._lock, self._file_lock():
+            self._refresh()
+            if self.dim is None:
+                self.dim = values.shape[1]
+                with open(self._meta_path, "w") as f:
+                    json.dump({"dim": self.dim}, f)
+            elif values.shape[1] != self.dim:
+                raise ValueError(f"Vector dimension {values.shape[1]} does not match store dimension {self.dim}")
+
+            entries = []
+            next_row = len(self._ids)
+            free = sorted(self._free, reverse=True)
+            for doc_id, _, metadata in vectors:
+                row = self._rows.get(doc_id)
+                if row is None:
+                    if free:
+                        row = free.pop()
+                    else:
+                        row = next_row
+                        next_row += 1
+                entries.append({"op": "upsert", "id": doc_id, "row": row, "metadata": metadata or {}})
+
+            self._ensure_capacity(next_row)
+            rows = np.asarray([entry["row"] for entry in entries])
+            self._matrix[rows] = values
+            self._matrix.flush()
+            if self._centroids is not None:
+                self._assign(rows, values)
+
+            self._append_log(entries)
+            for entry in entries:
+                self._apply(entry)
+
+    def delete(self, doc_ids):
+        with self._lock, self._file_lock():
+            self._refresh()
+            entries = [{"op": "delete", "id": str(doc_id)} for doc_id in doc_ids if str(doc_id) in self._rows]
+            for entry in entries:
+                row = self._rows[entry["id"]]
+                self._matrix[row] = 0
+            if entries:
+                self._matrix.flush()
+                self._append_log(entries)
+                for entry in entries:
+                    self._apply(entry)
+
+    def compact(self):
+        """
+        Rewrite the log with one entry per live vector, dropping history.
+        """
+        with self._lock, self._file_lock():
+            self._refresh()
+            entries = [
+                {"op": "upsert", "id": doc_id, "row": row, "metadata": self._metadata[row]}
+                for row, doc_id in enumerate(self._ids)
+                if doc_id is not None
+            ]
+            tmp_path = self._log_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                for entry in entries:
+                    f.write(json.dumps(entry) + "\n")
+            os.replace(tmp_path, self._log_path)
+            self._log_offset = os.path.getsize(self._log_path)
+
+    # -- approximate search ----------------------------------------------
+
+    def build_ivf(self, n_lists=None, iterations=10, seed=0):
+        """
+        Cluster the live vectors into `n_lists` cells (spherical k-means) so
+        queries can scan only the `nprobe` closest cells.
+        """
+        with self._lock, self._file_lock():
+            self._refresh()
+            live = self._live_rows()
+            if live.shape[0] == 0:
+                return
+            n_lists = n_lists or max(1, int(np.sqrt(live.shape[0])))
+            n_lists = min(n_lists, live.shape[0])
+            data = np.asarray(self._matrix[live])
+            rng = np.random.default_rng(seed)
+            centroids = data[rng.choice(live.shape[0], n_lists, replace=False)].copy()
+            for _ in range(iterations):
+                labels = np.argmax(data @ centroids.T, axis=1)
+                for k in range(n_lists):
+                    members = data[labels == k]
+                    if members.shape[0]:
+                        c = members.sum(axis=0)
+                        norm = np.linalg.norm(c)
+                        centroids[k] = c / norm if norm else c
+            assignments = np.full(self._capacity, -1, dtype=np.int32)
+            assignments[live] = np.argmax(data @ centroids.T, axis=1)
+            np.savez(self._ivf_path, centroids=centroids, assignments=assignments)
+            self._ivf_mtime = None
+            self._load_ivf()
+
+    def _load_ivf(self):
+        if not os.path.exists(self._ivf_path):
+            return
+        mtime = os.path.getmtime(self._ivf_path)
+        if mtime == self._ivf_mtime:
+            return
+        with np.load(self._ivf_path) as data:
+            self._centroids = data["centroids"]
+            assignments = data["assignments"]
+        if assignments.shape[0] < self._capacity:
+            assignments = np.concatenate([assignments, np.full(self._capacity - assignments.shape[0], -1, dtype=np.int32)])
+        self._assignments = assignments
+        self._ivf_mtime = mtime
+
+    def _assign(self, rows, values):
+        if self._assignments.shape[0] < self._capacity:
+            pad = np.full(self._capacity - self._assignments.shape[0], -1, dtype=np.int32)
+            self._assignments = np.concatenate([self._assignments, pad])
+        self._assignments[rows] = np.argmax(values @ self._centroids.T, axis=1)
+        np.savez(self._ivf_path, centroids=self._centroids, assignments=self._assignments)
+        self._ivf_mtime = os.path.getmtime(self._ivf_path)
+
+    # -- reads -----------------------------------------------------------
+
+    def _live_rows(self):
+        return np.asarray([row for row, doc_id in enumerate(self._ids) if doc_id is not None], dtype=np.int64)
+
+    def __len__(self):
+        self._refresh()
+        return len(self._rows)
+
+    def fetch(self, doc_ids):
+        """
+        Return {doc_id: vector} for the ids present in the store.
+        """
+        self._refresh()
+        return {
+            doc_id: np.array(self._matrix[self._rows[doc_id]])
+            for doc_id in map(str, doc_ids)
+            if doc_id in self._rows
+        }
+
+    def query(self, embedding, top_k=10, filter=None, nprobe=None):
+        """
+        Top-k cosine matches for `embedding`, optionally restricted by a
+        metadata filter. With an IVF index built, pass `nprobe` to scan only
+        that many of the closest cells (approximate search).
+        """
+        if top_k < 1:
+            raise ValueError("top_k must be positive")
+        self._refresh()
+        with self._lock:
+            if not self._rows:
+                return []
+            q = np.asarray(embedding, dtype=np.float32)
+            if q.shape[0] != self.dim:
+                raise ValueError(f"Query dimension {q.shape[0]} does not match store dimension {self.dim}")
+            norm = np.linalg.norm(q)
+            if norm:
+                q = q / norm
+
+            if nprobe and self._centroids is not None:
+                cells = np.argsort(-(self._centroids @ q))[:nprobe]
+                assignments = self._assignments[:len(self._ids)]
+                rows = np.flatnonzero(np.isin(assignments, cells))
+                rows = np.asarray([row for row in rows if self._ids[row] is not None], dtype=np.int64)
+            else:
+                rows = self._live_rows()
+            if filter:
+                rows = np.asarray([row for row in rows if matches_filter(self._metadata[row], filter)], dtype=np.int64)
+            if rows.shape[0] == 0:
+                return []
+
+            scores = self._matrix[rows] @ q
+            if top_k < rows.shape[0]:
+                best = np.argpartition(-scores, top_k - 1)[:top_k]
+            else:
+                best = np.arange(rows.shape[0])
+            best = best[np.argsort(-scores[best], kind="stable")]
+            return [
+                {"id": self._ids[rows[i]], "score": float(scores[i]), "metadata": self._metadata[rows[i]]}
+                for i in best
+            ]
+
+
+class _FileLock:
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        self._fd = os.open(self.path, os.O_CREAT | os.O_RDWR)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+
+_stores = {}
+_store_lock = threading.Lock()
+
+
+def get_vector_store(index_name=None):
+    """
+    Return the process-wide vector store selected by settings.VECTOR_STORE_BACKEND
+    ("pinecone" or "local").
+    - index_name: a separate index, e.g. the shadow index an embedding
+      migration writes to. Local indexes live next to LOCAL_VECTOR_STORE_DIR.
+    """
+    store = _stores.get(index_name)
+    if store is None:
+        from django.conf import settings
+        with _store_lock:
+            store = _stores.get(index_name)
+            if store is None:
+                backend = settings.VECTOR_STORE_BACKEND
+                if backend == "local":
+                    path = settings.LOCAL_VECTOR_STORE_DIR
+                    if index_name:
+                        path = f"{path.rstrip(os.sep)}-{index_name}"
+                    store = LocalVectorStore(path)
+                elif backend == "pinecone":
+                    store = PineconeVectorStore(index_name)
+                else:
+                    raise ValueError(f"Unknown VECTOR_STORE_BACKEND: {backend}")
+                _stores[index_name] = store
+    return store
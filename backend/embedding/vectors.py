@@ -0,0 +1,98 @@
+import os
+
+import numpy as np
+
+# Storage formats for embeddings kept in the database
+DTYPE_FLOAT32 = 'f32'
+DTYPE_FLOAT16 = 'f16'
+DTYPE_INT8 = 'i8'
+DTYPE_CHOICES = (
+    (DTYPE_FLOAT32, 'float32'),
+    (DTYPE_FLOAT16, 'float16'),
+    (DTYPE_INT8, 'int8 (per-vector scale)'),
+)
+
+# Format new embeddings are stored in: f32 is exact, f16 halves the size,
+# i8 quarters it at a cosine error around 1e-4
+EMBEDDING_STORAGE_DTYPE = os.getenv("EMBEDDING_STORAGE_DTYPE", DTYPE_FLOAT32)
+
+_NUMPY_DTYPES = {
+    DTYPE_FLOAT32: np.dtype("<f4"),
+    DTYPE_FLOAT16: np.dtype("<f2"),
+}
+
+
+def _int8_record(dim):
+    # One little-endian float32 scale followed by the quantised components
+    return np.dtype([("scale", "<f4"), ("values", "i1", (dim,))])
+
+
+def pack_embedding(vector, dtype=DTYPE_FLOAT32):
+    """
+    Serialise a vector to bytes in the given storage format.
+    """
+    values = np.asarray(vector, dtype=np.float32)
+    if values.ndim != 1:
+        raise ValueError("An embedding must be a 1-D vector.")
+    if dtype == DTYPE_INT8:
+        peak = float(np.abs(values).max()) if values.size else 0.0
+        scale = peak / 127 if peak else 1.0
+        record = np.zeros(1, dtype=_int8_record(values.size))
+        record["scale"] = scale
+        record["values"] = np.clip(np.rint(values / scale), -127, 127)
+        return record.tobytes()
+    if dtype not in _NUMPY_DTYPES:
+        raise ValueError(f"Unknown embedding dtype: {dtype}")
+    return values.astype(_NUMPY_DTYPES[dtype]).tobytes()
+
+
+def embedding_dim(size, dtype=DTYPE_FLOAT32):
+    """
+    Number of components in a packed embedding of `size` bytes.
+    """
+    if dtype == DTYPE_INT8:
+        return size - 4
+    return size // _NUMPY_DTYPES[dtype].itemsize
+
+
+def unpack_embedding(data, dtype=DTYPE_FLOAT32):
+    """
+    Decode packed bytes back into a float32 vector.
+    """
+    return load_embedding_matrix([(data, dtype)])[0]
+
+
+def load_embedding_matrix(rows, dim=None):
+    """
+    Decode (packed bytes, dtype) rows into one (n, dim) float32 matrix.
+    Rows are grouped by dtype and each group is decoded with a single
+    np.frombuffer over the concatenated bytes, with no per-row Python lists.
+    """
+    rows = list(rows)
+    if not rows:
+        return np.zeros((0, dim or 0), dtype=np.float32)
+
+    groups = {}
+    for position, (data, dtype) in enumerate(rows):
+        groups.setdefault(dtype, []).append(position)
+
+    matrix = None
+    for dtype, positions in groups.items():
+        blobs = [bytes(rows[position][0]) for position in positions]
+        size = len(blobs[0])
+        if any(len(blob) != size for blob in blobs):
+            raise ValueError("Embeddings must all have the same dimension.")
+        group_dim = embedding_dim(size, dtype)
+        if matrix is None:
+            matrix = np.empty((len(rows), group_dim), dtype=np.float32)
+        elif group_dim != matrix.shape[1]:
+            raise ValueError("Embeddings must all have the same dimension.")
+
+        buffer = b"".join(blobs)
+        if dtype == DTYPE_INT8:
+            records = np.frombuffer(buffer, dtype=_int8_record(group_dim))
+            matrix[positions] = records["values"] * records["scale"][:, None]
+        else:
+            values = np.frombuffer(buffer, dtype=_NUMPY_DTYPES[dtype]).reshape(len(positions), group_dim)
+            matrix[positions] = values
+    return matrix
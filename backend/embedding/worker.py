@@ -0,0 +1,225 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import IngestionTask
+from .pipeline import PROCESSORS
+from .utils.openai_client import OpenAIRateLimitError, OpenAIUnavailableError
+from .utils.pinecone_client import is_transient
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STALE_AFTER = timedelta(minutes=15)
+# Runs of a task (the first one included) before a transient error fails it
+INGESTION_MAX_ATTEMPTS = int(os.getenv("INGESTION_MAX_ATTEMPTS", "5"))
+# Backoff before a retry: this many seconds, doubled per attempt, capped at an hour
+INGESTION_RETRY_DELAY = float(os.getenv("INGESTION_RETRY_DELAY", "30"))
+# Seconds between sweeps of the in-process pool for due and stale tasks
+INGESTION_SWEEP_INTERVAL = float(os.getenv("INGESTION_SWEEP_INTERVAL", "30"))
+
+_executor = None
+_executor_lock = threading.Lock()
+# Tasks submitted to this process's pool and not started yet
+_queued = set()
+
+
+def get_executor():
+    """
+    Lazily create the in-process worker pool, with a sweeper thread that
+    picks up tasks left behind by a restart or waiting out a retry backoff.
+    Returns None when INGESTION_WORKERS is 0, in which case only
+    `run_ingestion_worker` processes the queue.
+    """
+    global _executor
+    workers = settings.INGESTION_WORKERS
+    if workers <= 0:
+        return None
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingestion")
+                threading.Thread(target=_sweep_forever, name="ingestion-sweeper", daemon=True).start()
+    return _executor
+
+
+def start_worker_pool():
+    """
+    Start the pool and its sweeper when a server process starts (see
+    backend.wsgi / backend.asgi) rather than with its first upload, so
+    tasks a restart interrupted are picked up straight away.
+    """
+    get_executor()
+
+
+def _reset_after_fork():
+    # Pool threads don't survive fork() (e.g. gunicorn --preload); children
+    # start their own pool on first use
+    global _executor
+    _executor = None
+    _queued.clear()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def submit(task_id):
+    """
+    Hand a task to the in-process pool unless it is already waiting there.
+    """
+    executor = get_executor()
+    if executor is None:
+        return
+    with _executor_lock:
+        if task_id in _queued:
+            return
+        _queued.add(task_id)
+    executor.submit(_run_queued, task_id)
+
+
+def _run_queued(task_id):
+    with _executor_lock:
+        _queued.discard(task_id)
+    run_task(task_id)
+
+
+def _sweep_forever():
+    while True:
+        close_old_connections()
+        try:
+            requeue_stale(DEFAULT_STALE_AFTER)
+            for task_id in pending_task_ids(limit=settings.INGESTION_WORKERS * 4):
+                submit(task_id)
+        except Exception:
+            logger.exception("Sweeping the ingestion queue failed")
+        finally:
+            close_old_connections()
+        time.sleep(INGESTION_SWEEP_INTERVAL)
+
+
+def enqueue(owner, kind, uploaded_file, job=None):
+    """
+    Store an uploaded file as a pending IngestionTask and hand it to the
+    worker pool once the surrounding transaction commits.
+    """
+    task = IngestionTask.objects.create(
+        owner=owner,
+        kind=kind,
+        job=job,
+        filename=uploaded_file.name,
+        payload=uploaded_file.read(),
+    )
+    if get_executor() is not None:
+        transaction.on_commit(lambda: submit(task.pk))
+    return task
+
+
+def claim(task_id):
+    """
+    Atomically move a pending task to running. Returns the task, or None if
+    another worker got there first.
+    """
+    claimed = IngestionTask.objects.filter(pk=task_id, status=IngestionTask.STATUS_PENDING).update(
+        status=IngestionTask.STATUS_RUNNING,
+        started_at=timezone.now(),
+        attempts=F('attempts') + 1,
+    )
+    if not claimed:
+        return None
+    return IngestionTask.objects.get(pk=task_id)
+
+
+def is_transient_error(error):
+    """
+    Whether a failed task may succeed if run again later: rate limits and
+    outages of OpenAI or Pinecone, and lost database connections.
+    """
+    return isinstance(error, (OpenAIRateLimitError, OpenAIUnavailableError, OperationalError)) or is_transient(error)
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(3600.0, INGESTION_RETRY_DELAY * 2 ** (attempts - 1)))
+
+
+def run_task(task_id):
+    """
+    Claim and run a single task, recording its result or error. Tasks that
+    fail with a transient error go back to pending after a backoff, until
+    INGESTION_MAX_ATTEMPTS runs have been made.
+    """
+    close_old_connections()
+    try:
+        task = claim(task_id)
+        if task is None:
+            return
+        try:
+            result = PROCESSORS[task.kind](task)
+        except Exception as e:
+            if is_transient_error(e) and task.attempts < INGESTION_MAX_ATTEMPTS:
+                logger.warning(
+                    "Ingestion task %s failed during %s (attempt %s), retrying: %s",
+                    task_id, task.stage, task.attempts, e,
+                )
+                IngestionTask.objects.filter(pk=task_id).update(
+                    status=IngestionTask.STATUS_PENDING,
+                    stage="",
+                    error=str(e),
+                    run_after=timezone.now() + retry_delay(task.attempts),
+                )
+                return
+            logger.exception("Ingestion task %s failed during %s", task_id, task.stage)
+            IngestionTask.objects.filter(pk=task_id).update(
+                status=IngestionTask.STATUS_FAILED,
+                error=str(e),
+                finished_at=timezone.now(),
+            )
+            return
+        IngestionTask.objects.filter(pk=task_id).update(
+            status=IngestionTask.STATUS_SUCCEEDED,
+            stage="",
+            result=result,
+            error="",
+            payload=b"",
+            finished_at=timezone.now(),
+        )
+    finally:
+        close_old_connections()
+
+
+def pending_task_ids(limit, exclude=()):
+    """
+    Pending tasks that are due (past any retry backoff), oldest first.
+    """
+    return list(
+        IngestionTask.objects.filter(status=IngestionTask.STATUS_PENDING)
+        .filter(Q(run_after__isnull=True) | Q(run_after__lte=timezone.now()))
+        .exclude(pk__in=list(exclude))
+        .order_by('created_at')
+        .values_list('id', flat=True)[:limit]
+    )
+
+
+def requeue_stale(older_than):
+    """
+    Put tasks that have been running longer than `older_than` (a timedelta)
+    back to pending, e.g. after a worker process crashed mid-task. Tasks
+    that already used up INGESTION_MAX_ATTEMPTS are failed instead.
+    Returns the number of tasks requeued.
+    """
+    stale = IngestionTask.objects.filter(
+        status=IngestionTask.STATUS_RUNNING,
+        started_at__lt=timezone.now() - older_than,
+    )
+    stale.filter(attempts__gte=INGESTION_MAX_ATTEMPTS).update(
+        status=IngestionTask.STATUS_FAILED,
+        error="Worker stopped while running the task",
+        finished_at=timezone.now(),
+    )
+    return stale.update(status=IngestionTask.STATUS_PENDING, stage="")
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("job", "0002_job_jd_document"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="embedding",
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:51
+
+from django.db import migrations
+
+from candidate.structured import load_structured
+
+
+def parse_jd_file(apps, schema_editor):
+    """
+    Older rows hold the extraction model's raw string: store it as JSON.
+    """
+    Job = apps.get_model("job", "Job")
+    for job in Job.objects.exclude(jd_file=None).iterator():
+        if isinstance(job.jd_file, str):
+            job.jd_file = load_structured(job.jd_file)
+            job.save(update_fields=["jd_file"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("job", "0003_job_embedding"),
+    ]
+
+    operations = [
+        migrations.RunPython(parse_jd_file, migrations.RunPython.noop),
+    ]
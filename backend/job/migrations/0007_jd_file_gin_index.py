@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:40
+
+from django.db import migrations
+
+INDEX_NAME = "job_jd_file_gin"
+
+
+def create_gin_index(apps, schema_editor):
+    # Same jsonb_path_ops index as candidate 0007, for jd_file__contains
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON job_job "
+        "USING gin (jd_file jsonb_path_ops)"
+    )
+
+
+def drop_gin_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("job", "0006_job_embedding_text"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_gin_index, drop_gin_index),
+    ]
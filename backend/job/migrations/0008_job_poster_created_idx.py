@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("job", "0007_jd_file_gin_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="job",
+            index=models.Index(
+                fields=["poster", "-created_at"], name="job_poster_created_idx"
+            ),
+        ),
+    ]
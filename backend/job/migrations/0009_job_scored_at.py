@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:10
+
+from django.db import migrations, models
+from django.db.models.functions import Now
+
+
+def mark_scored_jobs(apps, schema_editor):
+    """
+    Jobs that already have MatchScore rows were scored before the field
+    existed.
+    """
+    Job = apps.get_model("job", "Job")
+    MatchScore = apps.get_model("similarity", "MatchScore")
+    Job.objects.filter(id__in=MatchScore.objects.values("job_id")).update(scored_at=Now())
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("job", "0008_job_poster_created_idx"),
+        ("similarity", "0003_drop_skill_postings"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="scored_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_scored_jobs, migrations.RunPython.noop),
+    ]
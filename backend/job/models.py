@@ -3,7 +3,9 @@
 from django.db import models
 from django.conf import settings
 
-class Job(models.Model):
+from embedding.models import EmbeddedModel
+
+class Job(EmbeddedModel):
     poster = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -17,8 +19,18 @@ class Job(models.Model):
 
     # Optionally store a JSON representation once parsed.
     jd_file = models.JSONField(null=True, blank=True)
+
     
     created_at = models.DateTimeField(auto_now_add=True)
+    # When the MatchScore rows were last computed; None until the job has
+    # been scored once (a job may be scored and still have no rows)
+    scored_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # A recruiter's jobs, newest first (JobListView)
+            models.Index(fields=['poster', '-created_at'], name='job_poster_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.poster.username})"
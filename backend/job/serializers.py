@@ -21,3 +21,14 @@ class JobSerializer(serializers.ModelSerializer):
             job.save()
         
         return job
+
+
+class JobListSerializer(serializers.ModelSerializer):
+    """
+    Job list rows without the structured JD, which can be large; fetch a
+    single job for it.
+    """
+    class Meta:
+        model = Job
+        fields = ['id', 'title', 'description', 'created_at']
+        read_only_fields = fields
@@ -1,8 +1,9 @@
 from django.urls import path
-from .views import JobCreateView, JobListView, JobDetailView
+from .views import JobCreateView, AsyncJobCreateView, JobListView, JobDetailView
 
 urlpatterns = [
     path('create/', JobCreateView.as_view(), name='job-create'),
+    path('create/async/', AsyncJobCreateView.as_view(), name='job-create-async'),
     path('', JobListView.as_view(), name='job-list'),
     path('<int:pk>/', JobDetailView.as_view(), name='job-detail'),
 ]
@@ -1,20 +1,33 @@
-import os
-import tempfile
+from functools import partial
+
 from rest_framework import generics, status, parsers, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from .models import Job
 from .serializers import JobSerializer
 from user.permissions import IsJobUser  # We'll create a custom permission
 
+from backend.db_routers import ReplicaReadMixin
+from user.authentication import aauthorize
 from user.permissions import IsJobUser
 from .models import Job
-from .serializers import JobSerializer
+from .serializers import JobListSerializer, JobSerializer
+
+from embedding.models import IngestionTask
+from embedding.pipeline import aprocess_upload, save_jd
+from embedding.worker import enqueue
+from similarity.utils import refresh_job_scores
 
-from embedding.utils.file_parser import parse_file
-from embedding.utils.openai_client import generate_embedding, extract_structured_data
-from embedding.utils.pinecone_client import upsert_embedding
+# Rows fetched per round trip when listing jobs
+LIST_CHUNK_SIZE = 500
 
 
 class JobCreateView(generics.CreateAPIView):
@@ -28,80 +41,99 @@ class JobCreateView(generics.CreateAPIView):
 
     def create(self, request, *args, **kwargs):
         """
-        Overriding create() so we can handle the JD file + embedding logic.
+        Overriding create() so we can queue the JD file for the embedding
+        pipeline. The job is saved right away; the structured JD and the
+        embedding are filled in by embedding.worker.
         """
         jd_file = request.FILES.get("jd_file")
         if not jd_file:
             # If your logic requires an actual file, throw an error or fallback.
             return Response({"error": "No jd_file provided."}, status=status.HTTP_400_BAD_REQUEST)
-        
-        tmp_file_path = None
+
         try:
-            # Save job basic fields (title, description, etc.)
-            response = super().create(request, *args, **kwargs)
-            job_id = response.data.get("id")
-            if not job_id:
-                return response  # Some error occurred in serializer validation
-            
-            # 1. Save JD file to temp
-            with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(jd_file.name)[1]) as tmp:
-                for chunk in jd_file.chunks():
-                    tmp.write(chunk)
-                tmp_file_path = tmp.name
-
-            # 2. Parse raw text
-            raw_text = parse_file(tmp_file_path)
-
-            # 3. Generate embeddings
-            embedding = generate_embedding(raw_text)
-
-            # 4. Upsert embedding
-            doc_id = f"job-{job_id}-jd"
-            upsert_embedding(doc_id, embedding, metadata={"type": "jd", "job_id": job_id})
-
-            # 5. Extract structured JSON
-            structured_json = extract_structured_data(raw_text, role="jd")
-
-            # 6. Update job record with structured data
-            job_instance = Job.objects.get(pk=job_id)
-            job_instance.jd_file = structured_json
-            job_instance.save()
-
-            # Merge the original response data with the structured JD
-            merged_data = response.data
-            merged_data["structured_jd"] = structured_json
-
-            return Response(merged_data, status=status.HTTP_201_CREATED)
+            with transaction.atomic():
+                # Save job basic fields (title, description, etc.)
+                response = super().create(request, *args, **kwargs)
+                job_id = response.data.get("id")
+                if not job_id:
+                    return response  # Some error occurred in serializer validation
+
+                job_instance = Job.objects.get(pk=job_id)
+                task = enqueue(request.user, IngestionTask.KIND_JD, jd_file, job=job_instance)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        finally:
-            if tmp_file_path and os.path.exists(tmp_file_path):
-                os.remove(tmp_file_path)
 
-    serializer_class = JobSerializer
-    permission_classes = [permissions.IsAuthenticated, IsJobUser]
-    parser_classes = [parsers.MultiPartParser, parsers.FormParser]
+        merged_data = response.data
+        merged_data["task_id"] = str(task.id)
+        merged_data["status_url"] = reverse("ingestion-task-status", args=[task.id])
+        return Response(merged_data, status=status.HTTP_202_ACCEPTED)
 
-    def perform_create(self, serializer):
-        # The job poster is the currently authenticated user
-        serializer.save(poster=self.request.user)
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncJobCreateView(View):
+    """
+    Async-native job creation for ASGI deployments. Saves the job, then
+    processes the JD inline with the embedding (+ vector upsert) and the
+    structured extraction running concurrently. Returns 201 with the job
+    and its structured JD.
+    """
 
-    def create(self, request, *args, **kwargs):
-        # We override create() if we want custom responses or extra logic
-        response = super().create(request, *args, **kwargs)
-        job_id = response.data.get("id")
-        if job_id:
-            # Optionally, you can do post-processing like generating a "token" or additional fields
-            pass
-        return response
+    async def post(self, request):
+        user, error = await aauthorize(request, IsJobUser)
+        if error:
+            return error
 
-class JobListView(generics.ListAPIView):
-    serializer_class = JobSerializer
+        jd_file = request.FILES.get("jd_file")
+        if not jd_file:
+            return JsonResponse({"error": "No jd_file provided."}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = request.POST.copy()
+        data.update(request.FILES)
+        serializer = JobSerializer(data=data)
+        if not await sync_to_async(serializer.is_valid)():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            job = await sync_to_async(serializer.save)(poster=user)
+        except Exception as e:
+            return JsonResponse({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        job, structured_json, error = await aprocess_upload(
+            jd_file,
+            "jd",
+            f"job-{job.id}-jd",
+            {"type": "jd", "job_id": job.id},
+            partial(save_jd, job.id),
+            refresh_job_scores,
+        )
+        if error:
+            return error
+
+        merged_data = dict(JobSerializer(job).data)
+        merged_data["structured_jd"] = structured_json
+        return JsonResponse(merged_data, status=status.HTTP_201_CREATED)
+
+class JobListView(ReplicaReadMixin, generics.ListAPIView):
+    """
+    The current user's jobs, newest first, without the structured JD or
+    the embedding (see JobDetailView for a full job).
+    """
+    serializer_class = JobListSerializer
     permission_classes = [permissions.IsAuthenticated, IsJobUser]
 
     def get_queryset(self):
         # Return only the jobs posted by the current user
-        return Job.objects.filter(poster=self.request.user)
+        return (
+            Job.objects.filter(poster=self.request.user)
+            .only(*JobListSerializer.Meta.fields)
+            .order_by('-created_at')
+        )
+
+    def list(self, request, *args, **kwargs):
+        if self.paginator is not None:
+            return super().list(request, *args, **kwargs)
+        # Serialize straight off the cursor rather than caching every row
+        jobs = self.filter_queryset(self.get_queryset()).iterator(chunk_size=LIST_CHUNK_SIZE)
+        return Response(self.get_serializer(jobs, many=True).data)
 
 class JobDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = JobSerializer
@@ -109,8 +141,9 @@ class JobDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Job.objects.all()
 
     def get_queryset(self):
-        # The job user can only access their own jobs
-        return Job.objects.filter(poster=self.request.user)
+        # The job user can only access their own jobs. The embedding and its
+        # source text aren't serialized; saves leave deferred fields alone.
+        return Job.objects.filter(poster=self.request.user).defer('embedding', 'embedding_text')
 
 
 class JDUploadView(APIView):
@@ -139,16 +172,10 @@ class JDUploadView(APIView):
             # Create a new job with blank title/description
             job = Job.objects.create(poster=request.user, title="", description="")
 
-        temp_file_path = None
         try:
-            # Step 2: Save the uploaded file to a temporary location
-            with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(jd_file.name)[1]) as tmp:
-                for chunk in jd_file.chunks():
-                    tmp.write(chunk)
-                temp_file_path = tmp.name
-
-            # Step 3: (Future) Parse the JD file → structured JSON
-            # raw_text = parse_file(temp_file_path)
+            # Step 2: (Future) Parse the JD file → structured JSON, straight
+            # from the upload buffer (no temp file needed)
+            # raw_text = parse_file(jd_file)
             # structured_data = jd_formatter.format_jd_text(raw_text)
             # For now, just store minimal info (like file name)
             structured_data = {
@@ -157,7 +184,7 @@ class JDUploadView(APIView):
                 # "content": raw_text (if you want)
             }
 
-            # Step 4: Save to the job’s jd_file field
+            # Step 3: Save to the job’s jd_file field
             job.jd_file = structured_data
             job.save()
 
@@ -169,8 +196,4 @@ class JDUploadView(APIView):
             )
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        finally:
-            # Clean up temp file
-            if temp_file_path and os.path.exists(temp_file_path):
-                os.remove(temp_file_path)
 
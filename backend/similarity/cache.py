@@ -0,0 +1,86 @@
+"""
+Cached ranking pages per (job, query params) in the Django cache.
+
+Entries are never deleted; their keys embed two version stamps instead: one
+per job, bumped when the job is saved or re-scored, and one for the
+candidate pool, bumped when any profile is saved, deleted or re-scored.
+Bumping a stamp leaves the older entries unreachable until they expire.
+The key also serves as the ranking's ETag. The cache must be shared by all
+workers, so nothing is cached with a per-process backend.
+"""
+import hashlib
+import json
+import os
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# Seconds a ranking page is kept (0 disables the cache)
+RANKING_CACHE_TIMEOUT = int(os.getenv("RANKING_CACHE_TIMEOUT", "600"))
+
+CANDIDATES_VERSION_KEY = "ranking:candidates:version"
+# Ranking params that select the page (stream responses aren't cached)
+KEY_PARAMS = ("top_k", "min_score", "paged", "page_size", "cursor", "returned")
+
+
+# Backends whose entries other processes can't see; invalidations made by
+# one worker would never reach the others
+PROCESS_LOCAL_BACKENDS = ("django.core.cache.backends.locmem.LocMemCache",)
+
+
+def caching_enabled():
+    return RANKING_CACHE_TIMEOUT > 0 and settings.CACHES["default"]["BACKEND"] not in PROCESS_LOCAL_BACKENDS
+
+
+def _job_version_key(job_id):
+    return f"ranking:job:{job_id}:version"
+
+
+def _new_stamp():
+    return uuid.uuid4().hex[:12]
+
+
+def _bump(keys):
+    cache.set_many({key: _new_stamp() for key in keys}, timeout=None)
+
+
+def invalidate_rankings(job_ids=None):
+    """
+    Make the cached rankings of `job_ids`, or of every job when None (the
+    candidate pool changed), stale once the current transaction commits.
+    """
+    if not caching_enabled():
+        return
+    keys = [CANDIDATES_VERSION_KEY] if job_ids is None else [_job_version_key(job_id) for job_id in job_ids]
+    transaction.on_commit(lambda: _bump(keys))
+
+
+def ranking_cache_key(job_id, params):
+    """
+    Cache key of one ranking page under the current version stamps. A stamp
+    that is missing (never set, or evicted) is created, so the lookup misses
+    rather than serving anything older.
+    """
+    version_keys = [_job_version_key(job_id), CANDIDATES_VERSION_KEY]
+    stamps = cache.get_many(version_keys)
+    for key in version_keys:
+        if key not in stamps:
+            stamp = _new_stamp()
+            # Another process may have created it first; keep theirs
+            stamps[key] = stamp if cache.add(key, stamp, timeout=None) else cache.get(key, stamp)
+    raw = json.dumps([job_id, *(stamps[key] for key in version_keys), *(params[name] for name in KEY_PARAMS)])
+    return f"ranking:page:{job_id}:{hashlib.sha256(raw.encode()).hexdigest()[:32]}"
+
+
+def ranking_etag(key):
+    return f'"{key.rsplit(":", 1)[-1]}"'
+
+
+def get_ranking(key):
+    return cache.get(key)
+
+
+def set_ranking(key, body):
+    cache.set(key, body, RANKING_CACHE_TIMEOUT)
@@ -0,0 +1,256 @@
+import json
+import resource
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from candidate.models import CandidateProfile
+from embedding.vectors import DTYPE_CHOICES, EMBEDDING_STORAGE_DTYPE, pack_embedding
+from job.models import Job
+from similarity import cache as ranking_cache
+from similarity.utils import refresh_job_scores, reset_candidate_matrix
+
+# Rows per bulk INSERT while seeding the corpus
+SEED_BATCH_SIZE = 5000
+BENCHMARK_MODEL = "benchmark-random"
+# Metrics compared against a baseline run; higher is worse for all of them
+TRACKED_METRICS = ("cold_ms", "first_page_ms.p50", "cursor_page_ms.p50", "rescore_ms.p50", "peak_mb")
+
+
+def seed_corpus(size, dim, dtype, jobs, rng):
+    """
+    Bulk-create `size` candidate users and profiles and `jobs` jobs posted by
+    a fresh recruiter, all with random embeddings. Returns (recruiter, jobs).
+    """
+    User = get_user_model()
+    password = make_password(None)
+    prefix = f"bench-{uuid.uuid4().hex[:8]}"
+    recruiter = User.objects.create(username=f"{prefix}-recruiter", role="job", password=password)
+
+    for start in range(0, size, SEED_BATCH_SIZE):
+        count = min(SEED_BATCH_SIZE, size - start)
+        usernames = [f"{prefix}-{start + i}" for i in range(count)]
+        User.objects.bulk_create([User(username=username, role="candidate", password=password) for username in usernames])
+        user_ids = User.objects.filter(username__in=usernames).values_list("id", flat=True)
+        vectors = rng.standard_normal((count, dim), dtype=np.float32)
+        CandidateProfile.objects.bulk_create([
+            CandidateProfile(
+                user_id=user_id,
+                embedding=pack_embedding(vector, dtype),
+                embedding_dtype=dtype,
+                embedding_model=BENCHMARK_MODEL,
+            )
+            for user_id, vector in zip(user_ids, vectors)
+        ])
+
+    Job.objects.bulk_create([
+        Job(
+            poster=recruiter,
+            title=f"Benchmark job {i}",
+            embedding=pack_embedding(rng.standard_normal(dim, dtype=np.float32), dtype),
+            embedding_dtype=dtype,
+            embedding_model=BENCHMARK_MODEL,
+        )
+        for i in range(jobs)
+    ])
+    return recruiter, list(Job.objects.filter(poster=recruiter).order_by("id"))
+
+
+def summarize(samples_ms):
+    values = np.asarray(samples_ms, dtype=np.float64)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": round(p50, 2), "p95": round(p95, 2), "p99": round(p99, 2), "mean": round(values.mean(), 2)}
+
+
+def metric_value(result, path):
+    value = result
+    for part in path.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def find_regressions(results, baseline, tolerance):
+    """
+    (key, metric, old, new) for every tracked metric more than `tolerance`
+    (a fraction) worse than the baseline run with the same configuration.
+    """
+    previous = {result["key"]: result for result in baseline}
+    regressions = []
+    for result in results:
+        old_result = previous.get(result["key"])
+        if old_result is None:
+            continue
+        for metric in TRACKED_METRICS:
+            old, new = metric_value(old_result, metric), metric_value(result, metric)
+            if old and new is not None and new > old * (1 + tolerance):
+                regressions.append((result["key"], metric, old, new))
+    return regressions
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark JobCandidatesRankingView on synthetic corpora of random embeddings: cold and warm "
+        "latency, cursor paging, re-scoring, throughput and memory peak. Runs offline (no embedding API "
+        "or vector store) and rolls the corpus back afterwards. The ranking cache is off unless "
+        "--ranking-cache is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated corpus sizes, e.g. 1000,1000000.")
+        parser.add_argument("--dim", type=int, default=1536, help="Embedding dimension.")
+        parser.add_argument("--dtype", choices=[choice for choice, _ in DTYPE_CHOICES], default=EMBEDDING_STORAGE_DTYPE)
+        parser.add_argument(
+            "--matrix-mode", choices=["memory", "shared"], default=settings.CANDIDATE_MATRIX_MODE,
+            help="CANDIDATE_MATRIX_MODE to benchmark.",
+        )
+        parser.add_argument("--jobs", type=int, default=2, help="Jobs to seed (one is ranked, one re-scored cold).")
+        parser.add_argument("--requests", type=int, default=30, help="Requests per warm latency series.")
+        parser.add_argument("--page-size", type=int, default=50)
+        parser.add_argument("--seed", type=int, default=0, help="Random seed for the embeddings.")
+        parser.add_argument(
+            "--ranking-cache", action="store_true",
+            help="Leave the ranking page cache on, so warm requests measure cache hits.",
+        )
+        parser.add_argument("--output", help="Append one JSON line per corpus size to this file.")
+        parser.add_argument("--baseline", help="JSON lines from an earlier run to compare against.")
+        parser.add_argument(
+            "--tolerance", type=float, default=0.2,
+            help="Fraction a tracked metric may exceed the baseline before it counts as a regression.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options["sizes"].split(",") if size.strip()]
+        except ValueError:
+            raise CommandError("--sizes must be comma-separated integers.")
+        if not sizes or min(sizes) < 1 or options["jobs"] < 2 or options["requests"] < 1:
+            raise CommandError("Sizes and --requests must be positive and --jobs at least 2.")
+
+        results = []
+        cache_timeout = ranking_cache.RANKING_CACHE_TIMEOUT
+        if not options["ranking_cache"]:
+            ranking_cache.RANKING_CACHE_TIMEOUT = 0
+        try:
+            with tempfile.TemporaryDirectory(prefix="benchmark-matrix-") as matrix_dir, override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+                CANDIDATE_MATRIX_MODE=options["matrix_mode"],
+                CANDIDATE_MATRIX_DIR=matrix_dir,
+            ):
+                for size in sizes:
+                    result = self.run_size(size, options)
+                    self.report(result)
+                    results.append(result)
+        finally:
+            ranking_cache.RANKING_CACHE_TIMEOUT = cache_timeout
+
+        if options["output"]:
+            with open(options["output"], "a") as f:
+                for result in results:
+                    f.write(json.dumps(result) + "\n")
+            self.stdout.write(f"Results appended to {options['output']}.")
+
+        if options["baseline"]:
+            with open(options["baseline"]) as f:
+                baseline = [json.loads(line) for line in f if line.strip()]
+            regressions = find_regressions(results, baseline, options["tolerance"])
+            for key, metric, old, new in regressions:
+                self.stderr.write(f"REGRESSION {key} {metric}: {old} -> {new}")
+            if regressions:
+                raise CommandError(f"{len(regressions)} metric(s) regressed by more than {options['tolerance']:.0%}.")
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
+
+    def run_size(self, size, options):
+        rng = np.random.default_rng(options["seed"])
+        with transaction.atomic():
+            started = time.perf_counter()
+            recruiter, jobs = seed_corpus(size, options["dim"], options["dtype"], options["jobs"], rng)
+            seed_seconds = time.perf_counter() - started
+            reset_candidate_matrix()
+
+            client = Client(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(recruiter).access_token}")
+            url = reverse("job-candidates-ranking", args=[jobs[0].id])
+            params = {"page_size": options["page_size"]}
+
+            # No MatchScore rows yet: loads the matrix, scores and writes them
+            cold_ms, _ = self.timed_get(client, url, params)
+            first_page = [self.timed_get(client, url, params)[0] for _ in range(options["requests"])]
+
+            cursor_pages = []
+            cursor = None
+            for _ in range(options["requests"]):
+                elapsed, body = self.timed_get(client, url, {**params, "cursor": cursor} if cursor else params)
+                cursor_pages.append(elapsed)
+                cursor = body["next_cursor"]
+                if cursor is None:
+                    break
+
+            rescore = []
+            for _ in range(3):
+                started = time.perf_counter()
+                refresh_job_scores(jobs[0])
+                rescore.append((time.perf_counter() - started) * 1000)
+
+            # Peak Python/NumPy allocation of a cold matrix load plus scoring
+            reset_candidate_matrix()
+            tracemalloc.start()
+            refresh_job_scores(jobs[1])
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            transaction.set_rollback(True)
+        reset_candidate_matrix()
+        if options["ranking_cache"]:
+            # Invalidations wait for a commit that never comes, and the rolled
+            # back job ids may be reused by the next corpus
+            cache.clear()
+
+        first_page_ms = summarize(first_page)
+        return {
+            "key": f"{size}x{options['dim']}-{options['dtype']}-{options['matrix_mode']}",
+            "size": size,
+            "dim": options["dim"],
+            "dtype": options["dtype"],
+            "matrix_mode": options["matrix_mode"],
+            "timestamp": timezone.now().isoformat(),
+            "seed_s": round(seed_seconds, 2),
+            "cold_ms": round(cold_ms, 2),
+            "first_page_ms": first_page_ms,
+            "cursor_page_ms": summarize(cursor_pages),
+            "rescore_ms": summarize(rescore),
+            "throughput_rps": round(1000 / first_page_ms["mean"], 1) if first_page_ms["mean"] else None,
+            "peak_mb": round(peak / 2 ** 20, 1),
+            "maxrss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        }
+
+    def timed_get(self, client, url, params):
+        started = time.perf_counter()
+        response = client.get(url, params)
+        elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code != 200:
+            raise CommandError(f"GET {url} returned {response.status_code}: {response.content[:200]!r}")
+        return elapsed, response.json()
+
+    def report(self, result):
+        first, cursor, rescore = result["first_page_ms"], result["cursor_page_ms"], result["rescore_ms"]
+        self.stdout.write(
+            f"{result['key']}: seeded in {result['seed_s']}s\n"
+            f"  cold ranking     {result['cold_ms']:.1f} ms\n"
+            f"  first page       p50 {first['p50']} / p95 {first['p95']} / p99 {first['p99']} ms "
+            f"({result['throughput_rps']} req/s)\n"
+            f"  cursor pages     p50 {cursor['p50']} / p95 {cursor['p95']} / p99 {cursor['p99']} ms\n"
+            f"  re-score job     p50 {rescore['p50']} ms\n"
+            f"  memory           peak {result['peak_mb']} MB traced, {result['maxrss_mb']} MB max RSS"
+        )
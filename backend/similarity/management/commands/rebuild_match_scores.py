@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from job.models import Job
+from similarity.utils import refresh_job_scores
+
+
+class Command(BaseCommand):
+    help = "Recompute the precomputed MatchScore table for every embedded job (or the given job ids)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("job_ids", nargs="*", type=int, help="Only rebuild these jobs.")
+
+    def handle(self, *args, **options):
+        jobs = Job.objects.filter(embedding__isnull=False).only("id", "embedding", "embedding_dtype")
+        if options["job_ids"]:
+            jobs = jobs.filter(id__in=options["job_ids"])
+
+        total = 0
+        for job in jobs.iterator():
+            total += refresh_job_scores(job)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {total} match scores."))
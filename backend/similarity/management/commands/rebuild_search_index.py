@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from candidate.models import CandidateProfile
+from similarity.search import index_profile
+
+
+class Command(BaseCommand):
+    help = "Rebuild the inverted search index for every candidate profile (or the given profile ids)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("profile_ids", nargs="*", type=int, help="Only reindex these profiles.")
+
+    def handle(self, *args, **options):
+        profiles = CandidateProfile.objects.only("id", "resume_data")
+        if options["profile_ids"]:
+            profiles = profiles.filter(id__in=options["profile_ids"])
+
+        count = total = 0
+        for profile in profiles.iterator():
+            total += index_profile(profile)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} profiles ({total} postings)."))
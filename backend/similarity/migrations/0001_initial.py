@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = [
+        ("candidate", "0002_candidateprofile_embedding"),
+        ("job", "0003_job_embedding"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MatchScore",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("score", models.FloatField()),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "candidate",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="match_scores",
+                        to="candidate.candidateprofile",
+                    ),
+                ),
+                (
+                    "job",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="match_scores",
+                        to="job.job",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["job", "-score", "candidate"],
+                        name="match_score_ranking_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("job", "candidate"), name="unique_match_score"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("candidate", "0002_candidateprofile_embedding"),
+        ("similarity", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchDocument",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("length", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "candidate",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="search_document",
+                        to="candidate.candidateprofile",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="SearchPosting",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "field",
+                    models.CharField(
+                        choices=[
+                            ("text", "Text"),
+                            ("skill", "Skill"),
+                            ("title", "Title"),
+                            ("certification", "Certification"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("term", models.CharField(max_length=100)),
+                ("frequency", models.PositiveIntegerField(default=1)),
+                (
+                    "candidate",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="search_postings",
+                        to="candidate.candidateprofile",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("field", "term", "candidate"),
+                        name="unique_search_posting",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:50
+
+from django.db import migrations, models
+
+
+def delete_skill_postings(apps, schema_editor):
+    # Skills are filtered through candidate.CandidateSkill now
+    SearchPosting = apps.get_model("similarity", "SearchPosting")
+    SearchPosting.objects.filter(field="skill").delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("similarity", "0002_search_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_skill_postings, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="searchposting",
+            name="field",
+            field=models.CharField(
+                choices=[
+                    ("text", "Text"),
+                    ("title", "Title"),
+                    ("certification", "Certification"),
+                ],
+                max_length=20,
+            ),
+        ),
+    ]
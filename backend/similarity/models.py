@@ -1,3 +1,71 @@
 from django.db import models
+from candidate.models import CandidateProfile
+from job.models import Job
 
-# Create your models here.
+class MatchScore(models.Model):
+    """
+    Precomputed cosine similarity between a job and a candidate profile.
+    Refreshed for one side at a time when a JD or resume is (re-)embedded,
+    so ranking is an indexed ORDER BY score LIMIT k.
+    """
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='match_scores')
+    candidate = models.ForeignKey(CandidateProfile, on_delete=models.CASCADE, related_name='match_scores')
+    score = models.FloatField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['job', 'candidate'], name='unique_match_score'),
+        ]
+        indexes = [
+            models.Index(fields=['job', '-score', 'candidate'], name='match_score_ranking_idx'),
+        ]
+
+    def __str__(self):
+        return f"Job {self.job_id} / candidate {self.candidate_id}: {self.score:.3f}"
+
+
+class SearchDocument(models.Model):
+    """
+    One row per indexed candidate profile, holding its length in tokens for
+    BM25 length normalisation.
+    """
+    candidate = models.OneToOneField(CandidateProfile, on_delete=models.CASCADE, related_name='search_document')
+    length = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Search document for candidate {self.candidate_id} ({self.length} tokens)"
+
+
+class SearchPosting(models.Model):
+    """
+    Inverted index entry: `term` occurs `frequency` times in one field of a
+    candidate's resume_data. The text field holds every token of the resume
+    (scored with BM25); title and certification hold whole normalised
+    phrases plus their tokens, used as hard filters. Skills are filtered
+    through candidate.CandidateSkill.
+    Rebuilt for a profile whenever it is saved.
+    """
+    FIELD_TEXT = 'text'
+    FIELD_TITLE = 'title'
+    FIELD_CERTIFICATION = 'certification'
+    FIELD_CHOICES = (
+        (FIELD_TEXT, 'Text'),
+        (FIELD_TITLE, 'Title'),
+        (FIELD_CERTIFICATION, 'Certification'),
+    )
+
+    field = models.CharField(max_length=20, choices=FIELD_CHOICES)
+    term = models.CharField(max_length=100)
+    candidate = models.ForeignKey(CandidateProfile, on_delete=models.CASCADE, related_name='search_postings')
+    frequency = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            # Also the lookup index: (field, term) -> candidates
+            models.UniqueConstraint(fields=['field', 'term', 'candidate'], name='unique_search_posting'),
+        ]
+
+    def __str__(self):
+        return f"{self.field}:{self.term} -> candidate {self.candidate_id}"
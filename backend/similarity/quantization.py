@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# Rows scored per step when scanning a memory-mapped matrix, so a scan never
+# materialises more than this many float32 rows at once
+SCAN_CHUNK_ROWS = 65536
+# Published snapshots kept on disk; a process that read a slightly stale
+# version from the database can still find the one before the newest
+KEEP_SNAPSHOTS = 2
+
+
+def quantize_rows(matrix):
+    """
+    Symmetric per-row int8 scalar quantization of a float32 matrix.
+    Returns (codes, scales) with row i ~= codes[i] * scales[i].
+    """
+    peaks = np.abs(matrix).max(axis=1) if matrix.size else np.zeros(matrix.shape[0], dtype=np.float32)
+    scales = (peaks / 127).astype(np.float32)
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+def quantized_scores(codes, scales, query):
+    """
+    Approximate `matrix @ query` from int8 codes, decoding SCAN_CHUNK_ROWS
+    rows at a time.
+    """
+    scores = np.empty(codes.shape[0], dtype=np.float32)
+    for start in range(0, codes.shape[0], SCAN_CHUNK_ROWS):
+        stop = start + SCAN_CHUNK_ROWS
+        scores[start:stop] = codes[start:stop].astype(np.float32) @ query
+    scores *= scales
+    return scores
+
+
+def chunked_scores(matrix, query):
+    """
+    Exact `matrix @ query` over a (memory-mapped) float32 matrix, SCAN_CHUNK_ROWS
+    rows at a time.
+    """
+    scores = np.empty(matrix.shape[0], dtype=np.float32)
+    for start in range(0, matrix.shape[0], SCAN_CHUNK_ROWS):
+        stop = start + SCAN_CHUNK_ROWS
+        scores[start:stop] = matrix[start:stop] @ query
+    return scores
+
+
+def snapshot_name(version):
+    """
+    Directory name of the snapshot for a (count, latest updated_at) version.
+    """
+    count, latest = version
+    stamp = latest.isoformat() if latest is not None else ""
+    return hashlib.sha1(f"{count}:{stamp}".encode()).hexdigest()[:16]
+
+
+def write_snapshot(root, version, labels, matrix):
+    """
+    Write a candidate matrix snapshot under root/<snapshot_name>:
+    - full.npy: the normalised float32 rows, for exact scores and re-ranking.
+    - codes.npy / scales.npy: the int8 quantized rows used for scanning.
+    - labels.json: profile_ids, user_ids and usernames aligned with the rows.
+    The snapshot is assembled in a temporary directory and renamed into
+    place, so concurrent builders are harmless and readers never see a
+    partial snapshot. Only the newest KEEP_SNAPSHOTS are kept; processes
+    that still map a removed one keep its (unlinked) files until they reload.
+    Returns the snapshot path.
+    """
+    os.makedirs(root, exist_ok=True)
+    name = snapshot_name(version)
+    path = os.path.join(root, name)
+    if os.path.isdir(path):
+        return path
+
+    tmp_path = tempfile.mkdtemp(prefix=f".{name}-", dir=root)
+    codes, scales = quantize_rows(matrix)
+    np.save(os.path.join(tmp_path, "full.npy"), matrix)
+    np.save(os.path.join(tmp_path, "codes.npy"), codes)
+    np.save(os.path.join(tmp_path, "scales.npy"), scales)
+    with open(os.path.join(tmp_path, "labels.json"), "w") as f:
+        json.dump(labels, f)
+    try:
+        os.rename(tmp_path, path)
+    except OSError:
+        # Another process published the same snapshot first
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+    snapshots = [
+        os.path.join(root, entry) for entry in os.listdir(root) if not entry.startswith(".")
+    ]
+    snapshots.sort(key=_mtime, reverse=True)
+    for old_path in snapshots[KEEP_SNAPSHOTS:]:
+        shutil.rmtree(old_path, ignore_errors=True)
+    return path
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        # Removed by another process meanwhile
+        return 0.0
+
+
+def read_snapshot(root, version):
+    """
+    Memory-map a snapshot read-only. Returns (labels, full, codes, scales),
+    or None if no snapshot exists for `version` yet.
+    """
+    path = os.path.join(root, snapshot_name(version))
+    try:
+        with open(os.path.join(path, "labels.json")) as f:
+            labels = json.load(f)
+        arrays = [
+            np.load(os.path.join(path, f"{part}.npy"), mmap_mode="r")
+            for part in ("full", "codes", "scales")
+        ]
+    except FileNotFoundError:
+        return None
+    return (labels, *arrays)
@@ -0,0 +1,237 @@
+import heapq
+import math
+import os
+import re
+from collections import Counter
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Avg, Count
+
+from candidate.models import CandidateProfile, CandidateSkill
+from candidate.structured import load_structured, normalize_name
+from .models import MatchScore, SearchDocument, SearchPosting
+from .utils import SCORE_BATCH_SIZE, select_top
+
+# Okapi BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Weight of the embedding similarity in the hybrid score (the rest is BM25)
+DEFAULT_ALPHA = 0.7
+# Without hard filters, hybrid ranking only blends the best this many (or
+# top_k, if larger) candidates by similarity and by BM25
+HYBRID_PRESELECT = int(os.getenv("HYBRID_PRESELECT", "1000"))
+
+# Keeps tech tokens such as "c++", "c#" and "node.js" intact
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9+#]+)*")
+# Title/certification lists sometimes arrive as one delimited string
+LIST_SPLIT_RE = re.compile(r"[,;|\n•]")
+MAX_TERM_LENGTH = 100
+
+# resume_data keys (matched case-insensitively, at any depth) per field
+FIELD_KEYS = {
+    SearchPosting.FIELD_TITLE: {"title", "job_title", "position", "designation"},
+    SearchPosting.FIELD_CERTIFICATION: {"certifications", "certificates", "licenses"},
+}
+
+
+def tokenize(text):
+    return [token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall(str(text).lower())]
+
+
+def normalize_phrase(text):
+    """
+    Canonical form of a skill/title/certification, e.g. " Kubernetes " -> "kubernetes".
+    """
+    return " ".join(tokenize(text))[:MAX_TERM_LENGTH]
+
+
+def iter_strings(value):
+    """
+    Every string (and number) nested anywhere inside a JSON value.
+    """
+    if isinstance(value, dict):
+        for item in value.values():
+            yield from iter_strings(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from iter_strings(item)
+    elif isinstance(value, (str, int, float)) and not isinstance(value, bool):
+        yield str(value)
+
+
+def iter_field_values(data, keys):
+    """
+    The values stored under any of `keys` anywhere inside `data`.
+    """
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if str(key).lower() in keys:
+                yield value
+            else:
+                yield from iter_field_values(value, keys)
+    elif isinstance(data, list):
+        for item in data:
+            yield from iter_field_values(item, keys)
+
+
+def document_terms(resume_data):
+    """
+    Returns (text_counts, keywords):
+    - text_counts: Counter of every token in the resume, for BM25.
+    - keywords: {field: set of terms} with the whole normalised phrases and
+      the tokens of titles and certifications, for hard filters.
+    """
+    data = load_structured(resume_data)
+    text_counts = Counter(token for text in iter_strings(data) for token in tokenize(text))
+
+    keywords = {}
+    for field, keys in FIELD_KEYS.items():
+        terms = set()
+        for value in iter_field_values(data, keys):
+            for text in iter_strings(value):
+                for phrase in LIST_SPLIT_RE.split(text):
+                    tokens = tokenize(phrase)
+                    if tokens:
+                        terms.add(" ".join(tokens)[:MAX_TERM_LENGTH])
+                        terms.update(tokens)
+        keywords[field] = terms
+    return text_counts, keywords
+
+
+def index_profile(profile):
+    """
+    (Re)build the inverted index entries of one candidate profile.
+    Returns the number of postings written.
+    """
+    text_counts, keywords = document_terms(profile.resume_data)
+    postings = [
+        SearchPosting(candidate_id=profile.id, field=SearchPosting.FIELD_TEXT, term=term, frequency=count)
+        for term, count in text_counts.items()
+    ]
+    for field, terms in keywords.items():
+        postings.extend(
+            SearchPosting(candidate_id=profile.id, field=field, term=term) for term in terms
+        )
+
+    with transaction.atomic():
+        SearchPosting.objects.filter(candidate_id=profile.id).delete()
+        SearchPosting.objects.bulk_create(postings, batch_size=SCORE_BATCH_SIZE)
+        SearchDocument.objects.update_or_create(
+            candidate_id=profile.id, defaults={"length": sum(text_counts.values())}
+        )
+    return len(postings)
+
+
+def filter_candidates(skills=(), titles=(), certifications=(), location="", min_years=None):
+    """
+    Candidate profile ids (as a lazy values queryset) that have every
+    required skill, title and certification, are based in `location` (a
+    prefix such as "berlin") and have at least `min_years` of experience.
+    None when nothing is required.
+    """
+    required = (
+        [(SearchPosting.FIELD_TITLE, normalize_phrase(value)) for value in titles]
+        + [(SearchPosting.FIELD_CERTIFICATION, normalize_phrase(value)) for value in certifications]
+    )
+    required = [(field, term) for field, term in required if term]
+    skills = [name for name in map(normalize_name, skills) if name]
+    location = normalize_name(location)
+    if not (required or skills or location or min_years is not None):
+        return None
+
+    profiles = CandidateProfile.objects.all()
+    for name in skills:
+        profiles = profiles.filter(
+            id__in=CandidateSkill.objects.filter(name=name).values("candidate_id")
+        )
+    for field, term in required:
+        profiles = profiles.filter(
+            id__in=SearchPosting.objects.filter(field=field, term=term).values("candidate_id")
+        )
+    if location:
+        profiles = profiles.filter(location__startswith=location)
+    if min_years is not None:
+        profiles = profiles.filter(years_experience__gte=min_years)
+    return profiles.values("id")
+
+
+def bm25_scores(query, candidate_ids=None):
+    """
+    BM25 score of every indexed profile matching at least one query token,
+    as {candidate_profile_id: score}.
+    - candidate_ids: restrict scoring to these profiles (ids or a values queryset).
+    """
+    terms = sorted(set(tokenize(query)))
+    if not terms:
+        return {}
+
+    stats = SearchDocument.objects.aggregate(count=Count("id"), avg_length=Avg("length"))
+    total, avg_length = stats["count"], stats["avg_length"] or 1.0
+    postings = SearchPosting.objects.filter(field=SearchPosting.FIELD_TEXT, term__in=terms)
+    doc_freqs = dict(postings.values_list("term").annotate(df=Count("id")).order_by())
+    idf = {
+        term: math.log(1 + (total - df + 0.5) / (df + 0.5))
+        for term, df in doc_freqs.items()
+    }
+
+    if candidate_ids is not None:
+        postings = postings.filter(candidate_id__in=candidate_ids)
+    scores = {}
+    rows = postings.values_list("candidate_id", "term", "frequency", "candidate__search_document__length")
+    for candidate_id, term, frequency, length in rows:
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * (length or 0) / avg_length)
+        score = idf[term] * frequency * (BM25_K1 + 1) / (frequency + norm)
+        scores[candidate_id] = scores.get(candidate_id, 0.0) + score
+    return scores
+
+
+def hybrid_rank(job, query="", top_k=None, alpha=DEFAULT_ALPHA, **filters):
+    """
+    Rank candidates for a job by alpha * cosine similarity + (1 - alpha) *
+    BM25 relevance to `query` (scaled to 0..1 by the best BM25 score).
+    `filters` (see filter_candidates) are resolved through indexed lookups
+    first, so only matching candidates are scored. Without filters only the
+    HYBRID_PRESELECT best by similarity (an indexed range of the MatchScore
+    table) and by BM25 are blended, rather than every candidate.
+    Cosine similarities come from the precomputed MatchScore table.
+    """
+    candidate_ids = filter_candidates(**filters)
+    lexical = bm25_scores(query, candidate_ids=candidate_ids)
+
+    scores = MatchScore.objects.filter(job=job)
+    if candidate_ids is not None:
+        scores = scores.filter(candidate_id__in=candidate_ids)
+    elif top_k is not None:
+        # Without a query the ranking is by similarity alone, so top_k is exact
+        limit = max(HYBRID_PRESELECT, top_k) if lexical else top_k
+        by_similarity = scores.order_by("-score", "candidate_id").values_list("candidate_id", flat=True)[:limit]
+        by_bm25 = heapq.nlargest(limit, lexical, key=lexical.get)
+        scores = scores.filter(candidate_id__in=[*by_similarity, *by_bm25])
+    rows = list(
+        scores.order_by("candidate_id").values_list(
+            "candidate_id", "candidate__user_id", "candidate__user__username", "score"
+        )
+    )
+    if not rows:
+        return []
+
+    similarity = np.fromiter((row[3] for row in rows), dtype=np.float32, count=len(rows))
+    bm25 = np.fromiter((lexical.get(row[0], 0.0) for row in rows), dtype=np.float32, count=len(rows))
+    best = bm25.max()
+    if best > 0:
+        hybrid = alpha * similarity + (1 - alpha) * bm25 / best
+    else:
+        # Nothing matched lexically: rank by similarity alone
+        hybrid = similarity
+
+    return [
+        {
+            "candidate_id": rows[i][1],
+            "candidate_username": rows[i][2],
+            "similarity_score": float(similarity[i]),
+            "bm25_score": float(bm25[i]),
+            "hybrid_score": float(hybrid[i]),
+        }
+        for i in select_top(hybrid, top_k=top_k).tolist()
+    ]
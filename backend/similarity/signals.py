@@ -0,0 +1,31 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from candidate.models import CandidateProfile
+from job.models import Job
+from .cache import invalidate_rankings
+from .search import index_profile
+
+
+@receiver(post_save, sender=CandidateProfile)
+def index_candidate_profile(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Keep the inverted search index in step with resume_data. Postings are
+    removed with the profile through their foreign key.
+    """
+    if raw:
+        return
+    if update_fields is not None and "resume_data" not in update_fields:
+        return
+    index_profile(instance)
+
+
+@receiver([post_save, post_delete], sender=CandidateProfile)
+def invalidate_candidate_rankings(sender, instance, **kwargs):
+    # Any profile can appear in any job's ranking
+    invalidate_rankings()
+
+
+@receiver([post_save, post_delete], sender=Job)
+def invalidate_job_ranking(sender, instance, **kwargs):
+    invalidate_rankings([instance.pk])
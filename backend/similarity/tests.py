@@ -1,3 +1,336 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
 
-# Create your tests here.
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from candidate.models import CandidateProfile
+from job.models import Job
+from .management.commands.benchmark_ranking import find_regressions, summarize
+from . import search, utils as similarity_utils, views as similarity_views
+from .models import MatchScore
+from .search import bm25_scores, filter_candidates, hybrid_rank
+from .utils import get_candidate_matrix, refresh_job_scores, reset_candidate_matrix
+
+DIM = 8
+
+
+# Each test gets its own cache: the default file cache would serve pages
+# (keyed by job id) cached by an earlier test or run
+@override_settings(
+    ALLOWED_HOSTS=["testserver"],
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+)
+class RankingTestCase(TestCase):
+    """
+    A recruiter with one embedded, scored job and `candidates` embedded
+    profiles.
+    """
+    candidates = 5
+
+    def setUp(self):
+        reset_candidate_matrix()
+        self.addCleanup(reset_candidate_matrix)
+        rng = np.random.default_rng(0)
+        User = get_user_model()
+        self.recruiter = User.objects.create(username="recruiter", role="job")
+        self.profiles = []
+        for i in range(self.candidates):
+            profile = CandidateProfile.objects.create(user=User.objects.create(username=f"candidate-{i}", role="candidate"))
+            profile.set_embedding(rng.standard_normal(DIM), "test-model")
+            profile.save()
+            self.profiles.append(profile)
+        self.job = Job.objects.create(poster=self.recruiter, title="Engineer", description="")
+        self.job.set_embedding(rng.standard_normal(DIM), "test-model")
+        self.job.save()
+        refresh_job_scores(self.job)
+        self.client.defaults["HTTP_AUTHORIZATION"] = f"Bearer {RefreshToken.for_user(self.recruiter).access_token}"
+        self.url = reverse("job-candidates-ranking", args=[self.job.id])
+
+
+@mock.patch.object(similarity_utils, "MATRIX_RERANK_CANDIDATES", 3)
+class QuantizedMatrixTests(RankingTestCase):
+    candidates = 40
+
+    def scored(self):
+        reset_candidate_matrix()
+        refresh_job_scores(self.job)
+        return list(MatchScore.objects.filter(job=self.job).order_by("-score").values_list("candidate_id", "score"))
+
+    def shared_mode(self):
+        matrix_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(matrix_dir.cleanup)
+        return override_settings(CANDIDATE_MATRIX_MODE="shared", CANDIDATE_MATRIX_DIR=matrix_dir.name)
+
+    def test_persisted_scores_match_float32(self):
+        exact = self.scored()
+        with self.shared_mode():
+            shared = self.scored()
+        self.assertEqual([row[0] for row in shared], [row[0] for row in exact])
+        for (_, shared_score), (_, exact_score) in zip(shared, exact):
+            self.assertAlmostEqual(shared_score, exact_score, places=5)
+
+    def test_rank_matches_float32(self):
+        query = self.job.get_embedding()
+        exact = get_candidate_matrix().rank(query, top_k=10)
+        with self.shared_mode():
+            reset_candidate_matrix()
+            matrix = get_candidate_matrix()
+            self.assertIsInstance(matrix, similarity_utils.QuantizedCandidateMatrix)
+            shared = matrix.rank(query, top_k=10)
+            min_score = exact[4]["similarity_score"]
+            self.assertEqual(
+                [row["candidate_id"] for row in matrix.rank(query, top_k=10, min_score=min_score)],
+                [row["candidate_id"] for row in exact[:5]],
+            )
+        self.assertEqual([row["candidate_id"] for row in shared], [row["candidate_id"] for row in exact])
+        for shared_row, exact_row in zip(shared, exact):
+            self.assertAlmostEqual(shared_row["similarity_score"], exact_row["similarity_score"], places=5)
+
+
+class RankingCacheTests(RankingTestCase):
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        settings = override_settings(CACHES={"default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": cache_dir.name,
+        }})
+        settings.enable()
+        self.addCleanup(settings.disable)
+        super().setUp()
+
+    def get(self, etag=None, **params):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.get(self.url, {"page_size": 2, **params}, **headers)
+
+    def test_unchanged_ranking_is_not_modified(self):
+        first = self.get()
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first["Cache-Control"], "private, no-cache")
+        with self.assertNumQueries(2):  # the user and the job
+            cached = self.get()
+        self.assertEqual(cached.json(), first.json())
+        self.assertEqual(cached["ETag"], first["ETag"])
+
+        not_modified = self.get(first["ETag"])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified["ETag"], first["ETag"])
+        self.assertEqual(self.get(first["ETag"], page_size=3).status_code, 200)
+
+    def test_profile_and_job_changes_invalidate(self):
+        etag = self.get()["ETag"]
+        for change in [
+            lambda: self.profiles[0].save(),
+            lambda: self.job.save(),
+            lambda: refresh_job_scores(self.job),
+        ]:
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+            response = self.get(etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response["ETag"], etag)
+            etag = response["ETag"]
+
+    @override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+    def test_process_local_cache_is_not_used(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response)
+
+
+class RankingResponseTests(RankingTestCase):
+    def test_unpaged_request_gets_every_row_as_a_list(self):
+        body = self.client.get(self.url).json()
+        self.assertIsInstance(body, list)
+        self.assertEqual(len(body), self.candidates)
+        scores = [row["similarity_score"] for row in body]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertEqual(self.client.get(self.url, {"top_k": 2}).json(), body[:2])
+        async_url = reverse("job-candidates-ranking-async", args=[self.job.id])
+        self.assertEqual(self.client.get(async_url).json(), body)
+
+    def test_page_size_opts_in_to_pages(self):
+        body = self.client.get(self.url, {"page_size": 2}).json()
+        self.assertEqual(set(body), {"results", "next_cursor"})
+        self.assertEqual(len(body["results"]), 2)
+        self.assertEqual(body["results"], self.client.get(self.url).json()[:2])
+        async_url = reverse("job-candidates-ranking-async", args=[self.job.id])
+        self.assertEqual(self.client.get(async_url, {"page_size": 2}).json(), body)
+
+
+class UnscoredJobTests(RankingTestCase):
+    candidates = 0
+
+    def test_job_without_candidates_is_scored_once(self):
+        Job.objects.filter(pk=self.job.pk).update(scored_at=None)
+        urls = [
+            self.url,
+            reverse("job-candidates-ranking-async", args=[self.job.id]),
+            reverse("job-candidates-search", args=[self.job.id]),
+        ]
+        with mock.patch.object(similarity_views, "refresh_job_scores", wraps=refresh_job_scores) as refresh:
+            for url in urls * 2:
+                self.assertEqual(self.client.get(url).status_code, 200)
+        refresh.assert_called_once()
+        self.job.refresh_from_db()
+        self.assertIsNotNone(self.job.scored_at)
+        self.assertEqual(self.client.get(self.url).json(), [])
+
+
+class RankingPaginationTests(RankingTestCase):
+    def pages(self, **params):
+        pages = []
+        params = {"page_size": 2, **params}
+        while True:
+            body = self.client.get(self.url, params).json()
+            pages.append(body["results"])
+            if body["next_cursor"] is None:
+                return pages
+            params["cursor"] = body["next_cursor"]
+
+    def test_cursor_walks_the_whole_ranking(self):
+        ranking = self.client.get(self.url).json()
+        pages = self.pages()
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual([row for page in pages for row in page], ranking)
+
+    def test_top_k_spans_pages(self):
+        ranking = self.client.get(self.url).json()
+        pages = self.pages(top_k=3)
+        self.assertEqual([len(page) for page in pages], [2, 1])
+        self.assertEqual([row for page in pages for row in page], ranking[:3])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(self.url, {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 400)
+
+
+class SearchTests(TestCase):
+    resumes = {
+        "ana": {
+            "skills": ["Kubernetes", "Go"],
+            "title": "Site Reliability Engineer",
+            "location": "Berlin, Germany",
+            "years_of_experience": 6,
+            "summary": "Runs kubernetes clusters and writes Go operators for kubernetes.",
+        },
+        "ben": {
+            "skills": "Python, Django",
+            "title": "Backend Engineer",
+            "location": "Munich",
+            "years_of_experience": "3+ years",
+            "summary": "Builds Django services.",
+        },
+        "cem": {
+            "skills": ["Kubernetes", "Python"],
+            "certifications": ["CKA"],
+            "location": {"city": "Berlin"},
+            "years_of_experience": 2,
+            "summary": "Deploys Python services to kubernetes.",
+        },
+    }
+
+    def setUp(self):
+        User = get_user_model()
+        self.ids = {}
+        for name, resume in self.resumes.items():
+            user = User.objects.create(username=name, role="candidate")
+            self.ids[name] = CandidateProfile.objects.create(user=user, resume_data=resume).id
+
+    def matching(self, **filters):
+        ids = {row["id"] for row in filter_candidates(**filters)}
+        return {name for name, profile_id in self.ids.items() if profile_id in ids}
+
+    def test_filters(self):
+        self.assertIsNone(filter_candidates())
+        self.assertEqual(self.matching(skills=["kubernetes"]), {"ana", "cem"})
+        self.assertEqual(self.matching(skills=[" KUBERNETES ", "python"]), {"cem"})
+        self.assertEqual(self.matching(titles=["backend engineer"]), {"ben"})
+        self.assertEqual(self.matching(titles=["engineer"]), {"ana", "ben"})
+        self.assertEqual(self.matching(certifications=["cka"]), {"cem"})
+        self.assertEqual(self.matching(location="Berlin"), {"ana", "cem"})
+        self.assertEqual(self.matching(min_years=3), {"ana", "ben"})
+        self.assertEqual(self.matching(skills=["kubernetes"], min_years=3), {"ana"})
+        self.assertEqual(self.matching(skills=["rust"]), set())
+
+    def test_bm25_scores(self):
+        self.assertEqual(bm25_scores(""), {})
+        scores = bm25_scores("kubernetes")
+        self.assertEqual(set(scores), {self.ids["ana"], self.ids["cem"]})
+        self.assertGreater(scores[self.ids["ana"]], scores[self.ids["cem"]])
+        restricted = bm25_scores("kubernetes", candidate_ids=filter_candidates(certifications=["cka"]))
+        self.assertEqual(restricted, {self.ids["cem"]: scores[self.ids["cem"]]})
+
+
+class BenchmarkRankingTests(TestCase):
+    def test_summarize(self):
+        self.assertEqual(summarize([10, 20, 30, 40]), {"p50": 25.0, "p95": 38.5, "p99": 39.7, "mean": 25.0})
+
+    def test_find_regressions(self):
+        baseline = [{"key": "a", "cold_ms": 100, "first_page_ms": {"p50": 10}, "peak_mb": 0}]
+        results = [
+            {"key": "a", "cold_ms": 110, "first_page_ms": {"p50": 13}, "peak_mb": 5},
+            {"key": "b", "cold_ms": 1000},
+        ]
+        # Within tolerance, absent from the baseline or without a baseline value
+        self.assertEqual(find_regressions(results, baseline, 0.2), [("a", "first_page_ms.p50", 10, 13)])
+        self.assertEqual(find_regressions(results, baseline, 0.5), [])
+
+    def test_tiny_run(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        output = os.path.join(tmp.name, "results.jsonl")
+        options = {
+            "sizes": "20,30", "dim": 8, "requests": 2, "page_size": 5, "output": output,
+            "stdout": io.StringIO(), "stderr": io.StringIO(),
+        }
+        call_command("benchmark_ranking", **options)
+
+        with open(output) as f:
+            results = [json.loads(line) for line in f]
+        self.assertEqual([result["size"] for result in results], [20, 30])
+        self.assertGreater(results[0]["first_page_ms"]["p50"], 0)
+        # The corpus is rolled back
+        self.assertFalse(CandidateProfile.objects.exists())
+        self.assertFalse(Job.objects.exists())
+
+        with open(output, "w") as f:
+            f.write(json.dumps({**results[0], "cold_ms": 1e-6}) + "\n")
+        with self.assertRaises(CommandError):
+            call_command("benchmark_ranking", **{**options, "sizes": "20", "output": None, "baseline": output})
+
+
+@mock.patch.object(search, "HYBRID_PRESELECT", 2)
+class HybridRankTests(RankingTestCase):
+    candidates = 6
+
+    def setUp(self):
+        super().setUp()
+        self.by_similarity = [row["candidate_id"] for row in self.client.get(self.url).json()]
+        # Only the least similar candidate mentions the query term
+        last = next(profile for profile in self.profiles if profile.user_id == self.by_similarity[-1])
+        last.resume_data = {"skills": ["Kubernetes"]}
+        last.save(update_fields=["resume_data"])
+
+    def ids(self, **options):
+        return [row["candidate_id"] for row in hybrid_rank(self.job, **options)]
+
+    def test_without_query_reads_only_top_k(self):
+        with self.assertNumQueries(2):  # the top_k ids, then their rows
+            self.assertEqual(self.ids(top_k=3), self.by_similarity[:3])
+
+    def test_lexical_matches_outside_the_similarity_preselection_are_ranked(self):
+        self.assertEqual(self.ids(query="kubernetes", top_k=3, alpha=0)[0], self.by_similarity[-1])
+        # The preselection keeps the rest of the order
+        self.assertEqual(self.ids(query="kubernetes", top_k=2, alpha=1), self.by_similarity[:2])
+        self.assertEqual(len(self.ids(query="kubernetes", top_k=None)), self.candidates)
@@ -1,6 +1,8 @@
 from django.urls import path
-from .views import JobCandidatesRankingView
+from .views import JobCandidatesRankingView, JobCandidatesSearchView, AsyncJobCandidatesRankingView
 
 urlpatterns = [
     path('job/<int:job_id>/ranking/', JobCandidatesRankingView.as_view(), name='job-candidates-ranking'),
+    path('job/<int:job_id>/search/', JobCandidatesSearchView.as_view(), name='job-candidates-search'),
+    path('job/<int:job_id>/ranking/async/', AsyncJobCandidatesRankingView.as_view(), name='job-candidates-ranking-async'),
 ]
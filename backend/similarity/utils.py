@@ -1,7 +1,321 @@
-def compute_similarity(candidate_data, job_data):
-    # Example pseudo-code:
-    # 1. Extract or generate embeddings from candidate_data (structured resume)
-    # 2. Extract or generate embeddings from job_data
-    # 3. Compute cosine similarity
-    # Return similarity score
-    return 0.8  # Stub
+import os
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from candidate.models import CandidateProfile
+from embedding.vectors import load_embedding_matrix
+from job.models import Job
+from .cache import invalidate_rankings
+from .models import MatchScore
+from .quantization import chunked_scores, quantized_scores, read_snapshot, write_snapshot
+
+# Rows per INSERT when writing MatchScore rows
+SCORE_BATCH_SIZE = 1000
+# Rows fetched per round trip when reading embeddings for scoring
+LOAD_CHUNK_SIZE = 2000
+# In the shared (quantized) matrix mode, how many of the best approximate
+# matches rank() re-scores against the full-precision rows (at least top_k)
+MATRIX_RERANK_CANDIDATES = int(os.getenv("MATRIX_RERANK_CANDIDATES", "300"))
+
+
+def normalize_rows(matrix):
+    """
+    L2-normalise every row of a 2-D float32 matrix in place (zero rows stay zero).
+    """
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+def build_embedding_matrix(embeddings, dim=None):
+    """
+    Stack a sequence of embedding vectors into a contiguous, row-normalised
+    float32 matrix so cosine similarity becomes a single dot product.
+    """
+    if len(embeddings) == 0:
+        return np.zeros((0, dim or 0), dtype=np.float32)
+    matrix = np.ascontiguousarray(np.asarray(embeddings, dtype=np.float32))
+    if matrix.ndim != 2:
+        raise ValueError("Embeddings must all have the same dimension.")
+    return normalize_rows(matrix)
+
+
+def compute_similarity(candidate_embedding, job_embedding):
+    """
+    Cosine similarity between two embedding vectors.
+    """
+    a = np.asarray(candidate_embedding, dtype=np.float32)
+    b = np.asarray(job_embedding, dtype=np.float32)
+    denom = np.linalg.norm(a) * np.linalg.norm(b)
+    if denom == 0:
+        return 0.0
+    return float(np.dot(a, b) / denom)
+
+
+def rank_embeddings(query, matrix, top_k=None, min_score=None):
+    """
+    Score every row of a normalised matrix against a query vector and return
+    (row_indices, scores) for the best matches, highest score first.
+    - top_k: keep at most this many rows (selected with argpartition, so only
+      the winners are sorted).
+    - min_score: drop rows whose cosine similarity is below this value.
+    """
+    if matrix.shape[0] == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+    q = np.asarray(query, dtype=np.float32)
+    if q.shape[0] != matrix.shape[1]:
+        raise ValueError(
+            f"Query dimension {q.shape[0]} does not match matrix dimension {matrix.shape[1]}."
+        )
+    norm = np.linalg.norm(q)
+    if norm:
+        q = q / norm
+
+    scores = matrix @ q
+    indices = select_top(scores, top_k=top_k, min_score=min_score)
+    return indices, scores[indices]
+
+
+def select_top(scores, top_k=None, min_score=None):
+    """
+    Indices of the best entries of a 1-D score array, highest first.
+    Only the top_k winners are sorted.
+    """
+    if min_score is not None:
+        candidates = np.flatnonzero(scores >= min_score)
+    else:
+        candidates = np.arange(scores.shape[0])
+
+    if top_k is not None and top_k < candidates.shape[0]:
+        part = np.argpartition(-scores[candidates], top_k - 1)[:top_k]
+        candidates = candidates[part]
+
+    order = np.argsort(-scores[candidates], kind="stable")
+    return candidates[order]
+
+
+def _normalize_query(query, dim):
+    q = np.asarray(query, dtype=np.float32)
+    if q.shape[0] != dim:
+        raise ValueError(f"Query dimension {q.shape[0]} does not match matrix dimension {dim}.")
+    norm = np.linalg.norm(q)
+    return q / norm if norm else q
+
+
+class CandidateMatrix:
+    """
+    In-process snapshot of every embedded candidate profile.
+    - profile_ids / user_ids / usernames: row labels, aligned with the matrix rows.
+    - matrix: contiguous float32, L2-normalised candidate embeddings.
+    - version: (count, latest updated_at) of the rows it was built from.
+    """
+
+    def __init__(self, profile_ids, user_ids, usernames, matrix, version):
+        self.profile_ids = profile_ids
+        self.user_ids = user_ids
+        self.usernames = usernames
+        self.matrix = matrix
+        self.version = version
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def scores(self, query):
+        """
+        Cosine similarity of every row to the query.
+        """
+        if len(self) == 0:
+            return np.zeros(0, dtype=np.float32)
+        return self.matrix @ _normalize_query(query, self.matrix.shape[1])
+
+    def rank(self, query, top_k=None, min_score=None):
+        scores = self.scores(query)
+        indices = select_top(scores, top_k=top_k, min_score=min_score)
+        return [
+            {
+                "candidate_id": self.user_ids[i],
+                "candidate_username": self.usernames[i],
+                "similarity_score": float(score),
+            }
+            for i, score in zip(indices.tolist(), scores[indices].tolist())
+        ]
+
+
+class QuantizedCandidateMatrix(CandidateMatrix):
+    """
+    Memory-budget variant of CandidateMatrix backed by a read-only
+    memory-mapped snapshot (see similarity.quantization), so every worker
+    process shares one copy through the page cache.
+    scores() is exact: it streams the full-precision rows in chunks, as the
+    scores are persisted to MatchScore. rank() with a top_k scans the int8
+    codes instead and re-scores the best max(top_k, MATRIX_RERANK_CANDIDATES)
+    against the full-precision rows, of which only those pages are read.
+    """
+
+    def __init__(self, profile_ids, user_ids, usernames, matrix, codes, scales, version):
+        super().__init__(profile_ids, user_ids, usernames, matrix, version)
+        self.codes = codes
+        self.scales = scales
+
+    def scores(self, query):
+        if len(self) == 0:
+            return np.zeros(0, dtype=np.float32)
+        return chunked_scores(self.matrix, _normalize_query(query, self.matrix.shape[1]))
+
+    def rank(self, query, top_k=None, min_score=None):
+        if top_k is None or len(self) == 0:
+            return super().rank(query, top_k=top_k, min_score=min_score)
+        q = _normalize_query(query, self.matrix.shape[1])
+        approximate = quantized_scores(self.codes, self.scales, q)
+        shortlist = np.sort(select_top(approximate, top_k=max(top_k, MATRIX_RERANK_CANDIDATES)))
+        scores = self.matrix[shortlist] @ q
+        winners = select_top(scores, top_k=top_k, min_score=min_score)
+        return [
+            {
+                "candidate_id": self.user_ids[i],
+                "candidate_username": self.usernames[i],
+                "similarity_score": float(score),
+            }
+            for i, score in zip(shortlist[winners].tolist(), scores[winners].tolist())
+        ]
+
+
+_matrix_lock = threading.Lock()
+_candidate_matrix = None
+
+
+def _embedded_profiles():
+    return CandidateProfile.objects.filter(embedding__isnull=False)
+
+
+def _current_version():
+    stats = _embedded_profiles().aggregate(count=Count("id"), latest=Max("updated_at"))
+    return stats["count"], stats["latest"]
+
+
+def _load_candidate_rows():
+    rows = _embedded_profiles().values_list(
+        "id", "user_id", "user__username", "embedding", "embedding_dtype"
+    )
+    profile_ids, user_ids, usernames, embeddings = [], [], [], []
+    for profile_id, user_id, username, embedding, dtype in rows.iterator(chunk_size=LOAD_CHUNK_SIZE):
+        profile_ids.append(profile_id)
+        user_ids.append(user_id)
+        usernames.append(username)
+        embeddings.append((embedding, dtype))
+    return profile_ids, user_ids, usernames, normalize_rows(load_embedding_matrix(embeddings))
+
+
+def _load_shared_matrix(version):
+    """
+    Map the shared snapshot for `version`, building and publishing it first
+    if no process has yet.
+    """
+    root = settings.CANDIDATE_MATRIX_DIR
+    snapshot = read_snapshot(root, version)
+    if snapshot is None:
+        profile_ids, user_ids, usernames, matrix = _load_candidate_rows()
+        labels = {"profile_ids": profile_ids, "user_ids": user_ids, "usernames": usernames}
+        write_snapshot(root, version, labels, matrix)
+        snapshot = read_snapshot(root, version)
+    labels, matrix, codes, scales = snapshot
+    return QuantizedCandidateMatrix(
+        labels["profile_ids"], labels["user_ids"], labels["usernames"], matrix, codes, scales, version
+    )
+
+
+def get_candidate_matrix():
+    """
+    Return the cached CandidateMatrix, rebuilding it only when a profile has
+    been added, removed or updated since it was last loaded.
+    With CANDIDATE_MATRIX_MODE = "shared" this is a QuantizedCandidateMatrix
+    over a memory-mapped file instead of a private float32 copy.
+    """
+    global _candidate_matrix
+    version = _current_version()
+    cached = _candidate_matrix
+    if cached is not None and cached.version == version:
+        return cached
+
+    with _matrix_lock:
+        cached = _candidate_matrix
+        if cached is not None and cached.version == version:
+            return cached
+
+        if settings.CANDIDATE_MATRIX_MODE == "shared":
+            _candidate_matrix = _load_shared_matrix(version)
+        else:
+            profile_ids, user_ids, usernames, matrix = _load_candidate_rows()
+            _candidate_matrix = CandidateMatrix(profile_ids, user_ids, usernames, matrix, version)
+        return _candidate_matrix
+
+
+def reset_candidate_matrix():
+    """
+    Drop the cached CandidateMatrix so the next get_candidate_matrix() call
+    loads it again, e.g. to measure a cold load.
+    """
+    global _candidate_matrix
+    with _matrix_lock:
+        _candidate_matrix = None
+
+
+def refresh_job_scores(job):
+    """
+    Recompute the MatchScore rows of one job against every embedded candidate
+    and record when (Job.scored_at), also when there is nothing to score.
+    Returns the number of rows written.
+    """
+    with transaction.atomic():
+        # Cached rankings go stale when this commits
+        invalidate_rankings([job.id])
+        MatchScore.objects.filter(job=job).delete()
+        # update() rather than save(), so this doesn't re-trigger post_save
+        job.scored_at = timezone.now()
+        Job.objects.filter(pk=job.pk).update(scored_at=job.scored_at)
+        if not job.embedding:
+            return 0
+        matrix = get_candidate_matrix()
+        scores = matrix.scores(job.get_embedding())
+        MatchScore.objects.bulk_create(
+            [
+                MatchScore(job_id=job.id, candidate_id=profile_id, score=score)
+                for profile_id, score in zip(matrix.profile_ids, scores.tolist())
+            ],
+            batch_size=SCORE_BATCH_SIZE,
+        )
+    return len(scores)
+
+
+def refresh_candidate_scores(profile):
+    """
+    Recompute the MatchScore rows of one candidate against every embedded job.
+    Returns the number of rows written.
+    """
+    with transaction.atomic():
+        invalidate_rankings()
+        MatchScore.objects.filter(candidate=profile).delete()
+        if not profile.embedding:
+            return 0
+        job_ids, embeddings = [], []
+        rows = Job.objects.filter(embedding__isnull=False).values_list("id", "embedding", "embedding_dtype")
+        for job_id, embedding, dtype in rows.iterator(chunk_size=LOAD_CHUNK_SIZE):
+            job_ids.append(job_id)
+            embeddings.append((embedding, dtype))
+        matrix = normalize_rows(load_embedding_matrix(embeddings))
+        indices, scores = rank_embeddings(profile.get_embedding(), matrix)
+        MatchScore.objects.bulk_create(
+            [
+                MatchScore(job_id=job_ids[i], candidate_id=profile.id, score=score)
+                for i, score in zip(indices.tolist(), scores.tolist())
+            ],
+            batch_size=SCORE_BATCH_SIZE,
+        )
+    return len(indices)
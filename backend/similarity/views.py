@@ -1,32 +1,431 @@
+import base64
+import binascii
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.db.models import Q
+from django.http import HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils.http import parse_etags
+from django.views import View
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions
+from backend.db_routers import ReplicaReadMixin, read_from_replica
+from backend.metrics import CACHE_LOOKUPS, timed
+from user.authentication import aauthorize
 from user.permissions import IsCandidateUser, IsJobUser
-from candidate.models import CandidateProfile
 from job.models import Job
-from .utils import compute_similarity
+from . import cache as ranking_cache
+from .models import MatchScore
+from .search import DEFAULT_ALPHA, hybrid_rank
+from .utils import refresh_job_scores
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+STREAM_CHUNK_SIZE = 2000
+# Job columns ranking needs; skips the structured JD and embedding text
+RANKING_JOB_FIELDS = ("id", "embedding", "embedding_dtype", "scored_at")
+# cached_page() result when the client's copy is current
+NOT_MODIFIED = object()
+
+
+def _query_param(query_params, name, cast):
+    """
+    Read an optional query parameter, returning None when it is absent.
+    Raises ValueError if it cannot be cast.
+    """
+    value = query_params.get(name)
+    if value in (None, ""):
+        return None
+    return cast(value)
+
+
+def encode_cursor(score, candidate_id, returned):
+    """
+    Opaque keyset cursor: the (score, candidate_id) of the last row sent and
+    how many rows have been returned so far (to honour top_k across pages).
+    """
+    raw = json.dumps({"s": score, "c": candidate_id, "n": returned}).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Returns (score, candidate_id, returned). Raises ValueError if malformed.
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(data["s"]), int(data["c"]), int(data["n"])
+    except (TypeError, KeyError, json.JSONDecodeError, UnicodeError, binascii.Error) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def parse_ranking_params(query_params):
+    """
+    Validate the ranking query params. Raises ValueError with a message
+    suitable for a 400 response.
+    """
+    try:
+        top_k = _query_param(query_params, "top_k", int)
+        min_score = _query_param(query_params, "min_score", float)
+        page_size = _query_param(query_params, "page_size", int) or DEFAULT_PAGE_SIZE
+    except ValueError:
+        raise ValueError("top_k and page_size must be integers and min_score a number")
+    if top_k is not None and top_k < 1:
+        raise ValueError("top_k must be positive")
+    if page_size < 1:
+        raise ValueError("page_size must be positive")
+
+    params = {
+        "top_k": top_k,
+        "min_score": min_score,
+        "page_size": min(page_size, MAX_PAGE_SIZE),
+        "cursor": None,
+        "returned": 0,
+        # Clients that don't ask for pages get the original bare list
+        "paged": bool(query_params.get("page_size") or query_params.get("cursor")),
+        "stream": query_params.get("stream") == "ndjson",
+    }
+    cursor = query_params.get("cursor")
+    if cursor:
+        last_score, last_candidate, params["returned"] = decode_cursor(cursor)
+        params["cursor"] = (last_score, last_candidate)
+    return params
+
+
+def _list_param(query_params, name):
+    """
+    Comma-separated values of a query parameter, also accepting it repeated.
+    """
+    values = []
+    for value in query_params.getlist(name):
+        values.extend(item.strip() for item in value.split(",") if item.strip())
+    return values
+
+
+def parse_search_params(query_params):
+    """
+    Validate the hybrid search query params. Raises ValueError with a
+    message suitable for a 400 response.
+    """
+    try:
+        top_k = _query_param(query_params, "top_k", int) or DEFAULT_PAGE_SIZE
+        alpha = _query_param(query_params, "alpha", float)
+        min_years = _query_param(query_params, "min_years", float)
+    except ValueError:
+        raise ValueError("top_k must be an integer and alpha and min_years numbers")
+    if top_k < 1:
+        raise ValueError("top_k must be positive")
+    if alpha is None:
+        alpha = DEFAULT_ALPHA
+    if not 0 <= alpha <= 1:
+        raise ValueError("alpha must be between 0 and 1")
+
+    return {
+        "query": query_params.get("q", ""),
+        "skills": _list_param(query_params, "skills"),
+        "titles": _list_param(query_params, "titles"),
+        "certifications": _list_param(query_params, "certifications"),
+        "location": query_params.get("location", ""),
+        "min_years": min_years,
+        "top_k": min(top_k, MAX_PAGE_SIZE),
+        "alpha": alpha,
+    }
+
+
+def remaining_rows(params):
+    if params["top_k"] is None:
+        return None
+    return params["top_k"] - params["returned"]
+
+
+def page_limit(params):
+    remaining = remaining_rows(params)
+    return params["page_size"] if remaining is None else min(params["page_size"], remaining)
+
+
+def ranking_queryset(job, params):
+    """
+    (user_id, username, score, candidate_id) rows for a job, best first,
+    starting after the cursor and capped at what is left of top_k.
+    """
+    scores = MatchScore.objects.filter(job=job)
+    if params["min_score"] is not None:
+        scores = scores.filter(score__gte=params["min_score"])
+    if params["cursor"]:
+        last_score, last_candidate = params["cursor"]
+        scores = scores.filter(
+            Q(score__lt=last_score) | Q(score=last_score, candidate_id__gt=last_candidate)
+        )
+    scores = scores.order_by("-score", "candidate_id").values_list(
+        "candidate__user_id", "candidate__user__username", "score", "candidate_id"
+    )
+    remaining = remaining_rows(params)
+    if remaining is not None:
+        scores = scores[:remaining] if remaining > 0 else scores.none()
+    return scores
+
+
+def page_rows(scores, params):
+    """
+    The rows to fetch for one response: up to page_limit + 1 (the extra row
+    tells whether another page exists), or all of them for an unpaged
+    request.
+    """
+    if not params["paged"]:
+        return scores
+    return scores[:page_limit(params) + 1]
+
+
+def build_page(rows, params):
+    """
+    Turn the fetched rows into the response body: the page and its
+    next_cursor, or a bare list of every row for an unpaged request.
+    """
+    if not params["paged"]:
+        return [_score_row(user_id, username, score) for user_id, username, score, _ in rows]
+    limit = page_limit(params)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more and rows:
+        _, _, score, candidate_id = rows[-1]
+        next_cursor = encode_cursor(score, candidate_id, params["returned"] + len(rows))
+
+    return {
+        "results": [_score_row(user_id, username, score) for user_id, username, score, _ in rows],
+        "next_cursor": next_cursor,
+    }
+
+
+def _score_row(user_id, username, score):
+    return {
+        "candidate_id": user_id,
+        "candidate_username": username,
+        "similarity_score": score,
+    }
+
+
+def _ndjson_line(row):
+    user_id, username, score, _ = row
+    return json.dumps(_score_row(user_id, username, score)) + "\n"
+
+
+def _etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    tags = parse_etags(if_none_match)
+    return "*" in tags or etag in (tag.removeprefix("W/") for tag in tags)
+
+
+def cache_headers(cache_key):
+    if cache_key is None:
+        return {}
+    # Clients may keep the page but must revalidate it with If-None-Match
+    return {"ETag": ranking_cache.ranking_etag(cache_key), "Cache-Control": "private, no-cache"}
+
 
-class JobCandidatesRankingView(APIView):
+def cached_page(job_id, params, if_none_match):
+    """
+    Look a ranking page up in the cache. Returns (cache_key, body), where
+    body is NOT_MODIFIED when the client's If-None-Match already names the
+    current ranking, the cached body on a hit and None on a miss. The key
+    is None when the request isn't cacheable.
+    """
+    if params["stream"] or not ranking_cache.caching_enabled():
+        return None, None
+    cache_key = ranking_cache.ranking_cache_key(job_id, params)
+    if _etag_matches(if_none_match, ranking_cache.ranking_etag(cache_key)):
+        CACHE_LOOKUPS.inc(cache="ranking", result="not_modified")
+        return cache_key, NOT_MODIFIED
+    body = ranking_cache.get_ranking(cache_key)
+    CACHE_LOOKUPS.inc(cache="ranking", result="miss" if body is None else "hit")
+    return cache_key, body
+
+
+async def _aiter_rows(queryset, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Async iteration over a values_list queryset, fetched chunk_size rows at a
+    time in the sync thread. (QuerySet.aiterator() evaluates values_list
+    querysets eagerly in the event loop on sync database backends.)
+    """
+    rows = queryset.iterator(chunk_size=chunk_size)
+    while True:
+        chunk = await sync_to_async(list)(islice(rows, chunk_size))
+        for row in chunk:
+            yield row
+        if len(chunk) < chunk_size:
+            break
+
+
+class JobCandidatesRankingView(ReplicaReadMixin, APIView):
+    """
+    Rank candidate profiles for a job from the precomputed MatchScore table.
+    By default the response is a list of every ranked candidate, best
+    first. Passing page_size or cursor opts in to pagination instead: the
+    response becomes {"results": [...], "next_cursor": ...}, paged with a
+    keyset cursor on (score, candidate) so each page is an indexed range
+    scan regardless of how deep it is.
+    Optional query params:
+    - top_k: maximum number of candidates to return (across all pages).
+    - min_score: minimum cosine similarity a candidate must reach.
+    - page_size: rows per page (default 50, max 500); enables pagination.
+    - cursor: the next_cursor value from the previous page.
+    - stream=ndjson: stream every remaining row as newline-delimited JSON
+      instead of paging.
+    Pages are cached until the job or any candidate profile changes
+    (similarity.cache) and carry an ETag; a request whose If-None-Match
+    matches it gets an empty 304.
+    """
     permission_classes = [permissions.IsAuthenticated, IsJobUser]
-    
+
     def get(self, request, job_id):
         # Ensure the job belongs to the current user
         try:
-            job = Job.objects.get(pk=job_id, poster=request.user)
+            job = Job.objects.only(*RANKING_JOB_FIELDS).get(pk=job_id, poster=request.user)
+        except Job.DoesNotExist:
+            return Response({"error": "Job not found or not yours"}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            params = parse_ranking_params(request.query_params)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not job.embedding:
+            return Response({"error": "Job has no embedding yet"}, status=status.HTTP_400_BAD_REQUEST)
+
+        cache_key, body = cached_page(job.id, params, request.headers.get("If-None-Match"))
+        if body is NOT_MODIFIED:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=cache_headers(cache_key))
+        if body is not None:
+            return Response(body, status=status.HTTP_200_OK, headers=cache_headers(cache_key))
+
+        # Scores are written when the JD or a resume is embedded; fill them
+        # here for jobs never scored, e.g. embedded before the table existed.
+        refreshed = job.scored_at is None
+        if refreshed:
+            try:
+                with timed("score"):
+                    refresh_job_scores(job)
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            # Scoring bumped the job's version stamp
+            if cache_key is not None:
+                cache_key = ranking_cache.ranking_cache_key(job.id, params)
+
+        scores = ranking_queryset(job, params)
+        if params["stream"]:
+            return StreamingHttpResponse(
+                (_ndjson_line(row) for row in scores.iterator(chunk_size=STREAM_CHUNK_SIZE)),
+                content_type="application/x-ndjson",
+            )
+
+        # Scores written just now may not have reached the replica yet
+        with read_from_replica(not refreshed):
+            rows = list(page_rows(scores, params))
+        body = build_page(rows, params)
+        if cache_key is not None:
+            ranking_cache.set_ranking(cache_key, body)
+        return Response(body, status=status.HTTP_200_OK, headers=cache_headers(cache_key))
+
+
+class JobCandidatesSearchView(ReplicaReadMixin, APIView):
+    """
+    Hybrid lexical + vector candidate search for a job.
+    Hard filters prune the candidate set through indexed lookups (skill
+    rows, the inverted index, location and experience columns) before
+    anything is scored; the survivors are ranked by a blend of embedding
+    similarity and BM25 relevance to the free-text query.
+    Query params:
+    - q: free-text query scored with BM25 (optional).
+    - skills / titles / certifications: comma-separated values a candidate
+      must all have, e.g. skills=kubernetes,go.
+    - location: location prefix, e.g. location=berlin.
+    - min_years: minimum years of experience.
+    - top_k: number of candidates to return (default 50, max 500).
+    - alpha: weight of the embedding similarity, 0..1 (default 0.7).
+    """
+    permission_classes = [permissions.IsAuthenticated, IsJobUser]
+
+    def get(self, request, job_id):
+        try:
+            job = Job.objects.only(*RANKING_JOB_FIELDS).get(pk=job_id, poster=request.user)
         except Job.DoesNotExist:
             return Response({"error": "Job not found or not yours"}, status=status.HTTP_404_NOT_FOUND)
-        
-        # Suppose we have an ApplicationMapping or something to show which candidates applied
-        # For simplicity, we rank all candidate profiles
-        candidates = CandidateProfile.objects.select_related('user').all()
-        results = []
-        for c in candidates:
-            sim = compute_similarity(c.resume_data, job.jd_file)
-            results.append({
-                "candidate_id": c.user.id,
-                "candidate_username": c.user.username,
-                "similarity_score": sim
-            })
-        # Sort descending
-        results.sort(key=lambda x: x["similarity_score"], reverse=True)
-        return Response(results, status=status.HTTP_200_OK)
+
+        try:
+            params = parse_search_params(request.query_params)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not job.embedding:
+            return Response({"error": "Job has no embedding yet"}, status=status.HTTP_400_BAD_REQUEST)
+
+        refreshed = job.scored_at is None
+        if refreshed:
+            try:
+                with timed("score"):
+                    refresh_job_scores(job)
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        with timed("search"), read_from_replica(not refreshed):
+            results = hybrid_rank(job, **params)
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+
+class AsyncJobCandidatesRankingView(ReplicaReadMixin, View):
+    """
+    Async-native version of JobCandidatesRankingView for ASGI deployments:
+    same params, response and caching, but database and cache I/O is awaited
+    instead of holding a worker thread.
+    """
+
+    async def get(self, request, job_id):
+        user, error = await aauthorize(request, IsJobUser)
+        if error:
+            return error
+
+        job = await Job.objects.only(*RANKING_JOB_FIELDS).filter(pk=job_id, poster=user).afirst()
+        if job is None:
+            return JsonResponse({"error": "Job not found or not yours"}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            params = parse_ranking_params(request.GET)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not job.embedding:
+            return JsonResponse({"error": "Job has no embedding yet"}, status=status.HTTP_400_BAD_REQUEST)
+
+        cache_key, body = await sync_to_async(cached_page)(job.id, params, request.headers.get("If-None-Match"))
+        if body is NOT_MODIFIED:
+            return HttpResponseNotModified(headers=cache_headers(cache_key))
+        if body is not None:
+            return JsonResponse(body, status=status.HTTP_200_OK, headers=cache_headers(cache_key), safe=False)
+
+        refreshed = job.scored_at is None
+        if refreshed:
+            try:
+                with timed("score"):
+                    await sync_to_async(refresh_job_scores)(job)
+            except ValueError as e:
+                return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            if cache_key is not None:
+                cache_key = await sync_to_async(ranking_cache.ranking_cache_key)(job.id, params)
+
+        scores = ranking_queryset(job, params)
+        if params["stream"]:
+            async def stream():
+                async for row in _aiter_rows(scores):
+                    yield _ndjson_line(row)
+            return StreamingHttpResponse(stream(), content_type="application/x-ndjson")
+
+        with read_from_replica(not refreshed):
+            rows = await sync_to_async(list)(page_rows(scores, params))
+        body = build_page(rows, params)
+        if cache_key is not None:
+            await sync_to_async(ranking_cache.set_ranking)(cache_key, body)
+        return JsonResponse(body, status=status.HTTP_200_OK, headers=cache_headers(cache_key), safe=False)
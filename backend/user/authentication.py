@@ -0,0 +1,36 @@
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+
+def _authenticate(request):
+    result = JWTAuthentication().authenticate(request)
+    return result[0] if result else None
+
+
+async def aauthorize(request, *permission_classes):
+    """
+    JWT authentication plus permission checks for async (non-DRF) views.
+    Returns (user, None) on success or (None, JsonResponse) with the same
+    401/403 bodies DRF would send.
+    """
+    try:
+        user = await sync_to_async(_authenticate)(request)
+    except AuthenticationFailed as e:
+        return None, JsonResponse({"detail": str(e.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+    if user is None:
+        return None, JsonResponse(
+            {"detail": "Authentication credentials were not provided."},
+            status=status.HTTP_401_UNAUTHORIZED,
+        )
+
+    request.user = user
+    for permission_class in permission_classes:
+        if not permission_class().has_permission(request, None):
+            return None, JsonResponse(
+                {"detail": "You do not have permission to perform this action."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+    return user, None